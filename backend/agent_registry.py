@@ -0,0 +1,180 @@
+# backend/agent_registry.py
+import collections
+import json
+import os
+import sqlite3
+import threading
+import time
+
+MAX_LIVE_AGENTS = int(os.getenv("AGENT_REGISTRY_MAX_LIVE", "256"))
+IDLE_TTL_SECONDS = float(os.getenv("AGENT_REGISTRY_IDLE_SECONDS", "1800"))
+DB_PATH = os.getenv("AGENT_REGISTRY_DB", os.path.join("projects", "agents.sqlite3"))
+# Agents in these states have work in flight and are never evicted.
+BUSY_STATUSES = ("Getting suggestion", "Fine-tuning", "Converting to Ollama")
+
+
+class AgentRegistry:
+    """Bounded cache of live agents backed by agent metadata in SQLite.
+
+    At most max_live agents stay in memory; the least recently used ones,
+    and any left unused for idle_ttl seconds, are written back and dropped.
+    Every worker process shares the database, so an agent created in one
+    worker is rehydrated lazily by whichever worker next asks for it.
+    """
+
+    def __init__(
+        self,
+        factory,
+        db_path=DB_PATH,
+        max_live=MAX_LIVE_AGENTS,
+        idle_ttl=IDLE_TTL_SECONDS,
+    ):
+        self.factory = factory
+        self.db_path = db_path
+        self.max_live = max_live
+        self.idle_ttl = idle_ttl
+        self._live = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.created = 0
+        self.rehydrated = 0
+        self.evicted_lru = 0
+        self.evicted_idle = 0
+        self.hits = 0
+        self.misses = 0
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with self._db() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS agents ("
+                "agent_id TEXT PRIMARY KEY, metadata TEXT NOT NULL, "
+                "updated_at REAL NOT NULL)"
+            )
+
+    def _db(self):
+        # sqlite3 connections must not be shared between threads.
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = sqlite3.connect(self.db_path, timeout=10)
+            db.execute("PRAGMA journal_mode=WAL")
+            # With WAL, NORMAL stays consistent and only skips the per-commit fsync.
+            db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def save(self, agent):
+        """Writes the agent's metadata through to the database."""
+        with self._db() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO agents (agent_id, metadata, updated_at) "
+                "VALUES (?, ?, ?)",
+                (agent.agent_id, json.dumps(agent.to_dict()), time.time()),
+            )
+
+    def _load(self, agent_id):
+        row = (
+            self._db()
+            .execute("SELECT metadata FROM agents WHERE agent_id = ?", (agent_id,))
+            .fetchone()
+        )
+        return json.loads(row[0]) if row else None
+
+    def add(self, agent):
+        """Registers a new agent and returns it."""
+        self.save(agent)
+        with self._lock:
+            self._live[agent.agent_id] = (agent, time.monotonic())
+            self.created += 1
+            evicted = self._evict()
+        self._write_back(evicted)
+        return agent
+
+    def get(self, agent_id):
+        """Returns the agent, rehydrating it from the database if needed."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._live.get(agent_id)
+            if entry is not None:
+                self._live[agent_id] = (entry[0], now)
+                self._live.move_to_end(agent_id)
+                self.hits += 1
+                evicted = self._evict()
+        if entry is not None:
+            self._write_back(evicted)
+            return entry[0]
+        metadata = self._load(agent_id)
+        with self._lock:
+            self.misses += 1
+            if metadata is None:
+                return None
+            # Another thread may have rehydrated it meanwhile.
+            entry = self._live.get(agent_id)
+            agent = entry[0] if entry else self.factory(metadata)
+            if entry is None:
+                self.rehydrated += 1
+            self._live[agent_id] = (agent, now)
+            self._live.move_to_end(agent_id)
+            evicted = self._evict()
+        self._write_back(evicted)
+        return agent
+
+    def _evict(self):
+        """Drops idle and over-capacity agents; call with the lock held."""
+        now = time.monotonic()
+        evicted = []
+        skipped = []
+        while self._live:
+            agent_id, (agent, last_used) = next(iter(self._live.items()))
+            idle = now - last_used > self.idle_ttl
+            if not idle and len(self._live) + len(skipped) <= self.max_live:
+                break
+            del self._live[agent_id]
+            if agent.status in BUSY_STATUSES:
+                skipped.append((agent_id, (agent, last_used)))
+                continue
+            evicted.append(agent)
+            if idle:
+                self.evicted_idle += 1
+            else:
+                self.evicted_lru += 1
+        for agent_id, entry in skipped:
+            # Busy agents stay live and count as just used.
+            self._live[agent_id] = (entry[0], now)
+        return evicted
+
+    def _write_back(self, agents):
+        for agent in agents:
+            self.save(agent)
+
+    def flush(self):
+        """Writes every live agent back, e.g. before the process exits."""
+        with self._lock:
+            agents = [agent for agent, _ in self._live.values()]
+        self._write_back(agents)
+
+    def live_ids(self):
+        with self._lock:
+            return list(self._live)
+
+    def __len__(self):
+        return self._db().execute("SELECT COUNT(*) FROM agents").fetchone()[0]
+
+    def metrics(self):
+        """Counters for the /api/agents/metrics endpoint."""
+        with self._lock:
+            live = len(self._live)
+            busy = sum(
+                1 for agent, _ in self._live.values() if agent.status in BUSY_STATUSES
+            )
+        return {
+            "live": live,
+            "busy": busy,
+            "stored": len(self),
+            "max_live": self.max_live,
+            "idle_ttl_seconds": self.idle_ttl,
+            "created": self.created,
+            "rehydrated": self.rehydrated,
+            "evicted_lru": self.evicted_lru,
+            "evicted_idle": self.evicted_idle,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -10,54 +10,146 @@ import uuid
 import requests
 from huggingface_hub import snapshot_download
 
+from . import (
+    finetune,
+    finetune_jobs,
+    finetune_state,
+    keystroke_compiler,
+    ollama_client,
+)
+
+# Statuses that last only as long as the request that set them. They are
+# saved as Idle, so an agent whose request died with its worker is not
+# rehydrated as busy forever.
+REQUEST_STATUSES = ("Getting suggestion", "Converting to Ollama")
+
+
+def _fine_tuning_status(agent_id):
+    """Status implied by the agent's latest fine-tuning job."""
+    jobs = finetune_jobs.scheduler.jobs_for_agent(agent_id)
+    if jobs and jobs[-1].status not in finetune_jobs.FINISHED_STATES:
+        return "Fine-tuning"
+    if jobs and jobs[-1].status == finetune_jobs.FAILED:
+        return "Error"
+    return "Idle"
+
 
 class LlmCoderAgent:
-    def __init__(self, ollama_base_url="http://localhost:11434"):
-        self.agent_id = str(uuid.uuid4())
+    """An agent that answers with, and is fine-tuned into, its own model.
+
+    Suggestions go straight to the agent's ollama_base_url rather than through
+    the FastAPI app's llm_router: the agent's model, usually one exported for
+    this agent after fine-tuning, only exists on that Ollama, so failing over
+    to another backend would answer with a different model.
+    """
+
+    __slots__ = ("agent_id", "ollama_base_url", "model", "status", "last_activity")
+
+    def __init__(self, ollama_base_url="http://localhost:11434", agent_id=None):
+        self.agent_id = agent_id or str(uuid.uuid4())
         self.ollama_base_url = ollama_base_url
         self.model = "mistral"  # Default model
         self.status = "Idle"
         self.last_activity = datetime.datetime.now()
 
-    def get_suggestion(self, prompt):
-        """Gets an LLM suggestion from Ollama."""
+    def to_dict(self):
+        """Returns the metadata needed to rehydrate this agent."""
+        return {
+            "agent_id": self.agent_id,
+            "ollama_base_url": self.ollama_base_url,
+            "model": self.model,
+            "status": "Idle" if self.status in REQUEST_STATUSES else self.status,
+            "last_activity": self.last_activity.isoformat(),
+        }
+
+    @classmethod
+    def from_dict(cls, metadata):
+        """Rebuilds an agent from to_dict() metadata."""
+        agent = cls(metadata["ollama_base_url"], agent_id=metadata["agent_id"])
+        agent.model = metadata["model"]
+        agent.status = metadata["status"]
+        if agent.status == "Fine-tuning":
+            # The job may have ended without the agent being saved.
+            agent.status = _fine_tuning_status(agent.agent_id)
+        agent.last_activity = datetime.datetime.fromisoformat(metadata["last_activity"])
+        return agent
+
+    def stream_suggestion(self, prompt):
+        """Yields LLM suggestion fragments from Ollama as they are generated.
+
+        Raises RequestException if Ollama cannot be reached and ValueError if
+        it sends a line that is not JSON.
+        """
         self.status = "Getting suggestion"
         self.last_activity = datetime.datetime.now()
         try:
-            response = requests.post(
-                f"{self.ollama_base_url}/api/generate",
+            response = ollama_client.post(
+                self.ollama_base_url,
+                "/api/generate",
                 json={
                     "model": self.model,
                     "prompt": prompt,
                 },
-                timeout=30,
+                stream=True,
             )
             response.raise_for_status()
-            suggestion = ""
-            for line in response.iter_lines():
-                if line:
-                    decoded_line = json.loads(line)
-                    if "response" in decoded_line:
-                        suggestion += decoded_line["response"]
-                    elif "error" in decoded_line:
-                        print(decoded_line["error"])
-            self.status = "Idle"
-            self.last_activity = datetime.datetime.now()
-            return suggestion.strip()
-        except requests.exceptions.RequestException as e:
-            print(f"Error communicating with Ollama: {e}")
+            with response:
+                for line in response.iter_lines():
+                    if line:
+                        decoded_line = json.loads(line)
+                        if "response" in decoded_line:
+                            if decoded_line["response"]:
+                                yield decoded_line["response"]
+                        elif "error" in decoded_line:
+                            print(decoded_line["error"])
+                        if decoded_line.get("done"):
+                            break
+        except (requests.exceptions.RequestException, ValueError):
             self.status = "Error"
+            raise
+        finally:
+            # Also runs when the consumer stops early, e.g. when a streaming
+            # client disconnects and the generator is closed.
+            if self.status == "Getting suggestion":
+                self.status = "Idle"
             self.last_activity = datetime.datetime.now()
+
+    def get_suggestion(self, prompt):
+        """Gets an LLM suggestion from Ollama."""
+        try:
+            return "".join(self.stream_suggestion(prompt)).strip()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"Error communicating with Ollama: {e}")
             return "Error: Could not get suggestion from LLM."
 
-    def fine_tune(self, data):
-        """Initiates fine-tuning with the given data."""
+    def fine_tune(
+        self, data, backend=finetune.DEFAULT_BACKEND, incremental=False, on_finish=None
+    ):
+        """Queues a fine-tuning job for the given data and returns it.
+
+        Raw keystroke logs are compiled into training examples first.
+        Incremental jobs train only on records the agent has not seen yet and
+        resume from its latest checkpoint; None is returned when there is
+        nothing (new) to train on. on_finish, e.g. AgentRegistry.save, is
+        called with the agent once the job has ended.
+        """
+        if backend not in finetune.BACKENDS:
+            raise ValueError(f"Unknown training backend: {backend}")
+        agent_dir = os.path.join("/app/projects", self.agent_id)
+        compiled = keystroke_compiler.is_keystroke_log(data)
+        if compiled:
+            data = keystroke_compiler.compile_keystrokes(data)
+            if not data:
+                return None
+        if incremental:
+            ledger = finetune_state.RecordLedger(agent_dir, backend)
+            data, _ = ledger.filter_new(data)
+            if not data:
+                return None
         self.status = "Fine-tuning"
         self.last_activity = datetime.datetime.now()
         timestamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
-        fine_tuning_dir = os.path.join(
-            "/app/projects", self.agent_id, f"fine_tuning_{timestamp}"
-        )
+        fine_tuning_dir = os.path.join(agent_dir, f"fine_tuning_{timestamp}")
         os.makedirs(fine_tuning_dir, exist_ok=True)
         # Save the fine-tuning data to a file
         data_file_path = os.path.join(fine_tuning_dir, "fine_tuning_data.json")
@@ -76,26 +168,41 @@ class LlmCoderAgent:
             fine_tuning_dir,
             "--agent_id",
             self.agent_id,
+            "--backend",
+            backend,
+            "--agent_dir",
+            agent_dir,
         ]
-        # Start the fine-tuning process
-        try:
-            subprocess.run(
-                fine_tune_command,
-                cwd=os.path.dirname(finetune_script_path),
-                check=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
+        if incremental:
+            fine_tune_command.append("--incremental")
+        if compiled:
+            # Already compiled here; the script need not look for a log.
+            fine_tune_command.append("--compiled")
+
+        def on_job_finish(job):
+            self._on_fine_tune_finished(job)
+            if on_finish is not None:
+                on_finish(self)
+
+        # Queue the fine-tuning process; the scheduler streams its output to a
+        # log file in fine_tuning_dir and calls back when it finishes.
+        job = finetune_jobs.scheduler.submit(
+            self.agent_id,
+            fine_tune_command,
+            cwd=os.path.dirname(finetune_script_path),
+            output_dir=fine_tuning_dir,
+            on_finish=on_job_finish,
+        )
+        return job
+
+    def _on_fine_tune_finished(self, job):
+        """Updates the agent status once a fine-tuning job ends."""
+        self.status = "Idle" if job.status != finetune_jobs.FAILED else "Error"
+        self.last_activity = datetime.datetime.now()
+        if job.status == finetune_jobs.FAILED:
+            print(
+                f"Error during fine-tuning for agent {self.agent_id}, see {job.log_path}"
             )
-            self.status = "Idle"
-            self.last_activity = datetime.datetime.now()
-            return f"Fine-tuning completed for agent {self.agent_id}."
-        except subprocess.CalledProcessError as e:
-            self.status = "Error"
-            self.last_activity = datetime.datetime.now()
-            print(f"Error during fine-tuning: {e}")
-            print(f"Stdout: {e.stdout.decode()}")
-            print(f"Stderr: {e.stderr.decode()}")
-            return f"Error during fine-tuning for agent {self.agent_id}: {e.stderr.decode()}"
 
     def convert_to_ollama(self, base_model, ollama_name):
         """Converts a Hugging Face model to an Ollama model."""
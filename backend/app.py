@@ -1,16 +1,37 @@
 # backend/app.py
+import atexit
+import concurrent.futures
+import datetime
 import json
 import logging
 import os
-import subprocess
+import time
 import uuid
+from logging.handlers import RotatingFileHandler
 
 import requests
-from flask import Flask, abort, jsonify, request, send_from_directory
+from flask import (
+    Flask,
+    Response,
+    abort,
+    jsonify,
+    request,
+    send_from_directory,
+    stream_with_context,
+)
 from flask_cors import CORS
 from huggingface_hub import snapshot_download
 from werkzeug.exceptions import HTTPException
 
+from . import (
+    collector_supervisor,
+    finetune,
+    finetune_jobs,
+    lint_pool,
+    log_tail,
+    project_store,
+)
+from .agent_registry import AgentRegistry
 from .agents import LlmCoderAgent
 from .knowledge_graph import KnowledgeGraph
 
@@ -18,29 +39,80 @@ app = Flask(__name__)
 CORS(app)
 # Logging setup with file handler
 LOG_FILE = "app.log"
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+MAX_LOG_LINES = 1000
+LOG_HEARTBEAT_SECONDS = 15
 logging.basicConfig(
     level=logging.INFO,
-    filename=LOG_FILE,
-    filemode="a+",
+    handlers=[
+        RotatingFileHandler(
+            LOG_FILE,
+            maxBytes=LOG_MAX_BYTES,
+            backupCount=LOG_BACKUP_COUNT,
+            encoding="utf-8",
+        )
+    ],
     format="%(asctime)s - %(levelname)s - %(message)s",
 )
 logger = logging.getLogger(__name__)
 # Ensure project directories exist
 PROJECTS_DIR = "projects"
 os.makedirs(PROJECTS_DIR, exist_ok=True)
-# Initialize a Knowledge Graph
-knowledge_graph = KnowledgeGraph()
-# Dictionary to store agents
-agents = {}
+# Initialize the Knowledge Graph, restoring the last snapshot if there is one
+KNOWLEDGE_GRAPH_PATH = os.getenv(
+    "KNOWLEDGE_GRAPH_PATH", os.path.join(PROJECTS_DIR, "knowledge_graph")
+)
+
+
+def load_knowledge_graph(path):
+    """Restores the snapshot at path, or returns an empty graph if it is unusable."""
+    # Not checked beforehand: a save swapping snapshots briefly leaves no
+    # directory at path, which load() waits out under the snapshot lock.
+    try:
+        return KnowledgeGraph.load(path)
+    except (OSError, ValueError, KeyError, TypeError, EOFError) as e:
+        if os.path.exists(path):
+            logger.error(
+                f"Error loading knowledge graph from {path}, starting empty: {e}"
+            )
+        return KnowledgeGraph()
+
+
+knowledge_graph = load_knowledge_graph(KNOWLEDGE_GRAPH_PATH)
+
+
+@atexit.register
+def save_knowledge_graph():
+    """Snapshots the knowledge graph so the next start can restore it."""
+    if knowledge_graph.nodes or knowledge_graph.num_edges:
+        try:
+            knowledge_graph.save(KNOWLEDGE_GRAPH_PATH)
+        except (OSError, TypeError) as e:
+            logger.error(f"Error saving knowledge graph: {e}")
+
+
+# Live agents are cached in memory, bounded, and persisted to SQLite
+agent_registry = AgentRegistry(LlmCoderAgent.from_dict)
+atexit.register(agent_registry.flush)
+atexit.register(lint_pool.pool.shutdown)
+atexit.register(collector_supervisor.supervisor.shutdown)
 
 
 def get_agent_or_404(agent_id):
-    agent = agents.get(agent_id)
+    agent = agent_registry.get(agent_id)
     if not agent:
         abort(404, description="Agent not found")
     return agent
 
 
+def get_job_or_404(job_id):
+    job = finetune_jobs.scheduler.get(job_id)
+    if not job:
+        abort(404, description="Fine-tuning job not found")
+    return job
+
+
 @app.errorhandler(HTTPException)
 def handle_exception(e):
     """Return JSON instead of HTML for HTTP errors."""
@@ -64,41 +136,92 @@ def lint_code():
         if not code_snippet:
             return jsonify({"error": "No code snippet provided"}), 400
         project_id = data.get("projectId", str(uuid.uuid4()))
-        project_path = os.path.join(PROJECTS_DIR, project_id)
-        os.makedirs(project_path, exist_ok=True)
-        code_file_path = os.path.join(project_path, "temp_code.py")
-        with open(code_file_path, "w", encoding="utf-8") as f:
-            f.write(code_snippet)
-        # Run pylint
-        lint_process = subprocess.run(
-            ["pylint", code_file_path],
-            capture_output=True,
-            text=True,
-            cwd=project_path,
-            check=False,
-        )
-        lint_output = lint_process.stdout
-        lint_error = lint_process.stderr
-        if lint_error:
+        # Lint in a warm worker straight from memory; identical snippets are
+        # answered from the result cache.
+        try:
+            lint_output, cached = lint_pool.pool.lint(code_snippet)
+        except concurrent.futures.TimeoutError:
+            logger.error("Pylint timed out")
+            return (
+                jsonify(
+                    {
+                        "error": "Pylint execution error",
+                        "details": f"Linting took over {lint_pool.pool.timeout}s",
+                    }
+                ),
+                504,
+            )
+        except Exception as lint_error:
             logger.error(f"Pylint error: {lint_error}")
             return (
-                jsonify({"error": "Pylint execution error", "details": lint_error}),
+                jsonify(
+                    {"error": "Pylint execution error", "details": str(lint_error)}
+                ),
                 500,
             )
-        return jsonify({"lint_output": lint_output, "projectId": project_id})
+        return jsonify(
+            {"lint_output": lint_output, "projectId": project_id, "cached": cached}
+        )
     except Exception as e:
         logger.exception("Error during linting:")
         return jsonify({"error": "Internal server error", "details": str(e)}), 500
 
 
+@app.route("/api/lint/stats", methods=["GET"])
+def get_lint_stats():
+    """Returns lint latency percentiles and result cache counters."""
+    return jsonify(lint_pool.pool.stats())
+
+
 @app.route("/api/agents/create", methods=["POST"])
 def create_agent():
     """Creates a new agent and returns its ID."""
-    agent = LlmCoderAgent()
-    agents[agent.agent_id] = agent
+    agent = agent_registry.add(LlmCoderAgent())
     return jsonify({"agent_id": agent.agent_id})
 
 
+@app.route("/api/agents/metrics", methods=["GET"])
+def get_agent_metrics():
+    """Returns live/evicted counters of the agent registry."""
+    return jsonify(agent_registry.metrics())
+
+
+def sse_frame(payload):
+    """Formats a payload as a server-sent event frame."""
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+def stream_suggestion_events(agent, prompt):
+    """Forwards suggestion fragments as SSE frames, ending with a timing frame."""
+    start = time.monotonic()
+    first_token_at = None
+    fragments = agent.stream_suggestion(prompt)
+    try:
+        for fragment in fragments:
+            if first_token_at is None:
+                first_token_at = time.monotonic()
+            yield sse_frame({"token": fragment})
+    except (requests.exceptions.RequestException, ValueError) as e:
+        logger.error(f"Error streaming suggestion for agent {agent.agent_id}: {e}")
+        yield sse_frame({"error": "Could not get suggestion from LLM."})
+    finally:
+        # On a client disconnect this resets the agent's status before saving.
+        fragments.close()
+        agent_registry.save(agent)
+    end = time.monotonic()
+    yield sse_frame(
+        {
+            "done": True,
+            "ttft_ms": (
+                round((first_token_at - start) * 1000, 1)
+                if first_token_at is not None
+                else None
+            ),
+            "total_ms": round((end - start) * 1000, 1),
+        }
+    )
+
+
 @app.route("/api/agents/<agent_id>/suggest", methods=["POST"])
 def get_llm_suggestion(agent_id):
     """Gets an LLM suggestion from a specific agent."""
@@ -108,7 +231,14 @@ def get_llm_suggestion(agent_id):
         prompt = data.get("prompt", "")
         if not prompt:
             return jsonify({"error": "No prompt provided"}), 400
+        if data.get("stream") or request.args.get("stream") == "true":
+            return Response(
+                stream_with_context(stream_suggestion_events(agent, prompt)),
+                mimetype="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            )
         suggestion = agent.get_suggestion(prompt)
+        agent_registry.save(agent)
         return jsonify({"suggestion": suggestion})
     except Exception as e:
         logger.exception(f"Error getting LLM suggestion for agent {agent_id}:")
@@ -120,17 +250,79 @@ def fine_tune_agent(agent_id):
     """Initiates fine-tuning for a specific agent."""
     agent = get_agent_or_404(agent_id)
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({"error": "Request body must be a JSON object"}), 400
         fine_tuning_data = data.get("data", "")
         if not fine_tuning_data:
             return jsonify({"error": "No fine-tuning data provided"}), 400
-        result = agent.fine_tune(fine_tuning_data)
-        return jsonify({"message": result})
+        if not isinstance(fine_tuning_data, list) or not all(
+            isinstance(record, dict) for record in fine_tuning_data
+        ):
+            return (
+                jsonify({"error": "Fine-tuning data must be a list of JSON objects"}),
+                400,
+            )
+        backend = data.get("backend", finetune.DEFAULT_BACKEND)
+        if backend not in finetune.BACKENDS:
+            return (
+                jsonify(
+                    {
+                        "error": f"Unknown training backend: {backend}",
+                        "backends": sorted(finetune.BACKENDS),
+                    }
+                ),
+                400,
+            )
+        job = agent.fine_tune(
+            fine_tuning_data,
+            backend=backend,
+            incremental=bool(data.get("incremental", False)),
+            on_finish=agent_registry.save,
+        )
+        agent_registry.save(agent)
+        if job is None:
+            return jsonify(
+                {"message": "No new training examples in the data; skipped."}
+            )
+        return (
+            jsonify(
+                {
+                    "message": f"Fine-tuning queued for agent {agent_id}.",
+                    "job_id": job.job_id,
+                    "status": job.status,
+                }
+            ),
+            202,
+        )
     except Exception as e:
         logger.exception(f"Error during fine-tuning for agent {agent_id}:")
         return jsonify({"error": "Internal server error", "details": str(e)}), 500
 
 
+@app.route("/api/agents/<agent_id>/fine_tune/jobs", methods=["GET"])
+def list_fine_tune_jobs(agent_id):
+    """Lists the fine-tuning jobs submitted for a specific agent."""
+    get_agent_or_404(agent_id)
+    jobs = finetune_jobs.scheduler.jobs_for_agent(agent_id)
+    return jsonify([job.to_dict() for job in jobs])
+
+
+@app.route("/api/fine_tune/jobs/<job_id>", methods=["GET"])
+def get_fine_tune_job(job_id):
+    """Returns the status and progress of a fine-tuning job."""
+    job = get_job_or_404(job_id)
+    return jsonify(job.to_dict())
+
+
+@app.route("/api/fine_tune/jobs/<job_id>/cancel", methods=["POST"])
+def cancel_fine_tune_job(job_id):
+    """Cancels a queued or running fine-tuning job."""
+    get_job_or_404(job_id)
+    job = finetune_jobs.scheduler.cancel(job_id)
+    return jsonify(job.to_dict())
+
+
 @app.route("/api/agents/<agent_id>/convert_to_ollama", methods=["POST"])
 def convert_to_ollama(agent_id):
     """Converts a Hugging Face model to an Ollama model."""
@@ -142,6 +334,7 @@ def convert_to_ollama(agent_id):
         if not base_model or not ollama_name:
             return jsonify({"error": "Missing base_model or ollama_name"}), 400
         result = agent.convert_to_ollama(base_model, ollama_name)
+        agent_registry.save(agent)
         return jsonify(result)
     except Exception as e:
         logger.exception(f"Error converting model to Ollama for agent {agent_id}:")
@@ -159,61 +352,130 @@ def create_project():
 
 @app.route("/api/projects/<project_id>/load", methods=["GET"])
 def load_project(project_id):
-    """Loads a project's data."""
+    """Loads a project's data, answering 304 if the client's ETag is current."""
     project_path = os.path.join(PROJECTS_DIR, project_id)
     if not os.path.exists(project_path):
         return jsonify({"error": "Project not found"}), 404
-    # Load project data (e.g., from a JSON file)
+    store = project_store.ProjectStore(project_path)
     try:
-        with open(
-            os.path.join(project_path, "project_data.json"), "r", encoding="utf-8"
-        ) as f:
-            project_data = json.load(f)
+        manifest = store.read_manifest()
+        if manifest is None:
+            raise FileNotFoundError(f"No data saved for project {project_id}")
     except Exception as e:
         logger.exception(f"Error loading project {project_id}:")
         return jsonify({"error": "Error loading project data", "details": str(e)}), 500
-    return jsonify(project_data)
+    if request.if_none_match.contains(manifest["etag"]):
+        response = Response(status=304)
+    else:
+        # Blobs are already JSON, so they are streamed out without parsing.
+        response = Response(store.iter_json(manifest), mimetype="application/json")
+    response.set_etag(manifest["etag"])
+    return response
 
 
-@app.route("/api/projects/<project_id>/save", methods=["POST"])
-def save_project(project_id):
-    """Saves a project's data."""
+def save_project_data(project_id, partial):
+    """Stores a full or partial (merge) save of a project."""
     project_path = os.path.join(PROJECTS_DIR, project_id)
     if not os.path.exists(project_path):
         return jsonify({"error": "Project not found"}), 404
+    store = project_store.ProjectStore(project_path)
     try:
-        data = request.get_json()
-        # Save project data (e.g., to a JSON file)
-        with open(
-            os.path.join(project_path, "project_data.json"), "w", encoding="utf-8"
-        ) as f:
-            json.dump(data, f)
+        data = request.get_json(silent=True)
+        if data is None:
+            return jsonify({"error": "Project data must be JSON"}), 400
+        if partial and not isinstance(data, dict):
+            return jsonify({"error": "A patch must be a JSON object"}), 400
+        if_match = request.if_match or None
+        if partial:
+            manifest = store.patch(data, if_match=if_match)
+        else:
+            manifest = store.save(data, if_match=if_match)
+    except project_store.PreconditionFailed:
+        return jsonify({"error": "Project was modified by another save"}), 412
+    except project_store.NotAnObject:
+        return jsonify({"error": "Only JSON object projects can be patched"}), 409
     except Exception as e:
         logger.exception(f"Error saving project {project_id}:")
         return jsonify({"error": "Error saving project data", "details": str(e)}), 500
-    return jsonify({"message": "Project saved successfully"})
+    response = jsonify(
+        {"message": "Project saved successfully", "version": manifest["version"]}
+    )
+    response.set_etag(manifest["etag"])
+    return response
+
+
+@app.route("/api/projects/<project_id>/save", methods=["POST"])
+def save_project(project_id):
+    """Saves a project's data, replacing what was stored before."""
+    return save_project_data(project_id, partial=False)
+
+
+@app.route("/api/projects/<project_id>/save", methods=["PATCH"])
+def patch_project(project_id):
+    """Merges changed keys (or single files under "files") into a project."""
+    return save_project_data(project_id, partial=True)
 
 
 @app.route("/api/data_collection/status", methods=["GET"])
 def get_data_collection_status():
-    """Gets the status of data collection."""
-    # Replace with actual status check
-    is_active = False
-    return jsonify({"status": "active" if is_active else "inactive"})
+    """Gets the status of data collection, for one agent with ?agent_id=."""
+    agent_id = request.args.get("agent_id")
+    if agent_id:
+        status = collector_supervisor.supervisor.status(agent_id)
+        if status is None:
+            return jsonify({"agent_id": agent_id, "state": "inactive"})
+        return jsonify(status)
+    active = collector_supervisor.supervisor.active_count()
+    return jsonify(
+        {
+            "status": "active" if active else "inactive",
+            "active": active,
+            "collectors": collector_supervisor.supervisor.statuses(),
+        }
+    )
 
 
 @app.route("/api/data_collection/start", methods=["POST"])
 def start_data_collection():
-    """Starts data collection."""
-    # Replace with actual data collection start logic
-    return jsonify({"message": "Data collection started"})
+    """Starts a data collector for an agent.
+
+    Body: {"agent_id": ..., plus optional spool options such as
+    "compression", "segment_bytes", "segment_seconds" or "fsync"}.
+    """
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({"error": "Request body must be a JSON object"}), 400
+    agent_id = data.pop("agent_id", None)
+    if not agent_id:
+        return jsonify({"error": "agent_id is required"}), 400
+    get_agent_or_404(agent_id)
+    try:
+        status = collector_supervisor.supervisor.start(agent_id, data)
+    except collector_supervisor.CollectorError as e:
+        return jsonify({"error": str(e)}), e.status
+    except OSError as e:
+        logger.exception("Error starting data collection:")
+        return (
+            jsonify({"error": "Error starting data collection", "details": str(e)}),
+            500,
+        )
+    return jsonify({"message": "Data collection started", "collector": status})
 
 
 @app.route("/api/data_collection/stop", methods=["POST"])
 def stop_data_collection():
-    """Stops data collection."""
-    # Replace with actual data collection stop logic
-    return jsonify({"message": "Data collection stopped"})
+    """Stops an agent's data collector, saving its recording."""
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({"error": "Request body must be a JSON object"}), 400
+    agent_id = data.get("agent_id")
+    if not agent_id:
+        return jsonify({"error": "agent_id is required"}), 400
+    try:
+        status = collector_supervisor.supervisor.stop(agent_id)
+    except collector_supervisor.CollectorError as e:
+        return jsonify({"error": str(e)}), e.status
+    return jsonify({"message": "Data collection stopped", "collector": status})
 
 
 @app.route("/api/agents/<agent_id>/status", methods=["GET"])
@@ -228,13 +490,65 @@ def get_agent_status(agent_id):
     )
 
 
+def parse_since(value):
+    """Parses epoch seconds or an ISO 8601 time into naive local time."""
+    try:
+        seconds = float(value)
+    except ValueError:
+        since = datetime.datetime.fromisoformat(value)
+        if since.tzinfo is not None:
+            since = since.astimezone().replace(tzinfo=None)
+        return since
+    try:
+        return datetime.datetime.fromtimestamp(seconds)
+    except (OverflowError, OSError) as e:
+        raise ValueError(f"Timestamp out of range: {value}") from e
+
+
+def stream_log_events(count, min_level, since=None):
+    """Sends the last records (none older than since), then new ones as they
+    are logged, as SSE frames."""
+    for record in log_tail.tail_records(LOG_FILE, count, min_level, since):
+        yield sse_frame({"line": record})
+    last_sent = time.monotonic()
+    for record in log_tail.follow_records(LOG_FILE, min_level):
+        if record is not None:
+            yield sse_frame({"line": record})
+            last_sent = time.monotonic()
+        elif time.monotonic() - last_sent >= LOG_HEARTBEAT_SECONDS:
+            # Comment frames keep proxies from timing out an idle stream.
+            yield ": keep-alive\n\n"
+            last_sent = time.monotonic()
+
+
 @app.route("/api/logs", methods=["GET"])
 def get_logs():
-    """Returns the last 10 log entries."""
-    log_file = "app.log"  # Assuming a single log file for simplicity
+    """Returns the last log records, optionally filtered, or follows the log.
+
+    Query parameters: lines (default 10), level (minimum level, e.g. WARNING),
+    since (epoch seconds or ISO 8601) and follow=true for a live SSE stream,
+    which starts with the records the other parameters select.
+    """
+    try:
+        count = max(1, min(int(request.args.get("lines", 10)), MAX_LOG_LINES))
+        min_level = None
+        if request.args.get("level"):
+            min_level = logging.getLevelName(request.args["level"].upper())
+            if not isinstance(min_level, int):
+                raise ValueError(f"Unknown log level: {request.args['level']}")
+        since = None
+        if request.args.get("since"):
+            since = parse_since(request.args["since"])
+    except ValueError as e:
+        return jsonify({"error": "Invalid query parameter", "details": str(e)}), 400
+    if request.args.get("follow") == "true":
+        return Response(
+            stream_with_context(stream_log_events(count, min_level, since)),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
     try:
-        with open(log_file, "r", encoding="utf-8") as f:
-            logs = f.readlines()[-10:]  # Get the last 10 lines
+        logs = log_tail.tail_records(LOG_FILE, count, min_level, since)
         return jsonify(logs)
     except Exception as e:
         logger.exception("Error reading log file:")
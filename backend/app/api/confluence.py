@@ -13,6 +13,7 @@ from backend.app.core.config import settings
 from backend.app.core.utils import get_current_time
 from sqlalchemy.orm import Session
 from backend.app.db.database import get_db
+from backend.app.services import confluence as confluence_service
 
 router = APIRouter(
     prefix="/confluence",
@@ -45,4 +46,12 @@ async def index_confluence(user: str, db: Session = Depends(get_db)):
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Confluence indexing failed at {get_current_time()}. Error: {e}"
-        )
\ No newline at end of file
+        )
+
+
+@router.get("/search")
+async def search_confluence(query: str, k: int = 5, space: str | None = None):
+    """
+    Returns the indexed Confluence chunks most similar to the query.
+    """
+    return {"results": await confluence_service.search_confluence(query, k, space)}
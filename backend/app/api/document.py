@@ -3,12 +3,18 @@
 document.py
 
 Provides an endpoint to summarize a document from a given URL by scraping its content and using the LLM.
+Long documents are summarized chunk by chunk (see core/summarizer.py), and
+/summarize/batch handles many URLs in one request.
 """
 
-from fastapi import APIRouter, HTTPException, status
+import json
 
-from backend.app.core.llm import generate_text
-from backend.app.core.scraping import scrape_url
+from fastapi import APIRouter, Body, HTTPException, status
+from fastapi.responses import StreamingResponse
+
+from backend.app.core import summarizer
+from backend.app.core.scraping import scrape_url_async
+from backend.app.services.document import BATCH_MAX_URLS, summarize_documents
 
 router = APIRouter(
     prefix="/document",
@@ -18,13 +24,33 @@ router = APIRouter(
 
 @router.post("/summarize")
 async def summarize_document(url: str, user: str):
-    content = scrape_url(url)
+    content = await scrape_url_async(url)
     if not content:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                             detail="Could not scrape content from the provided URL.")
-    prompt = f"Summarize the following document in a concise and clear manner:\n\n{content}\n\nSummary:"
-    summary = generate_text(prompt)
+    summary = await summarizer.summarize_text(content)
     if not summary:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                             detail="LLM failed to generate a summary.")
     return {"summary": summary}
+
+
+@router.post("/summarize/batch")
+async def summarize_documents_batch(user: str, urls: list[str] = Body(..., embed=True), summarize: bool = True):
+    """Fetches and summarizes up to BATCH_MAX_URLS pages concurrently, streaming one
+    NDJSON line per distinct URL as it completes and a final {"done"} line with counts.
+    summarize=false returns each page's text instead of a summary."""
+    if not urls:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No URLs given.")
+    if len(urls) > BATCH_MAX_URLS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"At most {BATCH_MAX_URLS} URLs can be summarized at once.")
+    lines = (json.dumps(result) + "\n" async for result in summarize_documents(urls, summarize))
+    return StreamingResponse(lines, media_type="application/x-ndjson",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@router.get("/summarize/stats")
+async def summarize_stats():
+    """Returns hit counts of the chunk summary cache."""
+    return summarizer.summary_cache.stats()
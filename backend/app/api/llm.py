@@ -1,8 +1,22 @@
 # backend/app/api/llm.py
+import json
+import logging
+import time
+import uuid
+from typing import AsyncIterator
+
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
 
-from backend.app.core.llm import generate_chat, generate_text
+from backend.app.core import llm as llm_core
+from backend.app.core.llm import (
+    generate_chat_async,
+    generate_text_async,
+    stream_chat_async,
+    stream_text_async,
+)
 from backend.app.core.security import get_current_user
+from backend.app.events.websocket_handler import websocket_manager
 
 router = APIRouter(
     prefix="/llm",
@@ -11,16 +25,109 @@ router = APIRouter(
 )
 
 
+def sse_frame(payload: dict) -> str:
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+async def relay_deltas(
+    deltas: AsyncIterator[str], request_id: str, ws_user: str | None = None
+) -> AsyncIterator[dict]:
+    """Yields {"token"} events per delta, then {"error"} on failure and a final
+    {"done"} event with timings. With ws_user the events are also sent to that
+    user's websocket connections, tagged with request_id."""
+    start = time.monotonic()
+    first_token_at = None
+    parts = []
+
+    async def forward(event: dict):
+        if ws_user is not None:
+            await websocket_manager.send_json(
+                {"type": "llm", "request_id": request_id, **event}, ws_user
+            )
+
+    try:
+        async for delta in deltas:
+            if first_token_at is None:
+                first_token_at = time.monotonic()
+            parts.append(delta)
+            event = {"token": delta}
+            await forward(event)
+            yield event
+    except Exception as e:
+        logging.error(f"Error streaming LLM response: {e}")
+        event = {"error": "LLM could not generate response"}
+        await forward(event)
+        yield event
+    end = time.monotonic()
+    event = {
+        "done": True,
+        "request_id": request_id,
+        "ttft_ms": (
+            round((first_token_at - start) * 1000, 1)
+            if first_token_at is not None
+            else None
+        ),
+        "total_ms": round((end - start) * 1000, 1),
+    }
+    await forward({**event, "text": "".join(parts)})
+    yield event
+
+
+async def respond_streamed(
+    deltas: AsyncIterator[str], user: str, stream: bool, forward_ws: bool
+):
+    """Returns deltas as an SSE stream, or collected into {"text"} when only
+    forwarding them to the user's websockets."""
+    request_id = uuid.uuid4().hex
+    events = relay_deltas(deltas, request_id, user if forward_ws else None)
+    if stream:
+        return StreamingResponse(
+            (sse_frame(event) async for event in events),
+            media_type="text/event-stream",
+            headers={
+                "Cache-Control": "no-cache",
+                "X-Accel-Buffering": "no",
+                "X-Request-ID": request_id,
+            },
+        )
+    parts = []
+    async for event in events:
+        if "error" in event:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=event["error"],
+            )
+        parts.append(event.get("token", ""))
+    text = "".join(parts).strip()
+    if not text:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="LLM could not generate response",
+        )
+    return {"text": text, "request_id": request_id}
+
+
 @router.post("/generate")
 async def generate_llm_text(
     prompt: str,
     model: str = "gpt-3.5-turbo",
     temperature: float = 0.7,
     max_tokens: int = 1000,
+    stream: bool = False,
+    forward_ws: bool = False,
     user: str = Depends(get_current_user),
 ):
+    """Generates text for prompt. stream=true returns an SSE stream of token
+    deltas; forward_ws=true also sends them to the user's websockets."""
+    if stream or forward_ws:
+        return await respond_streamed(
+            stream_text_async(prompt, model, temperature, max_tokens),
+            user,
+            stream,
+            forward_ws,
+        )
     try:
-        result = generate_text(prompt, model, temperature, max_tokens)
+        result = await generate_text_async(prompt, model, temperature, max_tokens)
         if result:
             return {"text": result}
         else:
@@ -40,10 +147,20 @@ async def chat_llm(
     model: str = "gpt-3.5-turbo",
     temperature: float = 0.7,
     max_tokens: int = 1000,
+    stream: bool = False,
+    forward_ws: bool = False,
     user: str = Depends(get_current_user),
 ):
+    """Continues a chat. stream and forward_ws work as for /llm/generate."""
+    if stream or forward_ws:
+        return await respond_streamed(
+            stream_chat_async(messages, model, temperature, max_tokens),
+            user,
+            stream,
+            forward_ws,
+        )
     try:
-        result = generate_chat(messages, model, temperature, max_tokens)
+        result = await generate_chat_async(messages, model, temperature, max_tokens)
         if result:
             return {"text": result}
         else:
@@ -55,3 +172,23 @@ async def chat_llm(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
         )
+
+
+@router.get("/cache/stats")
+async def llm_cache_stats():
+    """Returns hit rates and saved latency of the LLM response cache."""
+    if llm_core.response_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **llm_core.response_cache.stats()}
+
+
+@router.get("/coalescer/stats")
+async def llm_coalescer_stats():
+    """Returns batch counts and sizes of generate_text request coalescing."""
+    return {"enabled": llm_core.LLM_COALESCE, **llm_core.prompt_coalescer.stats()}
+
+
+@router.get("/router/stats")
+async def llm_router_stats():
+    """Returns per-backend latency and error EWMAs, and hedging counts."""
+    return llm_core.llm_router.stats()
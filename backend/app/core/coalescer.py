@@ -0,0 +1,79 @@
+"""
+coalescer.py
+
+Groups small concurrent requests into batches. Callers submit one item and await
+its result; items sharing a batch key are held for at most max_wait seconds (or
+until max_batch of them are waiting) and then dispatched with a single call,
+whose results are handed back to each caller in order.
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class RequestCoalescer:
+    def __init__(
+        self,
+        dispatch: Callable[[Hashable, list[Any]], Awaitable[list[Any]]],
+        max_batch: int = 16,
+        max_wait: float = 0.005,
+    ):
+        self.dispatch = dispatch
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._pending: dict[Hashable, list[tuple[Any, asyncio.Future]]] = {}
+        self._timers: dict[Hashable, asyncio.TimerHandle] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self.batches = 0
+        self.items = 0
+
+    async def submit(self, key: Hashable, item: Any) -> Any:
+        """Queues item under key and returns its result once its batch is done."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self._pending.setdefault(key, [])
+        pending.append((item, future))
+        if len(pending) >= self.max_batch:
+            self._flush(key)
+        elif len(pending) == 1:
+            self._timers[key] = loop.call_later(self.max_wait, self._flush, key)
+        return await future
+
+    def _flush(self, key: Hashable):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(key, [])
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._run(key, batch))
+            # Keep a reference so the task is not garbage collected mid-flight.
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, key: Hashable, batch: list[tuple[Any, asyncio.Future]]):
+        self.batches += 1
+        self.items += len(batch)
+        try:
+            results = await self.dispatch(key, [item for item, _ in batch])
+            if len(results) != len(batch):
+                raise ValueError(f"Batch of {len(batch)} returned {len(results)} results")
+        except Exception as e:
+            logging.error(f"Error dispatching batch of {len(batch)}: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            # A caller that was cancelled while waiting no longer wants its result.
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else None,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+        }
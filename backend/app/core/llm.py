@@ -1,17 +1,53 @@
 """
 llm.py
 
-Provides functions to generate text and chat responses using OpenAI's API.
+Provides functions to generate text, chat responses and embeddings using OpenAI's API.
+
+The *_async variants are for async callers (FastAPI handlers and services): they
+share one pooled httpx.AsyncClient, cap in-flight requests per model with a
+semaphore and apply connect/read timeouts, so an LLM call never blocks the
+event loop. The synchronous functions remain for non-async code.
 """
 
+import asyncio
+import os
+import time
+from typing import AsyncIterator
+
+import httpx
 import openai
 import logging
+from backend.app.core import llm_cache
+from backend.app.core.coalescer import RequestCoalescer
+from backend.app.core.llm_router import Backend, LLMRouter, backends_from_env
 from backend.app.core.config import Settings
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 openai.api_key = Settings.OPENAI_API_KEY
 
+# Any OpenAI-compatible server (e.g. a local mock or proxy) can be used instead.
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+# Upper bound on concurrent requests to any one model, to stay within its rate limits.
+LLM_MODEL_CONCURRENCY = int(os.getenv("LLM_MODEL_CONCURRENCY", "16"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "120"))
+# Coalesce concurrent generate_text_async calls into one /completions request
+# with a list of prompts, for models routed to a backend marked "batch" (see
+# llm_router.py). Setting it marks the default OpenAI-compatible backend as one;
+# only do so for a server that accepts batched prompts (e.g. a local vLLM or
+# llama.cpp server). Other models are sent as chat requests.
+LLM_COALESCE = os.getenv("LLM_COALESCE", "0") == "1"
+LLM_COALESCE_MAX_BATCH = int(os.getenv("LLM_COALESCE_MAX_BATCH", "16"))
+LLM_COALESCE_MAX_WAIT_MS = float(os.getenv("LLM_COALESCE_MAX_WAIT_MS", "5"))
+# Send a second copy of a slow chat request to another backend serving the model.
+LLM_ROUTER_HEDGING = os.getenv("LLM_ROUTER_HEDGING", "1") == "1"
+
+_client: httpx.AsyncClient | None = None
+_client_loop: asyncio.AbstractEventLoop | None = None
+_model_semaphores: dict[str, asyncio.Semaphore] = {}
+
 
 def generate_text(prompt: str, model: str = "gpt-3.5-turbo", temperature: float = 0.7,
                   max_tokens: int = 1000) -> str | None:
@@ -41,3 +77,171 @@ def generate_chat(messages: list[dict[str, str]], model: str = "gpt-3.5-turbo",
     except Exception as e:
         logging.error(f"Error during LLM generate_chat: {e}")
         return None
+
+
+def generate_embeddings(texts: list[str], model: str = "text-embedding-ada-002") -> list[list[float]] | None:
+    try:
+        response = openai.Embedding.create(model=model, input=texts)
+        return [item["embedding"] for item in sorted(response["data"], key=lambda item: item["index"])]
+    except Exception as e:
+        logging.error(f"Error during LLM generate_embeddings: {e}")
+        return None
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Returns the shared HTTP client for the running event loop."""
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop:
+        # Clients and semaphores are bound to the loop they were created on.
+        _client = httpx.AsyncClient(
+            base_url=OPENAI_BASE_URL,
+            timeout=httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_CONNECTIONS,
+            ),
+        )
+        _client_loop = loop
+        _model_semaphores.clear()
+    return _client
+
+
+async def close_async_client() -> None:
+    global _client, _client_loop
+    if _client is not None:
+        await _client.aclose()
+    _client = None
+    _client_loop = None
+
+
+def _auth_headers() -> dict[str, str]:
+    # Sent per request, not as a client default, since the client is shared
+    # with non-OpenAI backends.
+    return {"Authorization": f"Bearer {Settings.OPENAI_API_KEY}"} if Settings.OPENAI_API_KEY else {}
+
+
+def _model_semaphore(model: str) -> asyncio.Semaphore:
+    semaphore = _model_semaphores.get(model)
+    if semaphore is None:
+        semaphore = _model_semaphores[model] = asyncio.Semaphore(LLM_MODEL_CONCURRENCY)
+    return semaphore
+
+
+async def _post(path: str, payload: dict) -> dict:
+    client = get_async_client()
+    async with _model_semaphore(payload["model"]):
+        response = await client.post(path, json=payload, headers=_auth_headers())
+    response.raise_for_status()
+    return response.json()
+
+
+async def _complete_batch(key: tuple[Backend, str, float, int], prompts: list[str]) -> list[str | None]:
+    backend, model, temperature, max_tokens = key
+    client = get_async_client()
+    async with _model_semaphore(model):
+        return await llm_router.complete_batch(client, backend, model, prompts, temperature, max_tokens)
+
+
+prompt_coalescer = RequestCoalescer(
+    _complete_batch, max_batch=LLM_COALESCE_MAX_BATCH, max_wait=LLM_COALESCE_MAX_WAIT_MS / 1000
+)
+
+
+async def generate_text_async(prompt: str, model: str = "gpt-3.5-turbo", temperature: float = 0.7,
+                              max_tokens: int = 1000, cache: bool | None = None) -> str | None:
+    messages = [{"role": "user", "content": prompt}]
+    target = llm_router.batch_backend(model) if LLM_COALESCE else None
+    if target is None:
+        return await generate_chat_async(messages, model, temperature, max_tokens, cache)
+    backend, backend_model = target
+
+    async def generate() -> str | None:
+        try:
+            return await prompt_coalescer.submit((backend, backend_model, temperature, max_tokens), prompt)
+        except Exception as e:
+            logging.error(f"Error during LLM generate_text_async: {e}")
+            return None
+
+    if response_cache is not None and llm_cache.should_cache(temperature, cache):
+        return await response_cache.get_or_generate(model, messages, temperature, max_tokens, generate)
+    return await generate()
+
+
+async def generate_chat_async(messages: list[dict[str, str]], model: str = "gpt-3.5-turbo",
+                              temperature: float = 0.7, max_tokens: int = 1000,
+                              cache: bool | None = None) -> str | None:
+    """Returns the completion text, or None on failure. The request is routed to a
+    backend serving model by llm_router. Responses are served from and stored in
+    response_cache if cache is True or, when cache is None, if temperature is at
+    most LLM_CACHE_MAX_TEMPERATURE."""
+    async def generate() -> str | None:
+        try:
+            client = get_async_client()
+            async with _model_semaphore(model):
+                return await llm_router.chat(client, model, messages, temperature, max_tokens)
+        except Exception as e:
+            logging.error(f"Error during LLM generate_chat_async: {e}")
+            return None
+
+    if response_cache is not None and llm_cache.should_cache(temperature, cache):
+        return await response_cache.get_or_generate(model, messages, temperature, max_tokens, generate)
+    return await generate()
+
+
+async def stream_chat_async(messages: list[dict[str, str]], model: str = "gpt-3.5-turbo",
+                            temperature: float = 0.7, max_tokens: int = 1000,
+                            cache: bool | None = None) -> AsyncIterator[str]:
+    """Yields the completion's text deltas as they arrive from the backend
+    llm_router picks for model; raises on failure. A cached response (see
+    generate_chat_async) is yielded as a single delta, and a completed stream
+    is stored in response_cache."""
+    use_cache = response_cache is not None and llm_cache.should_cache(temperature, cache)
+    if use_cache:
+        text = await response_cache.lookup(model, messages, temperature, max_tokens)
+        if text is not None:
+            yield text
+            return
+    client = get_async_client()
+    parts = []
+    start = time.monotonic()
+    async with _model_semaphore(model):
+        async for delta in llm_router.stream_chat(client, model, messages, temperature, max_tokens):
+            parts.append(delta)
+            yield delta
+    text = "".join(parts).strip()
+    if use_cache and text:
+        await response_cache.store(model, messages, temperature, max_tokens, text,
+                                   (time.monotonic() - start) * 1000)
+
+
+async def stream_text_async(prompt: str, model: str = "gpt-3.5-turbo", temperature: float = 0.7,
+                            max_tokens: int = 1000, cache: bool | None = None) -> AsyncIterator[str]:
+    messages = [{"role": "user", "content": prompt}]
+    async for delta in stream_chat_async(messages, model, temperature, max_tokens, cache):
+        yield delta
+
+
+async def generate_embeddings_async(texts: list[str],
+                                    model: str = "text-embedding-ada-002") -> list[list[float]] | None:
+    try:
+        response = await _post("/embeddings", {"model": model, "input": texts})
+        return [item["embedding"] for item in sorted(response["data"], key=lambda item: item["index"])]
+    except Exception as e:
+        logging.error(f"Error during LLM generate_embeddings_async: {e}")
+        return None
+
+
+async def _embed_for_cache(text: str) -> list[float] | None:
+    embeddings = await generate_embeddings_async([text])
+    return embeddings[0] if embeddings else None
+
+
+# Shared by every async caller; configured by the LLM_CACHE_* environment variables.
+response_cache = llm_cache.cache_from_env(_embed_for_cache)
+
+# Chooses the Ollama or OpenAI-compatible backend for each chat request.
+llm_router = LLMRouter(
+    backends_from_env(OPENAI_BASE_URL, Settings.OPENAI_API_KEY, Settings.OLLAMA_HOST, LLM_COALESCE),
+    hedging=LLM_ROUTER_HEDGING,
+)
@@ -0,0 +1,351 @@
+"""
+llm_cache.py
+
+Response cache for LLM calls. The exact tier is keyed on (model, messages,
+temperature, max_tokens): a TTL'd, size-bounded LRU in memory, optionally backed
+by SQLite so entries survive restarts and are shared between workers. The opt-in
+semantic tier also answers a request whose last message is close enough, by
+embedding cosine similarity, to one already answered with the same model,
+settings and preceding messages.
+
+Only requests with a temperature of at most LLM_CACHE_MAX_TEMPERATURE are cached
+by default: a sampled completion is meant to differ between calls, so callers
+must opt in (cache=True) to have one replayed.
+"""
+
+import asyncio
+import collections
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Awaitable, Callable
+
+import numpy as np
+
+from backend.vector_index import VECTOR_DTYPE, normalize
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "3600"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2048"))
+LLM_CACHE_MAX_TEMPERATURE = float(os.getenv("LLM_CACHE_MAX_TEMPERATURE", "0"))
+# SQLite file for the disk tier; unset keeps the cache in memory only.
+LLM_CACHE_DB = os.getenv("LLM_CACHE_DB")
+# Minimum cosine similarity for a semantic hit; 0 disables the semantic tier.
+# Each exact-tier miss then costs one embedding request.
+LLM_CACHE_SEMANTIC_THRESHOLD = float(os.getenv("LLM_CACHE_SEMANTIC_THRESHOLD", "0"))
+LLM_CACHE_SEMANTIC_MAX_ENTRIES = int(os.getenv("LLM_CACHE_SEMANTIC_MAX_ENTRIES", "1024"))
+
+
+def _digest(value) -> str:
+    encoded = json.dumps(value, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def should_cache(temperature: float, cache: bool | None = None) -> bool:
+    """Whether a request may use the cache; cache=None decides by temperature."""
+    if cache is not None:
+        return cache
+    return temperature <= LLM_CACHE_MAX_TEMPERATURE
+
+
+def request_key(model: str, messages: list[dict[str, str]], temperature: float, max_tokens: int) -> str:
+    return _digest([model, messages, temperature, max_tokens])
+
+
+class MemoryTier:
+    """LRU of key -> (text, latency_ms, expires_at)."""
+
+    def __init__(self, max_entries: int = LLM_CACHE_MAX_ENTRIES, ttl: float = LLM_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = collections.OrderedDict()
+
+    def get(self, key: str) -> tuple[str, float] | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[2] < time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[0], entry[1]
+
+    def set(self, key: str, text: str, latency_ms: float, expires_at: float | None = None):
+        self._entries[key] = (text, latency_ms, expires_at or time.time() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteTier:
+    """Exact-match entries in SQLite, shared by every worker using the file."""
+
+    def __init__(self, path: str, ttl: float = LLM_CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._db() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, text TEXT NOT NULL, "
+                "latency_ms REAL NOT NULL, expires_at REAL NOT NULL)"
+            )
+            db.execute("DELETE FROM responses WHERE expires_at < ?", (time.time(),))
+
+    def _db(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads.
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = sqlite3.connect(self.path, timeout=10)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def get(self, key: str) -> tuple[str, float, float] | None:
+        row = self._db().execute(
+            "SELECT text, latency_ms, expires_at FROM responses WHERE key = ? AND expires_at >= ?",
+            (key, time.time()),
+        ).fetchone()
+        return tuple(row) if row else None
+
+    def set(self, key: str, text: str, latency_ms: float):
+        with self._db() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (key, text, latency_ms, time.time() + self.ttl),
+            )
+
+    def clear(self):
+        with self._db() as db:
+            db.execute("DELETE FROM responses")
+
+
+class SemanticTier:
+    """Fixed-size ring of (scope, embedding) -> text, searched by brute force.
+
+    The scope is a digest of everything but the last message, so only requests
+    that differ in wording of their final message can match each other.
+    """
+
+    def __init__(
+        self,
+        embed: Callable[[str], Awaitable[list[float] | None]],
+        threshold: float = LLM_CACHE_SEMANTIC_THRESHOLD,
+        max_entries: int = LLM_CACHE_SEMANTIC_MAX_ENTRIES,
+        ttl: float = LLM_CACHE_TTL,
+    ):
+        self.embed = embed
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._vectors = None
+        self._scopes = [None] * max_entries
+        self._entries = [None] * max_entries
+        self._next = 0
+
+    async def embed_query(self, text: str) -> np.ndarray | None:
+        vector = await self.embed(text)
+        if vector is None:
+            return None
+        return normalize(np.asarray(vector, dtype=VECTOR_DTYPE)[None, :])[0]
+
+    def get(self, scope: str, vector: np.ndarray) -> tuple[str, float] | None:
+        if self._vectors is None or self._vectors.shape[1] != vector.shape[0]:
+            return None
+        scores = self._vectors @ vector
+        now = time.time()
+        for row in np.argsort(-scores):
+            if scores[row] < self.threshold:
+                return None
+            entry = self._entries[row]
+            if self._scopes[row] == scope and entry is not None and entry[2] >= now:
+                return entry[0], entry[1]
+        return None
+
+    def set(self, scope: str, vector: np.ndarray, text: str, latency_ms: float):
+        if self._vectors is None or self._vectors.shape[1] != vector.shape[0]:
+            self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=VECTOR_DTYPE)
+            self._scopes = [None] * self.max_entries
+            self._entries = [None] * self.max_entries
+        row = self._next
+        self._next = (self._next + 1) % self.max_entries
+        self._vectors[row] = vector
+        self._scopes[row] = scope
+        self._entries[row] = (text, latency_ms, time.time() + self.ttl)
+
+    def clear(self):
+        self._vectors = None
+        self._next = 0
+
+    def __len__(self) -> int:
+        return sum(entry is not None for entry in self._entries) if self._vectors is not None else 0
+
+
+class ResponseCache:
+    """Looks requests up tier by tier (memory, disk, semantic) before generating.
+
+    Concurrent identical requests share one upstream call (counted as
+    "inflight" hits). Only successful (non-None) responses are stored.
+    """
+
+    def __init__(
+        self,
+        memory: MemoryTier | None = None,
+        disk: SQLiteTier | None = None,
+        semantic: SemanticTier | None = None,
+    ):
+        self.memory = memory if memory is not None else MemoryTier()
+        self.disk = disk
+        self.semantic = semantic
+        self._inflight: dict[str, asyncio.Future] = {}
+        self.hits = {"memory": 0, "disk": 0, "semantic": 0, "inflight": 0}
+        self.misses = 0
+        self.saved_latency_ms = 0.0
+        self.upstream_latency_ms = 0.0
+
+    def _hit(self, tier: str, text: str, latency_ms: float) -> str:
+        self.hits[tier] += 1
+        self.saved_latency_ms += latency_ms
+        return text
+
+    async def get_or_generate(
+        self,
+        model: str,
+        messages: list[dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+        generate: Callable[[], Awaitable[str | None]],
+    ) -> str | None:
+        key = request_key(model, messages, temperature, max_tokens)
+        text = await self._get_exact(key)
+        if text is not None:
+            return text
+        while key in self._inflight:
+            inflight = self._inflight[key]
+            try:
+                text, latency_ms = await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if inflight.cancelled():
+                    # The request we were waiting on was cancelled; take over.
+                    continue
+                raise
+            return self._hit("inflight", text, latency_ms) if text is not None else None
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            text, latency_ms = await self._generate(model, messages, temperature, max_tokens, key, generate)
+            future.set_result((text, latency_ms))
+            return text
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Waiters re-raise it; mark it retrieved in case there are none.
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def _get_exact(self, key: str) -> str | None:
+        entry = self.memory.get(key)
+        if entry is not None:
+            return self._hit("memory", *entry)
+        if self.disk is not None:
+            try:
+                row = await asyncio.to_thread(self.disk.get, key)
+            except sqlite3.Error as e:
+                logging.error(f"Error reading LLM cache: {e}")
+                row = None
+            if row is not None:
+                self.memory.set(key, *row)
+                return self._hit("disk", row[0], row[1])
+        return None
+
+    async def _set_exact(self, key: str, text: str, latency_ms: float):
+        self.memory.set(key, text, latency_ms)
+        if self.disk is not None:
+            try:
+                await asyncio.to_thread(self.disk.set, key, text, latency_ms)
+            except sqlite3.Error as e:
+                logging.error(f"Error writing LLM cache: {e}")
+
+    async def lookup(self, model: str, messages: list[dict[str, str]], temperature: float,
+                     max_tokens: int) -> str | None:
+        """Returns the stored response to an identical request, or None on a miss.
+
+        For callers that cannot hand get_or_generate a coroutine, e.g. streams;
+        they store what they generated with store().
+        """
+        text = await self._get_exact(request_key(model, messages, temperature, max_tokens))
+        if text is None:
+            self.misses += 1
+        return text
+
+    async def store(self, model: str, messages: list[dict[str, str]], temperature: float, max_tokens: int,
+                    text: str, latency_ms: float):
+        self.upstream_latency_ms += latency_ms
+        await self._set_exact(request_key(model, messages, temperature, max_tokens), text, latency_ms)
+
+    async def _generate(self, model, messages, temperature, max_tokens, key, generate) -> tuple[str | None, float]:
+        scope = vector = None
+        if self.semantic is not None and messages:
+            scope = _digest([model, messages[:-1], temperature, max_tokens])
+            vector = await self.semantic.embed_query(messages[-1].get("content", ""))
+            if vector is not None:
+                entry = self.semantic.get(scope, vector)
+                if entry is not None:
+                    return self._hit("semantic", *entry), entry[1]
+        self.misses += 1
+        start = time.monotonic()
+        text = await generate()
+        latency_ms = (time.monotonic() - start) * 1000
+        self.upstream_latency_ms += latency_ms
+        if text is None:
+            return None, latency_ms
+        await self._set_exact(key, text, latency_ms)
+        if vector is not None:
+            self.semantic.set(scope, vector, text, latency_ms)
+        return text, latency_ms
+
+    def stats(self) -> dict:
+        hits = sum(self.hits.values())
+        lookups = hits + self.misses
+        return {
+            "hits": dict(self.hits),
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 3) if lookups else None,
+            "saved_latency_ms": round(self.saved_latency_ms, 1),
+            "avg_upstream_latency_ms": round(self.upstream_latency_ms / self.misses, 1) if self.misses else None,
+            "memory_entries": len(self.memory),
+            "semantic_entries": len(self.semantic) if self.semantic is not None else None,
+            "disk": self.disk is not None,
+        }
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+        if self.semantic is not None:
+            self.semantic.clear()
+
+
+def cache_from_env(embed: Callable[[str], Awaitable[list[float] | None]]) -> ResponseCache | None:
+    """Builds the cache configured by the LLM_CACHE_* environment variables."""
+    if not LLM_CACHE_ENABLED:
+        return None
+    disk = SQLiteTier(LLM_CACHE_DB) if LLM_CACHE_DB else None
+    semantic = SemanticTier(embed) if LLM_CACHE_SEMANTIC_THRESHOLD > 0 else None
+    return ResponseCache(MemoryTier(), disk, semantic)
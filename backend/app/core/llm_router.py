@@ -0,0 +1,394 @@
+"""
+llm_router.py
+
+Routes chat completions by model name to Ollama or OpenAI-compatible backends.
+Each backend tracks an exponentially weighted moving average (EWMA) of its
+latency and error rate; requests go to the fastest healthy backend serving the
+model, fail over to the next one on errors, and are hedged with a second
+backend when the first has not answered within its recent p95 latency.
+Streamed completions are routed the same way but are not hedged, and fail over
+only until the first text has been yielded.
+
+Backends come from the LLM_BACKENDS environment variable, a JSON list such as
+    [{"name": "local", "kind": "ollama", "base_url": "http://gpu-box:11434",
+      "models": ["llama*", "*:*"], "aliases": {"gpt-3.5-turbo": "llama3.1"}},
+     {"name": "openai", "kind": "openai", "base_url": "https://api.openai.com/v1",
+      "models": ["gpt-*"]}]
+where "aliases" lets a backend serve other model names (globs allowed) with one
+of its own models, "exclude" lists names it must not be sent and "batch": true
+marks an OpenAI-compatible server that accepts a list of prompts on /completions
+(e.g. vLLM or llama.cpp), to which llm.py may send coalesced prompts. Without it,
+the OpenAI-compatible backend serves every model unless OLLAMA_HOST is set; then
+it serves gpt-* models and Ollama serves everything else (and gpt-* requests
+too when LLM_OLLAMA_FALLBACK_MODEL names a local model to use instead).
+"""
+
+import asyncio
+import collections
+import fnmatch
+import json
+import logging
+import os
+import time
+from typing import AsyncIterator
+
+import httpx
+
+EWMA_ALPHA = float(os.getenv("LLM_ROUTER_EWMA_ALPHA", "0.2"))
+# A backend whose error EWMA reaches this is skipped while others are healthy...
+ERROR_THRESHOLD = float(os.getenv("LLM_ROUTER_ERROR_THRESHOLD", "0.5"))
+# ...until this many seconds after its last failure, when it is tried again.
+COOLDOWN_SECONDS = float(os.getenv("LLM_ROUTER_COOLDOWN_SECONDS", "30"))
+HEDGE_PERCENTILE = 0.95
+# Hedge delay used until a backend has HEDGE_MIN_SAMPLES latencies recorded.
+HEDGE_DEFAULT_MS = float(os.getenv("LLM_ROUTER_HEDGE_DEFAULT_MS", "5000"))
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
+OPENAI_MODELS = ["gpt-*", "o1*", "o3*", "o4*"]
+
+
+class BackendError(Exception):
+    """Every backend that could serve the request failed."""
+
+
+class Backend:
+    def __init__(
+        self,
+        name: str,
+        kind: str,
+        base_url: str,
+        models: list[str],
+        aliases: dict[str, str] | None = None,
+        api_key: str | None = None,
+        exclude: list[str] | None = None,
+        batch: bool = False,
+    ):
+        if kind not in ("ollama", "openai"):
+            raise ValueError(f"Unsupported backend kind: {kind}")
+        if batch and kind != "openai":
+            raise ValueError("Only OpenAI-compatible backends can batch prompts")
+        self.name = name
+        self.kind = kind
+        self.base_url = base_url.rstrip("/")
+        self.models = models
+        self.aliases = aliases or {}
+        self.api_key = api_key
+        self.exclude = exclude or []
+        self.batch = batch
+        self.latency_ewma: float | None = None
+        self.error_ewma = 0.0
+        self.last_failure = 0.0
+        self.latencies = collections.deque(maxlen=LATENCY_WINDOW)
+        self.requests = 0
+        self.failures = 0
+        self.hedges_won = 0
+
+    def model_for(self, model: str) -> str | None:
+        """Returns the name this backend knows model by, or None if it cannot serve it."""
+        if any(fnmatch.fnmatchcase(model, pattern) for pattern in self.models) and not any(
+            fnmatch.fnmatchcase(model, pattern) for pattern in self.exclude
+        ):
+            return model
+        for pattern, target in self.aliases.items():
+            if fnmatch.fnmatchcase(model, pattern):
+                return target
+        return None
+
+    def healthy(self) -> bool:
+        return self.error_ewma < ERROR_THRESHOLD or time.time() - self.last_failure >= COOLDOWN_SECONDS
+
+    def hedge_delay(self) -> float:
+        if len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_MS / 1000
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * HEDGE_PERCENTILE))]
+
+    def record(self, latency: float | None, ok: bool):
+        self.requests += 1
+        self.error_ewma += EWMA_ALPHA * ((0.0 if ok else 1.0) - self.error_ewma)
+        if ok:
+            self.latencies.append(latency)
+            if self.latency_ewma is None:
+                self.latency_ewma = latency
+            else:
+                self.latency_ewma += EWMA_ALPHA * (latency - self.latency_ewma)
+        else:
+            self.failures += 1
+            self.last_failure = time.time()
+
+    async def chat(
+        self,
+        client: httpx.AsyncClient,
+        model: str,
+        messages: list[dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+    ) -> str:
+        if self.kind == "ollama":
+            response = await client.post(f"{self.base_url}/api/chat", json={
+                "model": model,
+                "messages": messages,
+                "stream": False,
+                "options": {"temperature": temperature, "num_predict": max_tokens},
+            })
+            response.raise_for_status()
+            return response.json()["message"]["content"].strip()
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        response = await client.post(f"{self.base_url}/chat/completions", headers=headers, json={
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+        })
+        response.raise_for_status()
+        return response.json()["choices"][0]["message"]["content"].strip()
+
+    async def complete_batch(
+        self,
+        client: httpx.AsyncClient,
+        model: str,
+        prompts: list[str],
+        temperature: float,
+        max_tokens: int,
+    ) -> list[str | None]:
+        """Completes several prompts with one /completions request (batch backends only)."""
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        response = await client.post(f"{self.base_url}/completions", headers=headers, json={
+            "model": model,
+            "prompt": prompts,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+        })
+        response.raise_for_status()
+        texts = [None] * len(prompts)
+        for choice in response.json()["choices"]:
+            texts[choice["index"]] = choice["text"].strip()
+        return texts
+
+    async def stream_chat(
+        self,
+        client: httpx.AsyncClient,
+        model: str,
+        messages: list[dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+    ) -> AsyncIterator[str]:
+        """Yields the completion's text deltas as they arrive."""
+        if self.kind == "ollama":
+            async with client.stream("POST", f"{self.base_url}/api/chat", json={
+                "model": model,
+                "messages": messages,
+                "stream": True,
+                "options": {"temperature": temperature, "num_predict": max_tokens},
+            }) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if "error" in chunk:
+                        raise ValueError(chunk["error"])
+                    delta = chunk.get("message", {}).get("content")
+                    if delta:
+                        yield delta
+                    if chunk.get("done"):
+                        break
+            return
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        async with client.stream("POST", f"{self.base_url}/chat/completions", headers=headers, json={
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": True,
+        }) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get("choices") or [{}]
+                delta = choices[0].get("delta", {}).get("content")
+                if delta:
+                    yield delta
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "base_url": self.base_url,
+            "healthy": self.healthy(),
+            "latency_ewma_ms": round(self.latency_ewma * 1000, 1) if self.latency_ewma is not None else None,
+            "error_ewma": round(self.error_ewma, 3),
+            "hedge_delay_ms": round(self.hedge_delay() * 1000, 1),
+            "requests": self.requests,
+            "failures": self.failures,
+            "hedges_won": self.hedges_won,
+        }
+
+
+class LLMRouter:
+    def __init__(self, backends: list[Backend], hedging: bool = True):
+        self.backends = backends
+        self.hedging = hedging
+        self.hedged = 0
+
+    def candidates(self, model: str) -> list[tuple[Backend, str]]:
+        """Backends able to serve model, healthy and fastest first.
+
+        Backends without latency samples yet sort first so they get measured.
+        """
+        serving = [(backend, backend.model_for(model)) for backend in self.backends]
+        serving = [(backend, name) for backend, name in serving if name is not None]
+        return sorted(serving, key=lambda item: (
+            not item[0].healthy(),
+            item[0].latency_ewma if item[0].latency_ewma is not None else 0.0,
+        ))
+
+    async def _attempt(self, client, backend, backend_model, messages, temperature, max_tokens) -> str:
+        start = time.monotonic()
+        try:
+            text = await backend.chat(client, backend_model, messages, temperature, max_tokens)
+        except asyncio.CancelledError:
+            # The losing side of a hedge; neither a success nor a failure.
+            raise
+        except Exception as e:
+            backend.record(None, False)
+            logging.error(f"LLM backend {backend.name} failed for {backend_model}: {e}")
+            raise
+        backend.record(time.monotonic() - start, True)
+        return text
+
+    async def chat(
+        self,
+        client: httpx.AsyncClient,
+        model: str,
+        messages: list[dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: int = 1000,
+    ) -> str:
+        """Returns the first successful completion, raising BackendError if all fail."""
+        queue = self.candidates(model)
+        if not queue:
+            raise BackendError(f"No LLM backend serves model {model}")
+        running: dict[asyncio.Task, Backend] = {}
+
+        def launch():
+            backend, backend_model = queue.pop(0)
+            task = asyncio.create_task(
+                self._attempt(client, backend, backend_model, messages, temperature, max_tokens)
+            )
+            running[task] = backend
+            return backend
+
+        try:
+            primary = launch()
+            hedge_at = time.monotonic() + primary.hedge_delay()
+            while running:
+                timeout = None
+                if self.hedging and queue and len(running) == 1:
+                    timeout = max(0.0, hedge_at - time.monotonic())
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # The request is slower than the backend's p95: hedge it.
+                    self.hedged += 1
+                    launch()
+                    continue
+                for task in done:
+                    backend = running.pop(task)
+                    if task.exception() is None:
+                        if backend is not primary:
+                            backend.hedges_won += 1
+                        return task.result()
+                if not running and queue:
+                    # Every attempt so far failed: fail over to the next backend.
+                    launch()
+                    hedge_at = time.monotonic() + running[next(iter(running))].hedge_delay()
+            raise BackendError(f"Every LLM backend failed for model {model}")
+        finally:
+            for task in running:
+                task.cancel()
+
+    def batch_backend(self, model: str) -> tuple[Backend, str] | None:
+        """The backend model would be routed to and its name there, if that backend batches prompts."""
+        candidates = self.candidates(model)
+        if candidates and candidates[0][0].batch:
+            return candidates[0]
+        return None
+
+    async def complete_batch(
+        self,
+        client: httpx.AsyncClient,
+        backend: Backend,
+        model: str,
+        prompts: list[str],
+        temperature: float = 0.7,
+        max_tokens: int = 1000,
+    ) -> list[str | None]:
+        """Sends a batch to backend (from batch_backend), recording its latency and errors."""
+        start = time.monotonic()
+        try:
+            texts = await backend.complete_batch(client, model, prompts, temperature, max_tokens)
+        except Exception as e:
+            backend.record(None, False)
+            logging.error(f"LLM backend {backend.name} failed a batch for {model}: {e}")
+            raise
+        backend.record(time.monotonic() - start, True)
+        return texts
+
+    async def stream_chat(
+        self,
+        client: httpx.AsyncClient,
+        model: str,
+        messages: list[dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: int = 1000,
+    ) -> AsyncIterator[str]:
+        """Yields text deltas from the first backend that answers, raising
+        BackendError if all fail before any text was sent."""
+        queue = self.candidates(model)
+        if not queue:
+            raise BackendError(f"No LLM backend serves model {model}")
+        for backend, backend_model in queue:
+            start = time.monotonic()
+            started = False
+            try:
+                async for delta in backend.stream_chat(client, backend_model, messages, temperature, max_tokens):
+                    started = True
+                    yield delta
+            except Exception as e:
+                backend.record(None, False)
+                logging.error(f"LLM backend {backend.name} failed streaming {backend_model}: {e}")
+                if started:
+                    # The caller already has part of this answer; another
+                    # backend would start a different one.
+                    raise
+                continue
+            backend.record(time.monotonic() - start, True)
+            return
+        raise BackendError(f"Every LLM backend failed for model {model}")
+
+    def stats(self) -> dict:
+        return {"hedged": self.hedged, "backends": [backend.stats() for backend in self.backends]}
+
+
+def backends_from_env(openai_base_url: str, openai_api_key: str | None, ollama_host: str | None,
+                      openai_batch: bool = False) -> list[Backend]:
+    """Builds the backends configured by LLM_BACKENDS, or the defaults described above.
+
+    openai_batch marks the default OpenAI-compatible backend as accepting batched prompts.
+    """
+    configured = os.getenv("LLM_BACKENDS")
+    if configured:
+        return [Backend(**backend) for backend in json.loads(configured)]
+    if not ollama_host:
+        return [Backend("openai", "openai", openai_base_url, ["*"], api_key=openai_api_key, batch=openai_batch)]
+    fallback = os.getenv("LLM_OLLAMA_FALLBACK_MODEL")
+    aliases = {pattern: fallback for pattern in OPENAI_MODELS} if fallback else {}
+    return [
+        Backend("openai", "openai", openai_base_url, OPENAI_MODELS, api_key=openai_api_key, batch=openai_batch),
+        # Ollama serves every model OpenAI does not, plus aliased gpt-* requests.
+        Backend("ollama", "ollama", ollama_host, ["*"], aliases, exclude=OPENAI_MODELS),
+    ]
@@ -1,18 +1,302 @@
-# backend/app/core/scraping.py
+"""
+scraping.py
+
+Fetches web pages and extracts their visible text.
+
+scrape_url_async is for async callers: it shares one pooled httpx.AsyncClient,
+sends at most SCRAPE_PER_HOST_CONCURRENCY requests to any one host at a time, and
+revalidates pages it has fetched before with If-None-Match/If-Modified-Since,
+answering 304 Not Modified from an SQLite page cache opened on first use. Text is
+extracted in a worker thread, off the event loop, with selectolax if it is
+installed, else with lxml (through a parser target, without building a tree), else
+with BeautifulSoup's html.parser; SCRAPE_PARSER overrides the choice. scrape_url
+remains for non-async code.
+"""
+
+import asyncio
+import importlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit
+
+import httpx
 import requests
 from bs4 import BeautifulSoup
-import logging
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+SCRAPE_TIMEOUT = float(os.getenv("SCRAPE_TIMEOUT", "10"))
+SCRAPE_MAX_CONNECTIONS = int(os.getenv("SCRAPE_MAX_CONNECTIONS", "100"))
+SCRAPE_PER_HOST_CONCURRENCY = int(os.getenv("SCRAPE_PER_HOST_CONCURRENCY", "8"))
+# Bodies are cut off after this many bytes; the text up to there is kept.
+SCRAPE_MAX_BYTES = int(os.getenv("SCRAPE_MAX_BYTES", str(10 * 1024 * 1024)))
+# SQLite file for the page cache; empty disables conditional requests.
+SCRAPE_CACHE_DB = os.getenv("SCRAPE_CACHE_DB", os.path.join("data", "cache", "scrape_cache.db"))
+# "auto", "selectolax", "lxml" or "html.parser".
+SCRAPE_PARSER = os.getenv("SCRAPE_PARSER", "auto")
+# Tags whose text is not part of the page's content.
+SKIPPED_TAGS = ("script", "style")
+
+_client: httpx.AsyncClient | None = None
+_client_loop: asyncio.AbstractEventLoop | None = None
+_host_semaphores: dict[str, asyncio.Semaphore] = {}
+_parser: str | None = None
+_page_cache_lock = threading.Lock()
+
+stats = {"fetched": 0, "not_modified": 0, "errors": 0, "bytes": 0}
+
+
+class PageCache:
+    """Validators and extracted text of fetched pages, keyed by URL."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._db() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, "
+                "text TEXT NOT NULL, fetched_at REAL NOT NULL)"
+            )
+
+    def _db(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads.
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = sqlite3.connect(self.path, timeout=10)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def get(self, url: str) -> tuple[str | None, str | None, str] | None:
+        row = self._db().execute(
+            "SELECT etag, last_modified, text FROM pages WHERE url = ?", (url,)
+        ).fetchone()
+        return tuple(row) if row else None
+
+    def set(self, url: str, etag: str | None, last_modified: str | None, text: str):
+        with self._db() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?)",
+                (url, etag, last_modified, text, time.time()),
+            )
+
+    def clear(self):
+        with self._db() as db:
+            db.execute("DELETE FROM pages")
+
+
+# Opened by get_page_cache(), so importing this module creates no files.
+page_cache: PageCache | None = None
+
+
+def get_page_cache() -> PageCache | None:
+    """Returns the page cache, opening SCRAPE_CACHE_DB on first call; None if disabled."""
+    global page_cache
+    with _page_cache_lock:
+        if page_cache is None and SCRAPE_CACHE_DB:
+            page_cache = PageCache(SCRAPE_CACHE_DB)
+    return page_cache
+
+
+def get_parser() -> str:
+    """Returns the text extractor in use, resolving "auto" on first call."""
+    global _parser
+    if _parser is None:
+        _parser = SCRAPE_PARSER
+        if _parser == "auto":
+            _parser = "html.parser"
+            for name, module in (("selectolax", "selectolax.lexbor"), ("lxml", "lxml.etree")):
+                try:
+                    importlib.import_module(module)
+                except ImportError:
+                    continue
+                _parser = name
+                break
+    return _parser
+
+
+class _TextTarget:
+    """lxml parser target collecting text outside SKIPPED_TAGS."""
+
+    def __init__(self):
+        self.parts = []
+        self._buffer = []
+        self._skipping = 0
+
+    def _flush(self):
+        text = "".join(self._buffer).strip()
+        self._buffer.clear()
+        if text:
+            self.parts.append(text)
+
+    def start(self, tag, attrib):
+        self._flush()
+        if tag in SKIPPED_TAGS:
+            self._skipping += 1
+
+    def end(self, tag):
+        self._flush()
+        if tag in SKIPPED_TAGS and self._skipping:
+            self._skipping -= 1
+
+    def data(self, data):
+        if not self._skipping:
+            self._buffer.append(data)
+
+    def close(self) -> str:
+        self._flush()
+        return " ".join(self.parts)
+
+
+def _lxml_text(content: bytes, encoding: str | None) -> str:
+    from lxml import etree
+
+    # Left to itself, libxml2 assumes Latin-1 rather than UTF-8.
+    parser = etree.HTMLParser(target=_TextTarget(), encoding=encoding or "utf-8")
+    parser.feed(content)
+    try:
+        return parser.close()
+    except etree.XMLSyntaxError:
+        # Raised for an empty document.
+        return ""
+
+
+def extract_text(content: bytes, parser: str | None = None, encoding: str | None = None) -> str:
+    """Returns the visible text of an HTML document, separated by single spaces.
+
+    encoding is the charset the server declared; if it is not one Python knows,
+    the parser detects the encoding itself.
+    """
+    parser = parser or get_parser()
+    try:
+        return _extract_text(content, parser, encoding)
+    except (LookupError, ValueError) as e:
+        if encoding is None:
+            raise
+        logging.warning(f"Ignoring charset {encoding!r}: {e}")
+        return _extract_text(content, parser, None)
+
+
+def _extract_text(content: bytes, parser: str, encoding: str | None) -> str:
+    if parser == "selectolax":
+        from selectolax.lexbor import LexborHTMLParser
+
+        # Given bytes, lexbor detects the encoding itself.
+        tree = LexborHTMLParser(content.decode(encoding, errors="replace") if encoding else content)
+        tree.strip_tags(list(SKIPPED_TAGS))
+        if tree.root is None:
+            return ""
+        # Whitespace-only text nodes come back as empty pieces; drop them.
+        pieces = tree.root.text(separator="\0", strip=True).split("\0")
+        return " ".join(piece for piece in pieces if piece)
+    if parser == "lxml":
+        return _lxml_text(content, encoding)
+    return BeautifulSoup(content, "html.parser").get_text(separator=" ", strip=True)
+
 
 def scrape_url(url: str) -> str | None:
     try:
-        response = requests.get(url, timeout=10)
+        response = requests.get(url, timeout=SCRAPE_TIMEOUT)
         response.raise_for_status()
-        soup = BeautifulSoup(response.content, "html.parser")
-        text_content = soup.get_text(separator=" ", strip=True)
-        return text_content
+        return extract_text(response.content)
     except requests.exceptions.RequestException as e:
         logging.error(f"Error during web scraping: {e}")
         return None
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Returns the shared HTTP client for the running event loop."""
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop:
+        # Clients and semaphores are bound to the loop they were created on.
+        _client = httpx.AsyncClient(
+            timeout=SCRAPE_TIMEOUT,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=SCRAPE_MAX_CONNECTIONS,
+                max_keepalive_connections=SCRAPE_MAX_CONNECTIONS,
+            ),
+        )
+        _client_loop = loop
+        _host_semaphores.clear()
+    return _client
+
+
+async def close_async_client() -> None:
+    global _client, _client_loop
+    if _client is not None:
+        await _client.aclose()
+    _client = None
+    _client_loop = None
+
+
+def _host_semaphore(host: str) -> asyncio.Semaphore:
+    semaphore = _host_semaphores.get(host)
+    if semaphore is None:
+        semaphore = _host_semaphores[host] = asyncio.Semaphore(SCRAPE_PER_HOST_CONCURRENCY)
+    return semaphore
+
+
+async def _read_text(response: httpx.Response) -> str:
+    chunks = []
+    size = 0
+    async for chunk in response.aiter_bytes():
+        chunk = chunk[:SCRAPE_MAX_BYTES - size]
+        size += len(chunk)
+        chunks.append(chunk)
+        if size >= SCRAPE_MAX_BYTES:
+            logging.warning(f"Truncated {response.url} at {SCRAPE_MAX_BYTES} bytes")
+            break
+    stats["bytes"] += size
+    # Parsing is CPU-bound; keep it off the event loop.
+    return await asyncio.to_thread(extract_text, b"".join(chunks), get_parser(), response.charset_encoding)
+
+
+async def scrape_url_async(url: str) -> str | None:
+    """Returns the text of the page at url, or None if it could not be fetched."""
+    client = get_async_client()
+    cached = None
+    try:
+        cache = await asyncio.to_thread(get_page_cache)
+        if cache is not None:
+            cached = await asyncio.to_thread(cache.get, url)
+    except (sqlite3.Error, OSError) as e:
+        cache = None
+        logging.error(f"Error reading page cache: {e}")
+    headers = {}
+    if cached is not None:
+        etag, last_modified, _ = cached
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+    try:
+        async with _host_semaphore(urlsplit(url).netloc):
+            async with client.stream("GET", url, headers=headers) as response:
+                if response.status_code == 304 and cached is not None:
+                    # Read the (empty) body so the connection goes back to the pool.
+                    await response.aread()
+                    stats["not_modified"] += 1
+                    return cached[2]
+                response.raise_for_status()
+                text = await _read_text(response)
+                etag = response.headers.get("ETag")
+                last_modified = response.headers.get("Last-Modified")
+    except httpx.HTTPError as e:
+        stats["errors"] += 1
+        logging.error(f"Error during web scraping: {e}")
+        return None
+    stats["fetched"] += 1
+    if cache is not None and (etag or last_modified):
+        try:
+            await asyncio.to_thread(cache.set, url, etag, last_modified, text)
+        except sqlite3.Error as e:
+            logging.error(f"Error writing page cache: {e}")
+    return text
@@ -0,0 +1,156 @@
+"""
+summarizer.py
+
+Summarizes documents of any length with a map-reduce pipeline. The text is split
+into chunks of at most SUMMARY_CHUNK_TOKENS tokens, each chunk is summarized (at
+most SUMMARY_CONCURRENCY at a time per document), and the chunk summaries are
+combined, in as many rounds as it takes to fit one prompt, into one summary.
+
+Chunk boundaries are content-defined: once a chunk holds SUMMARY_MIN_CHUNK_TOKENS,
+it ends after the first sentence whose hash marks it as a boundary. An edit then
+only moves the boundaries of the chunks around it, and every other chunk keeps
+the summary cached under the hash of its prompt.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import re
+from typing import Iterator
+
+from backend.app.core import llm_cache
+from backend.app.core.llm import generate_text_async
+
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "2000"))
+SUMMARY_MIN_CHUNK_TOKENS = int(os.getenv("SUMMARY_MIN_CHUNK_TOKENS", "1000"))
+# Past the minimum, about one sentence in this many ends a chunk.
+SUMMARY_BOUNDARY_SENTENCES = 8
+SUMMARY_MAX_TOKENS = int(os.getenv("SUMMARY_MAX_TOKENS", "300"))
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", "8"))
+SUMMARY_CACHE_MAX_ENTRIES = int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", "20000"))
+SUMMARY_CACHE_TTL = float(os.getenv("SUMMARY_CACHE_TTL", str(7 * 24 * 3600)))
+# SQLite file for chunk summaries to survive restarts; unset keeps them in memory.
+SUMMARY_CACHE_DB = os.getenv("SUMMARY_CACHE_DB")
+# Token estimate used when tiktoken is not installed.
+CHARS_PER_TOKEN = 4
+
+DOCUMENT_PROMPT = "Summarize the following document in a concise and clear manner:\n\n{text}\n\nSummary:"
+CHUNK_PROMPT = "Summarize the following part of a longer document in a concise and clear manner:\n\n{text}\n\nSummary:"
+COMBINE_PROMPT = ("The following are summaries of consecutive parts of one document. "
+                  "Combine them into a single concise and clear summary:\n\n{text}\n\nSummary:")
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_encoding = None
+
+# Chunk summaries are cached apart from llm.response_cache: they are worth
+# keeping much longer, and a large document would flush everything else.
+summary_cache = llm_cache.ResponseCache(
+    llm_cache.MemoryTier(SUMMARY_CACHE_MAX_ENTRIES, SUMMARY_CACHE_TTL),
+    llm_cache.SQLiteTier(SUMMARY_CACHE_DB, SUMMARY_CACHE_TTL) if SUMMARY_CACHE_DB else None,
+)
+
+
+def _tiktoken_encoding():
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except ImportError:
+            _encoding = False
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Counts tokens with tiktoken if it is installed, else estimates them."""
+    encoding = _tiktoken_encoding()
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def _sentences(text: str, max_tokens: int) -> Iterator[tuple[str, int]]:
+    """Yields (sentence, tokens), breaking sentences over max_tokens between words."""
+    for sentence in _SENTENCE_END.split(text.strip()):
+        tokens = count_tokens(sentence)
+        if tokens <= max_tokens:
+            if sentence:
+                yield sentence, tokens
+            continue
+        piece, size = [], 0
+        for word in sentence.split():
+            word_tokens = count_tokens(" " + word)
+            if piece and size + word_tokens > max_tokens:
+                yield " ".join(piece), size
+                piece, size = [], 0
+            piece.append(word)
+            size += word_tokens
+        if piece:
+            yield " ".join(piece), size
+
+
+def _is_boundary(sentence: str) -> bool:
+    digest = hashlib.blake2b(sentence.encode("utf-8"), digest_size=4).digest()
+    return int.from_bytes(digest, "little") % SUMMARY_BOUNDARY_SENTENCES == 0
+
+
+def split_text(text: str, max_tokens: int = SUMMARY_CHUNK_TOKENS,
+               min_tokens: int = SUMMARY_MIN_CHUNK_TOKENS) -> list[str]:
+    """Splits text at sentence ends into chunks of at most max_tokens tokens."""
+    chunks, chunk, size = [], [], 0
+    for sentence, tokens in _sentences(text, max_tokens):
+        if chunk and size + tokens > max_tokens:
+            chunks.append(" ".join(chunk))
+            chunk, size = [], 0
+        chunk.append(sentence)
+        size += tokens
+        if size >= min_tokens and _is_boundary(sentence):
+            chunks.append(" ".join(chunk))
+            chunk, size = [], 0
+    if chunk:
+        chunks.append(" ".join(chunk))
+    return chunks
+
+
+async def _summarize(template: str, text: str, model: str, temperature: float) -> str | None:
+    prompt = template.format(text=text)
+
+    async def generate() -> str | None:
+        return await generate_text_async(prompt, model, temperature, SUMMARY_MAX_TOKENS, cache=False)
+
+    messages = [{"role": "user", "content": prompt}]
+    return await summary_cache.get_or_generate(model, messages, temperature, SUMMARY_MAX_TOKENS, generate)
+
+
+async def summarize_text(text: str, model: str = "gpt-3.5-turbo", temperature: float = 0.7,
+                         concurrency: int = SUMMARY_CONCURRENCY) -> str | None:
+    """Returns a summary of text, or None if it is empty or an LLM call failed."""
+    chunks = split_text(text)
+    if not chunks:
+        return None
+    if len(chunks) == 1:
+        return await _summarize(DOCUMENT_PROMPT, chunks[0], model, temperature)
+
+    # The per-model limit in llm.py still bounds requests across documents.
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def summarize_all(template: str, parts: list[str]) -> list[str | None]:
+        async def summarize_part(part: str) -> str | None:
+            async with semaphore:
+                return await _summarize(template, part, model, temperature)
+
+        return await asyncio.gather(*(summarize_part(part) for part in parts))
+
+    summaries = await summarize_all(CHUNK_PROMPT, chunks)
+    while None not in summaries:
+        combined = "\n\n".join(summaries)
+        groups = split_text(combined)
+        if len(groups) == 1:
+            return await _summarize(COMBINE_PROMPT, combined, model, temperature)
+        if len(groups) >= len(summaries):
+            logging.error("Chunk summaries do not shrink; is SUMMARY_MAX_TOKENS below SUMMARY_CHUNK_TOKENS?")
+            return None
+        # Too long for one prompt: combine neighbouring summaries first.
+        summaries = await summarize_all(COMBINE_PROMPT, groups)
+    return None
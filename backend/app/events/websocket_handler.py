@@ -17,7 +17,7 @@ class WebSocketManager:
         print(f"Client connected: {websocket.client} for user {user}")
 
     def disconnect(self, websocket: WebSocket, user: str):
-        if user in self.active_connections:
+        if websocket in self.active_connections.get(user, []):
             self.active_connections[user].remove(websocket)
             print(f"Client disconnected: {websocket.client} for user {user}")
             if not self.active_connections[user]:
@@ -35,5 +35,15 @@ class WebSocketManager:
             for connection in self.active_connections[user]:
                 await connection.send_text(message)
 
+    async def send_json(self, payload: dict, user: str):
+        """Sends payload to every connection of user, dropping ones that fail."""
+        message = json.dumps(payload)
+        for connection in list(self.active_connections.get(user, [])):
+            try:
+                await connection.send_text(message)
+            except Exception as e:
+                print(f"Dropping websocket {connection.client} for user {user}: {e}")
+                self.disconnect(connection, user)
+
 
 websocket_manager = WebSocketManager()
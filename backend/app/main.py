@@ -1,4 +1,6 @@
 # backend/app/main.py
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -23,13 +25,22 @@ from backend.app.api import (
     travel,
     websocket,
 )
+from backend.app.core import scraping
 from backend.app.core.config import settings
+from backend.app.core.llm import close_async_client
 from backend.app.db.database import Base, engine
 
 Base.metadata.create_all(bind=engine)
 
 
-app = FastAPI(title=settings.PROJECT_NAME)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await close_async_client()
+    await scraping.close_async_client()
+
+
+app = FastAPI(title=settings.PROJECT_NAME, lifespan=lifespan)
 
 origins = ["*"]  # for testing - should be limited in production
 
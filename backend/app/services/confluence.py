@@ -1,14 +1,62 @@
 # backend/app/services/confluence.py
+import asyncio
 import os
 from typing import List
 
 from atlassian import Confluence
+from bs4 import BeautifulSoup
+from fastapi import Depends
 from sqlalchemy.orm import Session
 
 from backend.app.core.config import settings
-from backend.app.core.llm import generate_text
+from backend.app.core.llm import generate_embeddings_async
 from backend.app.core.utils import get_current_time
 from backend.app.db.database import get_db
+from backend.knowledge_graph import KnowledgeGraph
+
+CONFLUENCE_GRAPH_PATH = os.getenv(
+    "CONFLUENCE_GRAPH_PATH", os.path.join(settings.HOST_WORKSPACE, "confluence_graph")
+)
+CHUNK_CHARS = 2000
+
+_graph = None
+
+
+def get_confluence_graph() -> KnowledgeGraph:
+    """Returns the graph of indexed pages and chunks, loading the snapshot once."""
+    global _graph
+    if _graph is None:
+        if os.path.exists(CONFLUENCE_GRAPH_PATH):
+            _graph = KnowledgeGraph.load(CONFLUENCE_GRAPH_PATH)
+        else:
+            _graph = KnowledgeGraph()
+            _graph.create_index("type")
+            _graph.create_index("space")
+    return _graph
+
+
+def chunk_text(text: str, max_chars: int = CHUNK_CHARS) -> List[str]:
+    """Splits text into chunks of at most max_chars on word boundaries."""
+    chunks, current, length = [], [], 0
+    for word in text.split():
+        if current and length + len(word) + 1 > max_chars:
+            chunks.append(" ".join(current))
+            current, length = [], 0
+        current.append(word)
+        length += len(word) + 1
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def remove_stale_chunks(graph: KnowledgeGraph, page_node: str, num_chunks: int) -> int:
+    """Removes the page's chunk nodes numbered num_chunks and up, left over from
+    an earlier, longer version of the page. Returns how many were removed."""
+    stale = []
+    while f"{page_node}:{num_chunks + len(stale)}" in graph.nodes:
+        stale.append(f"{page_node}:{num_chunks + len(stale)}")
+    graph.remove_nodes(stale)
+    return len(stale)
 
 
 async def index_confluence(user: str, db: Session = Depends(get_db)):
@@ -17,6 +65,8 @@ async def index_confluence(user: str, db: Session = Depends(get_db)):
     if not confluence_url or not confluence_api_token:
         return {"message": "Confluence credentials missing."}
     confluence_client = Confluence(url=confluence_url, token=confluence_api_token)
+    graph = get_confluence_graph()
+    indexed_chunks = 0
     space_keys = confluence_client.get_all_spaces()
     for space in space_keys:
         space_key = space["key"]
@@ -37,15 +87,66 @@ async def index_confluence(user: str, db: Session = Depends(get_db)):
                     separator=" ", strip=True
                 )
                 if text_content:
-                    embedding_prompt = f"Generate a vector embedding for the following Confluence page text: {text_content}"
-                    embedding = generate_text(embedding_prompt)
-                    if embedding:
-                        # db_record = DBRecord(type="confluence", text=text_content, embedding = embedding, source=page_id, user_id=1)
-                        # db.add(db_record)
-                        # db.commit()
+                    chunks = chunk_text(text_content)
+                    embeddings = await generate_embeddings_async(chunks)
+                    if embeddings:
+                        page_node = f"confluence:{page_id}"
+                        graph.add_node(
+                            page_node,
+                            {
+                                "type": "confluence_page",
+                                "space": space_key,
+                                "title": page_content["title"],
+                            },
+                        )
+                        chunk_nodes = []
+                        for i, chunk in enumerate(chunks):
+                            chunk_node = f"{page_node}:{i}"
+                            graph.add_node(
+                                chunk_node,
+                                {
+                                    "type": "confluence_chunk",
+                                    "space": space_key,
+                                    "page_id": page_id,
+                                    "title": page_content["title"],
+                                    "text": chunk,
+                                },
+                            )
+                            graph.add_edge(page_node, chunk_node, {"relation": "chunk"})
+                            chunk_nodes.append(chunk_node)
+                        graph.set_embeddings(chunk_nodes, embeddings)
+                        remove_stale_chunks(graph, page_node, len(chunk_nodes))
+                        indexed_chunks += len(chunk_nodes)
                         print(f"Indexed page: {page_content['title']} (ID: {page_id})")
                     else:
                         print(
                             f"Failed to generate embeddings for Confluence page {page_id}."
                         )
-    return {"message": f"Confluence indexing initiated at {get_current_time()}"}
+    # Training the IVF index and writing the snapshot are CPU- and disk-bound;
+    # keep them off the event loop.
+    await asyncio.to_thread(graph.build_vector_index)
+    await asyncio.to_thread(graph.save, CONFLUENCE_GRAPH_PATH)
+    return {
+        "message": f"Confluence indexing initiated at {get_current_time()}",
+        "indexed_chunks": indexed_chunks,
+    }
+
+
+async def search_confluence(query: str, k: int = 5, space: str | None = None):
+    """Returns the k indexed chunks most similar to query."""
+    graph = get_confluence_graph()
+    embeddings = await generate_embeddings_async([query])
+    if not embeddings:
+        return []
+    criteria = {"type": "confluence_chunk"}
+    if space:
+        criteria["space"] = space
+    return [
+        {
+            "page_id": graph.nodes[node_id]["page_id"],
+            "title": graph.nodes[node_id]["title"],
+            "text": graph.nodes[node_id]["text"],
+            "score": score,
+        }
+        for node_id, score in graph.similar_nodes(embeddings[0], k, **criteria)
+    ]
@@ -1,13 +1,114 @@
 # backend/app/services/document.py
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from typing import AsyncIterator
+from urllib.parse import urlsplit, urlunsplit
+
 from backend.app.core.config import settings
-from backend.app.core.llm import generate_text
-from backend.app.core.scraping import scrape_url
+from backend.app.core.summarizer import summarize_text
+from backend.app.core.scraping import scrape_url_async
+
+# URLs that summarize_documents fetches and summarizes at once. Finished
+# results wait in a queue of the same size, so a client that reads slowly
+# holds the pipeline back instead of piling results up in memory.
+BATCH_CONCURRENCY = int(os.getenv("DOCUMENT_BATCH_CONCURRENCY", "16"))
+BATCH_MAX_URLS = int(os.getenv("DOCUMENT_BATCH_MAX_URLS", "500"))
 
 
 async def summarize_document(url: str, user: str) -> str:
-    content = scrape_url(url)
+    content = await scrape_url_async(url)
     if content:
-        prompt = f"Summarize this document: {content}"
-        return generate_text(prompt) or "Could not generate summary"
+        return await summarize_text(content) or "Could not generate summary"
     else:
         return "Could not scrape the given URL"
+
+
+def normalize_url(url: str) -> str | None:
+    """Returns url with a lowercase scheme and host and no fragment, or None if
+    it is not an http(s) URL."""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    if scheme not in ("http", "https") or not parts.netloc:
+        return None
+    return urlunsplit((scheme, parts.netloc.lower(), parts.path or "/", parts.query, ""))
+
+
+async def summarize_documents(urls: list[str], summarize: bool = True,
+                              concurrency: int = BATCH_CONCURRENCY) -> AsyncIterator[dict]:
+    """Yields a result per distinct URL as soon as it is ready, then a {"done"} line.
+
+    A result is {"url", "summary"} ({"url", "text"} when summarize is False) or
+    {"url", "error"}. A page whose text matches an earlier page's is not
+    summarized again: its result carries "same_content_as" that page's URL
+    (and its summary, but not its text).
+    """
+    start = time.monotonic()
+    unique = list(dict.fromkeys(normalize_url(url) or url for url in urls))
+    pending = asyncio.Queue()
+    for url in unique:
+        pending.put_nowait(url)
+    results = asyncio.Queue(maxsize=concurrency)
+    by_content: dict[str, tuple[str, asyncio.Future]] = {}
+
+    async def process(url: str) -> dict:
+        if normalize_url(url) is None:
+            return {"url": url, "error": "Not an http(s) URL."}
+        content = await scrape_url_async(url)
+        if not content:
+            return {"url": url, "error": "Could not scrape content from the provided URL."}
+        digest = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        first = by_content.get(digest)
+        if first is not None:
+            result = {"url": url, "same_content_as": first[0]}
+            if not summarize:
+                return result
+            summary = await asyncio.shield(first[1])
+        elif not summarize:
+            by_content[digest] = (url, None)
+            return {"url": url, "text": content}
+        else:
+            future = asyncio.get_running_loop().create_future()
+            by_content[digest] = (url, future)
+            result = {"url": url}
+            summary = None
+            try:
+                summary = await summarize_text(content)
+            finally:
+                future.set_result(summary)
+        if not summary:
+            return {**result, "error": "LLM failed to generate a summary."}
+        return {**result, "summary": summary}
+
+    async def work():
+        while not pending.empty():
+            url = pending.get_nowait()
+            try:
+                result = await process(url)
+            except Exception as e:
+                logging.error(f"Error summarizing {url}: {e}")
+                result = {"url": url, "error": "Could not summarize the document."}
+            await results.put(result)
+
+    workers = [asyncio.create_task(work()) for _ in range(min(concurrency, len(unique)))]
+    failed = same_content = 0
+    try:
+        for _ in unique:
+            result = await results.get()
+            failed += "error" in result
+            same_content += "same_content_as" in result
+            yield result
+    finally:
+        # Also reached when the client disconnects mid-stream.
+        for worker in workers:
+            worker.cancel()
+    yield {
+        "done": True,
+        "requested": len(urls),
+        "distinct": len(unique),
+        "same_content": same_content,
+        "failed": failed,
+        "total_ms": round((time.monotonic() - start) * 1000, 1),
+    }
@@ -12,7 +12,7 @@ from googleapiclient.discovery import build
 from sqlalchemy.orm import Session
 
 from backend.app.core.config import settings
-from backend.app.core.llm import generate_text
+from backend.app.core.llm import generate_text_async
 from backend.app.db.database import get_db
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -96,7 +96,8 @@ async def draft_reply(emailId: str, user: str) -> str:
         # For simplicity, use the snippet as a proxy for content
         email_content = msg_data.get('snippet', '')
         prompt = f"Draft a concise and professional email reply to the email below.\n\nSubject: {subject}\nFrom: {sender}\nContent: {email_content}\n\nDraft Reply:"
-        reply_text = generate_text(prompt)
+        # Redrafting the same email reuses the cached reply.
+        reply_text = await generate_text_async(prompt, cache=True)
         if not reply_text:
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                                 detail="LLM could not generate a reply")
@@ -7,7 +7,7 @@ from jira import JIRA
 from sqlalchemy.orm import Session
 
 from backend.app.core.config import settings
-from backend.app.core.llm import generate_text
+from backend.app.core.llm import generate_text_async
 from backend.app.db.database import get_db
 from backend.app.db.models import JIRAIssue
 
@@ -51,7 +51,8 @@ async def draft_comment(issue_id: str, user: str) -> str | None:
         jira_client = JIRA(options=jira_options, token_auth=jira_api_token)
         issue = jira_client.issue(issue_id)
         prompt = f"Draft a concise and professional comment for the following JIRA issue:\nSummary: {issue.fields.summary}\nDescription: {issue.fields.description}"
-        return generate_text(prompt)
+        # Redrafting an unchanged issue reuses the cached comment.
+        return await generate_text_async(prompt, cache=True)
     except Exception as e:
         print(f"Error during jira draft comment: {e}")
         return "An error occurred while drafting a comment."
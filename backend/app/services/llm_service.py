@@ -1,7 +1,7 @@
 # backend/app/services/llm_service.py
 from typing import Dict, List
 
-from backend.app.core.llm import generate_chat, generate_text
+from backend.app.core.llm import generate_chat_async, generate_text_async
 
 
 async def generate_text_from_service(
@@ -10,7 +10,7 @@ async def generate_text_from_service(
     temperature: float = 0.7,
     max_tokens: int = 1000,
 ) -> str | None:
-    return generate_text(prompt, model, temperature, max_tokens)
+    return await generate_text_async(prompt, model, temperature, max_tokens)
 
 
 async def generate_chat_from_service(
@@ -19,4 +19,4 @@ async def generate_chat_from_service(
     temperature: float = 0.7,
     max_tokens: int = 1000,
 ) -> str | None:
-    return generate_chat(messages, model, temperature, max_tokens)
+    return await generate_chat_async(messages, model, temperature, max_tokens)
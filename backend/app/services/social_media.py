@@ -6,7 +6,7 @@ from fastapi import Depends
 from sqlalchemy.orm import Session
 
 from backend.app.core.config import settings
-from backend.app.core.llm import generate_text
+from backend.app.core.llm import generate_text_async
 from backend.app.db.database import get_db
 from backend.app.db.models import SocialMediaPost
 
@@ -21,7 +21,8 @@ async def fetch_posts(user: str, db: Session = Depends(get_db)) -> List[Dict[str
 
 async def draft_post(user: str) -> str | None:
     prompt = f"Draft a social media post"
-    return generate_text(prompt)
+    # The prompt is fixed, so repeated drafts reuse the cached post.
+    return await generate_text_async(prompt, cache=True)
 
 
 async def publish_post(post: str, user: str) -> str:
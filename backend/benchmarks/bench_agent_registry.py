@@ -0,0 +1,91 @@
+# backend/benchmarks/bench_agent_registry.py
+"""
+bench_agent_registry.py
+
+Creates many agents in the old unbounded dict and in the bounded
+AgentRegistry, then reports retained memory and lookup latency for live
+(cache hit) and evicted (rehydrated from SQLite) agents.
+
+Usage:
+    python -m backend.benchmarks.bench_agent_registry --agents 50000 --max_live 256
+"""
+
+import argparse
+import gc
+import os
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from backend.agent_registry import AgentRegistry
+from backend.agents import LlmCoderAgent
+
+
+def retained(fn):
+    gc.collect()
+    tracemalloc.start()
+    result = fn()
+    gc.collect()
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, memory
+
+
+def latency_us(fn, keys):
+    timings = []
+    for key in keys:
+        start = time.perf_counter()
+        fn(key)
+        timings.append((time.perf_counter() - start) * 1e6)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.99) - 1]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the agent registry.")
+    parser.add_argument("--agents", type=int, default=50_000)
+    parser.add_argument("--max_live", type=int, default=256)
+    parser.add_argument("--lookups", type=int, default=2000)
+    args = parser.parse_args()
+
+    def fill_dict():
+        agents = {}
+        for _ in range(args.agents):
+            agent = LlmCoderAgent()
+            agents[agent.agent_id] = agent
+        return agents
+
+    agents, dict_bytes = retained(fill_dict)
+    ids = list(agents)
+    del agents
+    print(f"dict      {args.agents} agents retain {dict_bytes / 2**20:6.1f} MiB")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "agents.sqlite3")
+
+        def fill_registry():
+            registry = AgentRegistry(
+                LlmCoderAgent.from_dict, db_path=db_path, max_live=args.max_live
+            )
+            start = time.perf_counter()
+            for _ in range(args.agents):
+                registry.add(LlmCoderAgent())
+            return registry, time.perf_counter() - start
+
+        (registry, create_s), registry_bytes = retained(fill_registry)
+        print(
+            f"registry  {args.agents} agents retain {registry_bytes / 2**20:6.1f} MiB "
+            f"(created at {args.agents / create_s:,.0f}/s)"
+        )
+        live = registry.live_ids()
+        p50, p99 = latency_us(registry.get, random.choices(live, k=args.lookups))
+        print(f"get live      p50 {p50:7.1f}us  p99 {p99:7.1f}us")
+        stored = [
+            row[0] for row in registry._db().execute("SELECT agent_id FROM agents")
+        ]
+        evicted = random.sample(sorted(set(stored) - set(live)), args.lookups)
+        p50, p99 = latency_us(registry.get, evicted)
+        print(f"get evicted   p50 {p50:7.1f}us  p99 {p99:7.1f}us")
+        print(registry.metrics())
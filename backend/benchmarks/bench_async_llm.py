@@ -0,0 +1,77 @@
+# backend/benchmarks/bench_async_llm.py
+"""
+bench_async_llm.py
+
+Fires batches of concurrent chat completions at a local OpenAI stub server
+from one event loop, comparing a blocking HTTP call inside the coroutine (what
+the FastAPI handlers did via openai.ChatCompletion.create) with
+generate_text_async.
+
+Usage:
+    python -m backend.benchmarks.bench_async_llm --delay 0.2 --concurrency 1 8 32 128
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+import requests
+
+from backend.benchmarks.stub_servers import OpenAIStubHandler, start_stub_server
+
+
+async def blocking_call(base_url):
+    response = requests.post(
+        f"{base_url}/chat/completions",
+        json={"model": "stub", "messages": [{"role": "user", "content": "x"}]},
+        timeout=30,
+    )
+    response.raise_for_status()
+    return response.json()["choices"][0]["message"]["content"]
+
+
+async def async_call(llm):
+    return await llm.generate_text_async("x", model="stub", cache=False)
+
+
+async def run(label, make_call, concurrency):
+    start = time.perf_counter()
+    results = await asyncio.gather(*(make_call() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    assert all(results), "a request failed"
+    print(
+        f"{label:>9} x{concurrency:<4} {elapsed * 1000:8.0f} ms  "
+        f"{concurrency / elapsed:7.1f} req/s"
+    )
+
+
+async def main(args, base_url):
+    from backend.app.core import llm
+
+    llm.LLM_MODEL_CONCURRENCY = max(args.concurrency)
+    await async_call(llm)  # create the client outside the measurements
+    for concurrency in args.concurrency:
+        if concurrency <= args.max_blocking:
+            await run("blocking", lambda: blocking_call(base_url), concurrency)
+        await run("async", lambda: async_call(llm), concurrency)
+    await llm.close_async_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark async LLM calls.")
+    parser.add_argument("--delay", type=float, default=0.2)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument(
+        "--max_blocking",
+        type=int,
+        default=32,
+        help="Skip the blocking variant above this concurrency (it is serial).",
+    )
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(OpenAIStubHandler, delay=args.delay)
+    # Read by backend.app.core.llm at import time.
+    os.environ["OPENAI_BASE_URL"] = base_url
+    asyncio.run(main(args, base_url))
+    server.shutdown()
@@ -0,0 +1,106 @@
+# backend/benchmarks/bench_data_collection.py
+"""
+bench_data_collection.py
+
+Replays synthetic key events through DataCollector.on_press and reports
+listener callback latency and sustained events/sec, next to a baseline that
+looks up the active window inside the callback as the collector used to.
+
+The window lookup is replaced by a sleep of --window_cost_ms to stand in for
+the xdotool/xprop subprocesses, so no X server is needed beyond what pynput
+requires to import.
+
+Usage:
+    python -m backend.benchmarks.bench_data_collection --events 20000
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from pynput.keyboard import KeyCode
+
+# data_collection.py runs as a script next to its helper modules.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(tempfile.mkdtemp(prefix="bench_data_collection-"))
+
+from data_collection import DataCollector  # noqa: E402
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def report(label, latencies, elapsed, count):
+    print(
+        f"{label:>9}: {count / elapsed:10.1f} events/s, callback "
+        f"p50 {percentile(latencies, 50) * 1e6:8.1f} us, "
+        f"p99 {percentile(latencies, 99) * 1e6:8.1f} us, "
+        f"max {max(latencies) * 1e6:8.1f} us"
+    )
+
+
+def run_baseline(collector, keys):
+    """Old behaviour: window lookup and entry creation inside the callback."""
+    data = []
+    latencies = []
+    start = time.perf_counter()
+    for key in keys:
+        t0 = time.perf_counter()
+        data.append(
+            {
+                "timestamp": time.time(),
+                "event": "keypress",
+                "key": str(key),
+                "active_window": collector.get_active_window_title(),
+            }
+        )
+        latencies.append(time.perf_counter() - t0)
+    report("inline", latencies, time.perf_counter() - start, len(keys))
+
+
+def run_queued(collector, keys):
+    collector.start_worker()
+    collector.start_recording()
+    latencies = []
+    start = time.perf_counter()
+    for key in keys:
+        t0 = time.perf_counter()
+        collector.on_press(key)
+        latencies.append(time.perf_counter() - t0)
+    while collector.processed_events < len(keys):
+        time.sleep(0.001)
+    elapsed = time.perf_counter() - start
+    collector.recording = False
+    collector.stop_worker()
+    spooled = collector.spool.close() if collector.spool else []
+    report("queued", latencies, elapsed, len(keys))
+    print(f"           spooled {collector.processed_events} events to {spooled}")
+    print(f"           mean callback {statistics.mean(latencies) * 1e6:.2f} us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the keystroke collector.")
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--baseline_events", type=int, default=200)
+    parser.add_argument("--window_cost_ms", type=float, default=15.0)
+    args = parser.parse_args()
+
+    def slow_window_title():
+        time.sleep(args.window_cost_ms / 1000)
+        return "Benchmark Window"
+
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    keys = [KeyCode.from_char(letters[i % len(letters)]) for i in range(args.events)]
+
+    baseline = DataCollector("benchmark")
+    baseline.get_active_window_title = slow_window_title
+    run_baseline(baseline, keys[: args.baseline_events])
+
+    collector = DataCollector("benchmark")
+    collector.get_active_window_title = slow_window_title
+    run_queued(collector, keys)
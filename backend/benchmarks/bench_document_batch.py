@@ -0,0 +1,100 @@
+# backend/benchmarks/bench_document_batch.py
+"""
+bench_document_batch.py
+
+Summarizes a reading list of pages from a local static site, through a local
+OpenAI-compatible stub, first one URL at a time (as clients of
+/document/summarize must) and then with summarize_documents, the pipeline
+behind /document/summarize/batch. The list repeats some URLs and links some
+pages twice under different query strings. Prints the time to the first
+result and to the last.
+
+Usage:
+    python -m backend.benchmarks.bench_document_batch --urls 200
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import time
+
+from backend.benchmarks.stub_servers import (
+    OpenAIStubHandler,
+    StaticSiteStubHandler,
+    start_stub_server,
+)
+
+
+def reading_list(base_url, count, seed=0):
+    rng = random.Random(seed)
+    urls = []
+    for n in range(count):
+        roll = rng.random()
+        if urls and roll < 0.1:
+            urls.append(rng.choice(urls))
+        elif urls and roll < 0.2:
+            urls.append(f"{rng.choice(urls)}?ref=list{n}")
+        else:
+            urls.append(f"{base_url}/page/{n}")
+    return urls
+
+
+async def main(args, site_url):
+    from backend.app.core import llm, summarizer
+    from backend.app.services import document
+
+    llm.LLM_MODEL_CONCURRENCY = args.concurrency
+    urls = reading_list(site_url, args.urls)
+
+    start = time.perf_counter()
+    first = None
+    for url in urls:
+        await document.summarize_document(url, "bench")
+        first = first or time.perf_counter() - start
+    elapsed = time.perf_counter() - start
+    print(
+        f"{'one URL at a time':>20}: first {first * 1000:7.0f} ms  all {elapsed:6.2f} s"
+    )
+
+    summarizer.summary_cache.clear()
+    start = time.perf_counter()
+    first = None
+    async for result in document.summarize_documents(
+        urls, concurrency=args.concurrency
+    ):
+        first = first or time.perf_counter() - start
+        if result.get("done"):
+            done = result
+        else:
+            assert "error" not in result, result
+    elapsed = time.perf_counter() - start
+    print(
+        f"{'batch':>20}: first {first * 1000:7.0f} ms  all {elapsed:6.2f} s  "
+        f"({done['distinct']} distinct of {done['requested']}, "
+        f"{done['same_content']} with repeated content)"
+    )
+    await llm.close_async_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark batch summarization.")
+    parser.add_argument("--urls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--page_delay", type=float, default=0.05)
+    parser.add_argument("--llm_delay", type=float, default=0.3)
+    args = parser.parse_args()
+
+    site, site_url = start_stub_server(
+        StaticSiteStubHandler, delay=args.page_delay, pages=args.urls
+    )
+    llm_stub, llm_url = start_stub_server(
+        OpenAIStubHandler, delay=args.llm_delay, digest_replies=True
+    )
+    # Read by backend.app.core at import time; the page cache would make the
+    # second pass cheaper than the first.
+    os.environ["OPENAI_BASE_URL"] = llm_url
+    os.environ["SCRAPE_CACHE_DB"] = ""
+    asyncio.run(main(args, site_url))
+    site.shutdown()
+    llm_stub.shutdown()
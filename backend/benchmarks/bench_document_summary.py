@@ -0,0 +1,100 @@
+# backend/benchmarks/bench_document_summary.py
+"""
+bench_document_summary.py
+
+Summarizes a synthetic multi-page document through summarize_text against a
+local OpenAI-compatible stub and prints end-to-end latency and the number of
+LLM calls: cold at several map concurrencies, again unchanged, and after
+editing one page (only the chunks around the edit are summarized again).
+
+Usage:
+    python -m backend.benchmarks.bench_document_summary --pages 200
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import time
+
+from backend.benchmarks.stub_servers import OpenAIStubHandler, start_stub_server
+
+WORDS = (
+    "system data model request cache latency page user server network memory "
+    "query index token result error update value service client process file "
+    "thread batch stream event queue worker report record field table"
+).split()
+
+
+def make_pages(pages, words_per_page, seed=0):
+    rng = random.Random(seed)
+    documents = []
+    for _ in range(pages):
+        sentences, count = [], 0
+        while count < words_per_page:
+            length = rng.randint(8, 24)
+            sentence = " ".join(rng.choice(WORDS) for _ in range(length))
+            sentences.append(sentence.capitalize() + ".")
+            count += length
+        documents.append(" ".join(sentences))
+    return documents
+
+
+async def timed(summarizer, pages, concurrency):
+    misses = summarizer.summary_cache.misses
+    start = time.perf_counter()
+    summary = await summarizer.summarize_text(
+        " ".join(pages), model="stub", concurrency=concurrency
+    )
+    elapsed = time.perf_counter() - start
+    assert summary, "summarization failed"
+    return elapsed, summarizer.summary_cache.misses - misses
+
+
+async def main(args):
+    from backend.app.core import llm, summarizer
+
+    llm.LLM_MODEL_CONCURRENCY = max(args.concurrency)
+    pages = make_pages(args.pages, args.words_per_page)
+    text = " ".join(pages)
+    chunks = summarizer.split_text(text)
+    print(
+        f"{args.pages} pages, {summarizer.count_tokens(text)} tokens "
+        f"-> {len(chunks)} chunks of <= {summarizer.SUMMARY_CHUNK_TOKENS} tokens"
+    )
+
+    def report(label, result):
+        elapsed, calls = result
+        print(f"{label:>26}: {elapsed * 1000:8.0f} ms  {calls:4d} LLM calls")
+
+    for concurrency in args.concurrency:
+        summarizer.summary_cache.clear()
+        report(
+            f"cold, concurrency {concurrency}",
+            await timed(summarizer, pages, concurrency),
+        )
+    concurrency = max(args.concurrency)
+    report("unchanged", await timed(summarizer, pages, concurrency))
+    edited = list(pages)
+    middle = len(edited) // 2
+    edited[middle] = edited[middle].replace(".", " and more.", 3)
+    report("one page edited", await timed(summarizer, edited, concurrency))
+    await llm.close_async_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark chunked summarization.")
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--words_per_page", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--delay", type=float, default=0.2)
+    args = parser.parse_args()
+
+    summary = "The section covers " + "several related points about the system. " * 40
+    server, base_url = start_stub_server(
+        OpenAIStubHandler, delay=args.delay, text=summary, digest_replies=True
+    )
+    # Read by backend.app.core.llm at import time.
+    os.environ["OPENAI_BASE_URL"] = base_url
+    asyncio.run(main(args))
+    server.shutdown()
@@ -0,0 +1,74 @@
+# backend/benchmarks/bench_keystroke_compiler.py
+"""
+bench_keystroke_compiler.py
+
+Streams a synthetic keystroke log through KeystrokeCompiler and reports
+events/sec, examples produced and peak memory. The log is generated lazily,
+so memory reflects the compiler alone.
+
+Usage:
+    python -m backend.benchmarks.bench_keystroke_compiler --events 1000000
+"""
+
+import argparse
+import random
+import resource
+import time
+
+from backend.keystroke_compiler import KeystrokeCompiler
+
+WINDOWS = ["agents.py - VS Code", "app.py - VS Code", "Terminal", "Slack", "Chrome"]
+SNIPPETS = [
+    "def get_suggestion(self, prompt):",
+    "return jsonify({'status': 'ok'})",
+    "for record in records:",
+    "git commit -m 'fix tests'",
+    "sounds good, will review after lunch",
+]
+
+
+def synthetic_events(count, seed=0):
+    rng = random.Random(seed)
+    timestamp = 1_700_000_000.0
+    window = WINDOWS[0]
+    snippet = ""
+    for _ in range(count):
+        if not snippet:
+            snippet = rng.choice(SNIPPETS) + f" {rng.randint(0, 10**6)}\n"
+            if rng.random() < 0.2:
+                window = rng.choice(WINDOWS)
+            # Occasional idle gaps end sessions.
+            timestamp += rng.choice([0.2, 0.2, 0.2, 45.0])
+        char, snippet = snippet[0], snippet[1:]
+        if rng.random() < 0.03:
+            key = "Key.backspace"
+        elif char == " ":
+            key = "Key.space"
+        elif char == "\n":
+            key = "Key.enter"
+        else:
+            key = repr(char)
+        timestamp += rng.uniform(0.03, 0.2)
+        yield {
+            "timestamp": timestamp,
+            "event": "keypress",
+            "key": key,
+            "active_window": window,
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the keystroke compiler.")
+    parser.add_argument("--events", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    compiler = KeystrokeCompiler()
+    start = time.perf_counter()
+    examples = sum(1 for _ in compiler.compile(synthetic_events(args.events)))
+    elapsed = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(
+        f"{compiler.events} events -> {examples} examples "
+        f"({compiler.duplicates} duplicates dropped) in {elapsed:.2f}s: "
+        f"{compiler.events / elapsed:,.0f} events/s, peak RSS {peak_mb:.0f} MB"
+    )
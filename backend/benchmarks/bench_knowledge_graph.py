@@ -0,0 +1,159 @@
+# backend/benchmarks/bench_knowledge_graph.py
+"""
+bench_knowledge_graph.py
+
+Builds a random graph in the original dict-of-dicts layout and in the CSR
+KnowledgeGraph, then compares memory per edge, 1-3 hop neighborhood latency
+and inbound-neighbor lookups. Also times a snapshot and a memory-mapped restore.
+
+Usage:
+    python -m backend.benchmarks.bench_knowledge_graph --nodes 100000 --edges 1000000
+"""
+
+import argparse
+import gc
+import os
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from backend.knowledge_graph import KnowledgeGraph
+
+
+class DictGraph:
+    """The original KnowledgeGraph layout, kept here as the baseline."""
+
+    def __init__(self):
+        self.nodes = {}
+        self.edges = {}
+
+    def add_node(self, node_id, node_data):
+        self.nodes[node_id] = node_data
+
+    def add_edge(self, source_node_id, target_node_id, edge_data):
+        if source_node_id not in self.edges:
+            self.edges[source_node_id] = {}
+        self.edges[source_node_id][target_node_id] = edge_data
+
+    def k_hop(self, node_id, k):
+        seen = {node_id}
+        frontier = [node_id]
+        for _ in range(k):
+            next_frontier = []
+            for node in frontier:
+                for neighbor in self.edges.get(node, ()):
+                    if neighbor not in seen:
+                        seen.add(neighbor)
+                        next_frontier.append(neighbor)
+            frontier = next_frontier
+        seen.discard(node_id)
+        return list(seen)
+
+    def in_neighbors(self, node_id):
+        # No reverse index: every adjacency dict has to be scanned.
+        return [source for source, targets in self.edges.items() if node_id in targets]
+
+
+def random_edges(num_nodes, num_edges, seed=0):
+    rng = np.random.default_rng(seed)
+    sources = rng.integers(0, num_nodes, num_edges)
+    targets = rng.integers(0, num_nodes, num_edges)
+    return [f"n{i}" for i in range(num_nodes)], sources.tolist(), targets.tolist()
+
+
+def build(graph_cls, keys, sources, targets, bulk=False):
+    graph = graph_cls()
+    for key in keys:
+        graph.add_node(key, None)
+    if bulk:
+        graph.add_edges(
+            (keys[source], keys[target], None)
+            for source, target in zip(sources, targets)
+        )
+    else:
+        for source, target in zip(sources, targets):
+            graph.add_edge(keys[source], keys[target], None)
+        if isinstance(graph, KnowledgeGraph):
+            graph.compact()
+    return graph
+
+
+def measure_build(*args, **kwargs):
+    """Returns (graph, seconds, traced bytes); memory comes from a second build."""
+    gc.collect()
+    start = time.perf_counter()
+    graph = build(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    del graph
+    gc.collect()
+    tracemalloc.start()
+    graph = build(*args, **kwargs)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return graph, elapsed, memory
+
+
+def latency(fn, queries):
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(query)
+        timings.append((time.perf_counter() - start) * 1e6)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.99) - 1]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the knowledge graph.")
+    parser.add_argument("--nodes", type=int, default=100_000)
+    parser.add_argument("--edges", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=1000)
+    args = parser.parse_args()
+
+    keys, sources, targets = random_edges(args.nodes, args.edges)
+    queries = random.Random(1).sample(keys, min(args.queries, len(keys)))
+    results = {}
+    layouts = (
+        ("dict-of-dicts", DictGraph, False),
+        ("csr add_edge", KnowledgeGraph, False),
+        ("csr add_edges", KnowledgeGraph, True),
+    )
+    for name, graph_cls, bulk in layouts:
+        graph, build_s, memory = measure_build(
+            graph_cls, keys, sources, targets, bulk=bulk
+        )
+        print(
+            f"{name:14s} build {build_s:6.2f}s  "
+            f"{memory / args.edges:6.1f} B/edge ({memory / 2**20:.0f} MiB)"
+        )
+        for k in (1, 2, 3):
+            p50, p99 = latency(lambda node: graph.k_hop(node, k), queries)
+            print(f"{'':14s} {k}-hop p50 {p50:8.1f}us  p99 {p99:8.1f}us")
+        if isinstance(graph, KnowledgeGraph):
+            inbound = lambda node: graph.neighbors(node, direction="in")
+        else:
+            inbound = graph.in_neighbors
+        p50, p99 = latency(inbound, queries[:20])
+        print(f"{'':14s} inbound p50 {p50:8.1f}us  p99 {p99:8.1f}us")
+        results[name] = graph
+        del graph
+        gc.collect()
+
+    graph = results["csr add_edges"]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "graph")
+        start = time.perf_counter()
+        graph.save(path)
+        save_s = time.perf_counter() - start
+        start = time.perf_counter()
+        restored = KnowledgeGraph.load(path)
+        load_s = time.perf_counter() - start
+        p50, _ = latency(lambda node: restored.k_hop(node, 2), queries)
+        print(
+            f"snapshot {save_s:.2f}s, restore {load_s:.2f}s, "
+            f"2-hop p50 after restore {p50:.1f}us"
+        )
@@ -0,0 +1,97 @@
+# backend/benchmarks/bench_lint.py
+"""
+bench_lint.py
+
+Simulates concurrent editors linting snippets, where each editor re-sends
+its current buffer after small edits (so some requests repeat exactly), and
+compares the old per-request `pylint` subprocess with LintPool.
+
+Usage:
+    python -m backend.benchmarks.bench_lint --editors 4 --requests 25
+"""
+
+import argparse
+import concurrent.futures
+import os
+import random
+import subprocess
+import tempfile
+import time
+
+from backend.lint_pool import LintPool
+
+BASE_SNIPPET = """import os
+import json
+
+
+def load(path):
+    with open(path) as f:
+        data = json.load(f)
+    return {{key: value for key, value in data.items() if key}}
+
+
+def save(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+    x_{edit} = {edit}
+"""
+
+
+def edit_stream(editor, count, seed):
+    """Buffers an editor sends: every other request repeats the last one."""
+    rng = random.Random(seed + editor)
+    edit = 0
+    for i in range(count):
+        if i % 2 == 0:
+            edit = rng.randint(0, 10**6)
+        yield BASE_SNIPPET.format(edit=edit)
+
+
+def lint_subprocess(code, workdir):
+    path = os.path.join(workdir, f"temp_code_{os.getpid()}_{time.monotonic_ns()}.py")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(code)
+    subprocess.run(["pylint", path], capture_output=True, text=True, check=False)
+
+
+def run(lint, editors, requests, seed=0):
+    def editor_session(editor):
+        timings = []
+        for code in edit_stream(editor, requests, seed):
+            start = time.perf_counter()
+            lint(code)
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings
+
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(editors) as executor:
+        timings = sorted(
+            t for ts in executor.map(editor_session, range(editors)) for t in ts
+        )
+    elapsed = time.perf_counter() - start
+    p50 = timings[len(timings) // 2]
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    return p50, p99, len(timings) / elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark /api/lint backends.")
+    parser.add_argument("--editors", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=25)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        p50, p99, rate = run(
+            lambda code: lint_subprocess(code, workdir), args.editors, args.requests
+        )
+        print(f"subprocess  p50 {p50:7.1f}ms  p99 {p99:7.1f}ms  {rate:5.1f} lints/s")
+
+    pool = LintPool(workers=args.workers)
+    pool.start()
+    p50, p99, rate = run(lambda code: pool.lint(code), args.editors, args.requests)
+    print(f"pool        p50 {p50:7.1f}ms  p99 {p99:7.1f}ms  {rate:5.1f} lints/s")
+    print(pool.stats())
+    pool.shutdown()
@@ -0,0 +1,124 @@
+# backend/benchmarks/bench_llm_cache.py
+"""
+bench_llm_cache.py
+
+Replays a skewed stream of "draft a reply" prompts, some reworded, against a
+local OpenAI stub and compares no cache, the exact-match memory tier, a warm
+SQLite tier after a restart, and exact plus semantic matching. Reports wall
+time, hit rate and upstream latency saved.
+
+Usage:
+    python -m backend.benchmarks.bench_llm_cache --requests 400 --distinct 60
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from backend.benchmarks.stub_servers import OpenAIStubHandler, start_stub_server
+
+TEMPLATES = [
+    "Draft a concise and professional reply to this email: {}",
+    "Write a concise and professional reply to this email: {}",
+]
+
+
+def make_workload(requests, distinct, reworded, seed=0):
+    rng = random.Random(seed)
+    vocabulary = ["".join(rng.choices("abcdefghij", k=6)) for _ in range(2000)]
+    snippets = [" ".join(rng.choices(vocabulary, k=12)) for _ in range(distinct)]
+    weights = [1 / (rank + 1) for rank in range(distinct)]
+    prompts = []
+    for snippet in rng.choices(snippets, weights=weights, k=requests):
+        template = TEMPLATES[1] if rng.random() < reworded else TEMPLATES[0]
+        prompts.append(template.format(snippet))
+    return prompts
+
+
+async def replay(llm, prompts, concurrency, cache):
+    limit = asyncio.Semaphore(concurrency)
+
+    async def one(prompt):
+        async with limit:
+            text = await llm.generate_text_async(prompt, model="stub", cache=cache)
+            assert text, "request failed"
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(prompt) for prompt in prompts))
+    return time.perf_counter() - start
+
+
+async def main(args):
+    from backend.app.core import llm, llm_cache
+
+    prompts = make_workload(args.requests, args.distinct, args.reworded)
+    await llm.generate_text_async("warm up", model="stub", cache=False)
+
+    def report(label, elapsed, cache=None):
+        line = f"{label:>18}: {elapsed:6.2f} s, {len(prompts) / elapsed:6.1f} req/s"
+        if cache is not None:
+            stats = cache.stats()
+            line += (
+                f", hit rate {stats['hit_rate']:.2f} {stats['hits']}, "
+                f"saved {stats['saved_latency_ms'] / 1000:.1f} s upstream"
+            )
+        print(line)
+
+    report("no cache", await replay(llm, prompts, args.concurrency, False))
+
+    llm.response_cache = llm_cache.ResponseCache(llm_cache.MemoryTier())
+    report(
+        "exact (memory)",
+        await replay(llm, prompts, args.concurrency, True),
+        llm.response_cache,
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "llm_cache.sqlite3")
+        llm.response_cache = llm_cache.ResponseCache(
+            llm_cache.MemoryTier(), llm_cache.SQLiteTier(db_path)
+        )
+        await replay(llm, prompts, args.concurrency, True)
+        # A restarted worker: empty memory, same database.
+        llm.response_cache = llm_cache.ResponseCache(
+            llm_cache.MemoryTier(), llm_cache.SQLiteTier(db_path)
+        )
+        report(
+            "disk, after restart",
+            await replay(llm, prompts, args.concurrency, True),
+            llm.response_cache,
+        )
+
+    llm.response_cache = llm_cache.ResponseCache(
+        llm_cache.MemoryTier(),
+        semantic=llm_cache.SemanticTier(llm._embed_for_cache, threshold=args.threshold),
+    )
+    report(
+        "exact + semantic",
+        await replay(llm, prompts, args.concurrency, True),
+        llm.response_cache,
+    )
+    await llm.close_async_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the LLM response cache.")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--distinct", type=int, default=60)
+    parser.add_argument("--reworded", type=float, default=0.3)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--delay", type=float, default=0.2)
+    parser.add_argument("--embedding_delay", type=float, default=0.02)
+    parser.add_argument("--threshold", type=float, default=0.9)
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(
+        OpenAIStubHandler, delay=args.delay, embedding_delay=args.embedding_delay
+    )
+    # Read by backend.app.core.llm at import time.
+    os.environ["OPENAI_BASE_URL"] = base_url
+    asyncio.run(main(args))
+    server.shutdown()
@@ -0,0 +1,98 @@
+# backend/benchmarks/bench_llm_coalescing.py
+"""
+bench_llm_coalescing.py
+
+Runs closed-loop clients calling generate_text_async against a local
+OpenAI-compatible stub that processes a few requests at a time and batches
+prompts cheaply, and prints throughput and latency percentiles without
+coalescing and for a grid of max_batch / max_wait settings.
+
+Usage:
+    python -m backend.benchmarks.bench_llm_coalescing --clients 64 --slots 4
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+from backend.benchmarks.stub_servers import OpenAIStubHandler, start_stub_server
+
+
+async def run(llm, clients, requests_per_client):
+    latencies = []
+
+    async def client(c):
+        for i in range(requests_per_client):
+            start = time.perf_counter()
+            text = await llm.generate_text_async(
+                f"item {c}-{i}", model="stub", cache=False
+            )
+            latencies.append(time.perf_counter() - start)
+            assert text, "request failed"
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(c) for c in range(clients)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return (
+        len(latencies) / elapsed,
+        latencies[len(latencies) // 2] * 1000,
+        latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    )
+
+
+async def main(args):
+    from backend.app.core import llm
+    from backend.app.core.coalescer import RequestCoalescer
+
+    llm.LLM_MODEL_CONCURRENCY = args.clients
+    await llm.generate_text_async("warm up", model="stub", cache=False)
+
+    def report(label, result, coalescer=None):
+        throughput, p50, p99 = result
+        line = f"{label:>24}: {throughput:7.1f} req/s  p50 {p50:6.0f} ms  p99 {p99:6.0f} ms"
+        if coalescer is not None:
+            line += f"  avg batch {coalescer.stats()['avg_batch_size']}"
+        print(line)
+
+    llm.LLM_COALESCE = False
+    report("no coalescing", await run(llm, args.clients, args.requests))
+    llm.LLM_COALESCE = True
+    for max_batch in args.max_batch:
+        for max_wait_ms in args.max_wait_ms:
+            llm.prompt_coalescer = RequestCoalescer(
+                llm._complete_batch, max_batch=max_batch, max_wait=max_wait_ms / 1000
+            )
+            result = await run(llm, args.clients, args.requests)
+            report(
+                f"batch {max_batch:>3}, wait {max_wait_ms:>4.0f} ms",
+                result,
+                llm.prompt_coalescer,
+            )
+    await llm.close_async_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark request coalescing.")
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--slots", type=int, default=4)
+    parser.add_argument("--delay", type=float, default=0.05)
+    parser.add_argument("--batch_item_delay", type=float, default=0.005)
+    parser.add_argument("--max_batch", type=int, nargs="+", default=[4, 16, 64])
+    parser.add_argument("--max_wait_ms", type=float, nargs="+", default=[1, 5, 20])
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(
+        OpenAIStubHandler,
+        delay=args.delay,
+        batch_item_delay=args.batch_item_delay,
+        slots=args.slots,
+    )
+    # Read by backend.app.core.llm at import time; LLM_COALESCE also lets the
+    # stub, as the default backend, receive batched prompts.
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ["LLM_COALESCE"] = "1"
+    asyncio.run(main(args))
+    server.shutdown()
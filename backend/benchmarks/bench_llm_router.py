@@ -0,0 +1,120 @@
+# backend/benchmarks/bench_llm_router.py
+"""
+bench_llm_router.py
+
+Runs closed-loop clients calling generate_chat_async against two local stubs
+serving the same model: an Ollama stub with an occasional slow response and an
+OpenAI-compatible stub that is slower on average but consistent. Prints latency
+percentiles for each backend alone and for the router with and without hedging,
+then makes the Ollama stub fail most requests and shows the router failing over.
+
+Usage:
+    python -m backend.benchmarks.bench_llm_router --clients 16 --requests 50
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+from backend.benchmarks.stub_servers import (
+    OllamaStubHandler,
+    OpenAIStubHandler,
+    start_stub_server,
+)
+
+
+async def run(llm, router, clients, requests_per_client):
+    llm.llm_router = router
+    latencies = []
+    failures = 0
+
+    async def client(c):
+        nonlocal failures
+        for i in range(requests_per_client):
+            start = time.perf_counter()
+            text = await llm.generate_chat_async(
+                [{"role": "user", "content": f"item {c}-{i}"}],
+                model="llama3.1",
+                cache=False,
+            )
+            latencies.append(time.perf_counter() - start)
+            failures += text is None
+
+    await asyncio.gather(*(client(c) for c in range(clients)))
+    latencies.sort()
+    return (
+        latencies[len(latencies) // 2] * 1000,
+        latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        latencies[-1] * 1000,
+        failures,
+    )
+
+
+async def main(args, ollama_url, openai_url, flaky_url):
+    from backend.app.core import llm
+    from backend.app.core.llm_router import Backend, LLMRouter
+
+    llm.LLM_MODEL_CONCURRENCY = args.clients
+
+    def backends(ollama_base_url=ollama_url):
+        return [
+            Backend("ollama", "ollama", ollama_base_url, ["*"]),
+            Backend("openai", "openai", openai_url, ["*"]),
+        ]
+
+    def report(label, result, router):
+        p50, p99, worst = result[:3]
+        print(
+            f"{label:>22}: p50 {p50:6.0f} ms  p99 {p99:6.0f} ms  max {worst:6.0f} ms"
+            f"  failed {result[3]:>3}  hedged {router.hedged:>3}"
+        )
+
+    for label, router in [
+        ("ollama only", LLMRouter(backends()[:1], hedging=False)),
+        ("openai only", LLMRouter(backends()[1:], hedging=False)),
+        ("router, no hedging", LLMRouter(backends(), hedging=False)),
+        ("router, hedging", LLMRouter(backends(), hedging=True)),
+    ]:
+        report(label, await run(llm, router, args.clients, args.requests), router)
+
+    router = LLMRouter(backends(flaky_url), hedging=True)
+    report("failover", await run(llm, router, args.clients, args.requests), router)
+    for backend in router.stats()["backends"]:
+        print(
+            f"{backend['name']:>22}: {backend['requests']} requests, "
+            f"{backend['failures']} failed, healthy {backend['healthy']}"
+        )
+    await llm.close_async_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark LLM backend routing.")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--ollama_delay", type=float, default=0.02)
+    parser.add_argument("--slow_fraction", type=float, default=0.05)
+    parser.add_argument("--slow_delay", type=float, default=0.5)
+    parser.add_argument("--openai_delay", type=float, default=0.06)
+    parser.add_argument("--error_fraction", type=float, default=0.8)
+    args = parser.parse_args()
+
+    ollama, ollama_url = start_stub_server(
+        OllamaStubHandler,
+        delay=args.ollama_delay,
+        slow_fraction=args.slow_fraction,
+        slow_delay=args.slow_delay,
+    )
+    flaky, flaky_url = start_stub_server(
+        OllamaStubHandler,
+        delay=args.ollama_delay,
+        error_fraction=args.error_fraction,
+    )
+    openai_stub, openai_url = start_stub_server(
+        OpenAIStubHandler, delay=args.openai_delay
+    )
+    # Read by backend.app.core.llm at import time.
+    os.environ["OPENAI_BASE_URL"] = openai_url
+    asyncio.run(main(args, ollama_url, openai_url, flaky_url))
+    for server in (ollama, flaky, openai_stub):
+        server.shutdown()
@@ -0,0 +1,69 @@
+# backend/benchmarks/bench_llm_streaming.py
+"""
+bench_llm_streaming.py
+
+Measures time to first token and total time for a completion from a local
+OpenAI stub that generates tokens at a fixed rate, comparing
+generate_text_async (the whole completion arrives at once) with
+stream_text_async.
+
+Usage:
+    python -m backend.benchmarks.bench_llm_streaming --delay 0.3 --token_delay 0.03
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from backend.benchmarks.stub_servers import OpenAIStubHandler, start_stub_server
+
+
+async def measure_full(llm):
+    start = time.perf_counter()
+    text = await llm.generate_text_async("x", model="stub")
+    elapsed = time.perf_counter() - start
+    assert text, "request failed"
+    return elapsed, elapsed
+
+
+async def measure_stream(llm):
+    start = time.perf_counter()
+    first = None
+    async for _ in llm.stream_text_async("x", model="stub"):
+        if first is None:
+            first = time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+
+async def main(args):
+    from backend.app.core import llm
+
+    await measure_full(llm)  # create the client outside the measurements
+    for label, measure in (("full", measure_full), ("streamed", measure_stream)):
+        results = [await measure(llm) for _ in range(args.repeats)]
+        ttft = statistics.median(first for first, _ in results) * 1000
+        total = statistics.median(total for _, total in results) * 1000
+        print(f"{label:>9}: time to first token {ttft:7.0f} ms, total {total:7.0f} ms")
+    await llm.close_async_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark LLM streaming.")
+    parser.add_argument("--delay", type=float, default=0.3)
+    parser.add_argument("--token_delay", type=float, default=0.03)
+    parser.add_argument("--tokens", type=int, default=50)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(
+        OpenAIStubHandler,
+        delay=args.delay,
+        token_delay=args.token_delay,
+        text="word" * args.tokens,
+    )
+    # Read by backend.app.core.llm at import time.
+    os.environ["OPENAI_BASE_URL"] = base_url
+    asyncio.run(main(args))
+    server.shutdown()
@@ -0,0 +1,95 @@
+# backend/benchmarks/bench_log_tail.py
+"""
+bench_log_tail.py
+
+Writes a large app.log in the app's log format and compares the old
+/api/logs approach (readlines()[-10:]) with log_tail.tail_records for the
+last lines, a level filter and a since filter.
+
+Usage:
+    python -m backend.benchmarks.bench_log_tail --size_mb 200
+"""
+
+import argparse
+import datetime
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from backend import log_tail
+
+
+def write_log(path, size_mb):
+    start = datetime.datetime(2024, 1, 1)
+    target = size_mb * 1024 * 1024
+    written = 0
+    i = 0
+    with open(path, "w", encoding="utf-8") as f:
+        while written < target:
+            chunk = []
+            for _ in range(10_000):
+                stamp = start + datetime.timedelta(milliseconds=10 * i)
+                stamp = (
+                    stamp.strftime("%Y-%m-%d %H:%M:%S,")
+                    + f"{stamp.microsecond // 1000:03d}"
+                )
+                level = "ERROR" if i % 500 == 0 else "INFO"
+                chunk.append(
+                    f"{stamp} - {level} - request {i} handled in {i % 97} ms\n"
+                )
+                if level == "ERROR":
+                    chunk.append(
+                        "Traceback (most recent call last):\nValueError: boom\n"
+                    )
+                i += 1
+            data = "".join(chunk)
+            f.write(data)
+            written += len(data)
+    return start + datetime.timedelta(milliseconds=10 * i)
+
+
+def readlines_tail(path):
+    with open(path, "r") as f:
+        return f.readlines()[-10:]
+
+
+def measure(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return statistics.median(timings), peak
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark log tailing.")
+    parser.add_argument("--size_mb", type=int, default=200)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "app.log")
+        end = write_log(path, args.size_mb)
+        print(f"log: {os.path.getsize(path) / 2**20:.0f} MiB")
+        cases = [
+            ("readlines()[-10:]", lambda: readlines_tail(path)),
+            ("tail_records 10", lambda: log_tail.tail_records(path, 10)),
+            ("tail_records 1000", lambda: log_tail.tail_records(path, 1000)),
+            ("tail_records ERROR 10", lambda: log_tail.tail_records(path, 10, 40)),
+            (
+                "tail_records since -1min",
+                lambda: log_tail.tail_records(
+                    path, 1000, since=end - datetime.timedelta(minutes=1)
+                ),
+            ),
+        ]
+        for name, fn in cases:
+            ms, peak = measure(fn, args.repeats)
+            print(f"{name:26s} {ms:9.2f} ms  peak {peak / 2**20:8.2f} MiB")
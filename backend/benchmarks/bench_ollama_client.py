@@ -0,0 +1,70 @@
+# backend/benchmarks/bench_ollama_client.py
+"""
+bench_ollama_client.py
+
+Compares bare requests.post against the pooled Ollama session.
+
+Usage:
+    python -m backend.benchmarks.bench_ollama_client --requests 2000 --threads 8
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from backend import ollama_client
+from backend.benchmarks.stub_servers import OllamaStubHandler, start_stub_server
+
+
+def _consume(response):
+    response.raise_for_status()
+    for _ in response.iter_lines():
+        pass
+
+
+def _bare_request(base_url):
+    _consume(
+        requests.post(
+            f"{base_url}/api/generate",
+            json={"model": "stub", "prompt": "x"},
+            timeout=30,
+            stream=True,
+        )
+    )
+
+
+def _pooled_request(base_url):
+    _consume(
+        ollama_client.post(
+            base_url,
+            "/api/generate",
+            json={"model": "stub", "prompt": "x"},
+            stream=True,
+        )
+    )
+
+
+def run(label, fn, base_url, total, threads):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(lambda _: fn(base_url), range(total)))
+    elapsed = time.perf_counter() - start
+    print(f"{label:>8}: {total / elapsed:8.1f} req/s ({elapsed:.2f}s for {total})")
+    return total / elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark Ollama HTTP pooling.")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+    server, base_url = start_stub_server(OllamaStubHandler)
+    try:
+        bare = run("bare", _bare_request, base_url, args.requests, args.threads)
+        pooled = run("pooled", _pooled_request, base_url, args.requests, args.threads)
+        print(f"speedup: {pooled / bare:.2f}x")
+    finally:
+        ollama_client.close_all()
+        server.shutdown()
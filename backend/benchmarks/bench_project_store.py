@@ -0,0 +1,115 @@
+# backend/benchmarks/bench_project_store.py
+"""
+bench_project_store.py
+
+Builds a multi-megabyte project of many files and compares saving a
+one-line edit as a whole project_data.json rewrite (the old behaviour)
+against ProjectStore full saves and per-file patch saves. Also times a full
+load and an ETag revalidation.
+
+Usage:
+    python -m backend.benchmarks.bench_project_store --size_mb 5 --files 500
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from backend.project_store import ProjectStore
+
+
+def make_project(size_mb, files, seed=0):
+    rng = random.Random(seed)
+    per_file = size_mb * 1024 * 1024 // files
+    line = "    result = compute(value, factor={}) + offset  # keep in sync\n"
+    project = {"code": "print('hello')\n", "files": {}}
+    for i in range(files):
+        lines = []
+        while sum(len(l) for l in lines) < per_file:
+            lines.append(line.format(rng.randint(0, 10**6)))
+        project["files"][f"src/module_{i:04d}.py"] = "".join(lines)
+    return project
+
+
+def edit_one_line(project, rng):
+    name = rng.choice(list(project["files"]))
+    lines = project["files"][name].splitlines(keepends=True)
+    lines[rng.randrange(len(lines))] = f"    edited = {rng.random()}\n"
+    project["files"][name] = "".join(lines)
+    return name
+
+
+def legacy_save(path, project):
+    with open(os.path.join(path, "project_data.json"), "w", encoding="utf-8") as f:
+        json.dump(project, f)
+
+
+def timed(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark project saves.")
+    parser.add_argument("--size_mb", type=int, default=5)
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    project = make_project(args.size_mb, args.files)
+    size = len(json.dumps(project))
+    print(f"project: {args.files} files, {size / 2**20:.1f} MiB")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_dir = os.path.join(tmp, "legacy")
+        os.makedirs(legacy_dir)
+
+        def legacy_edit():
+            edit_one_line(project, rng)
+            legacy_save(legacy_dir, project)
+
+        print(f"whole-JSON rewrite          {timed(legacy_edit, args.repeats):8.1f} ms")
+
+        def legacy_load():
+            with open(os.path.join(legacy_dir, "project_data.json"), "rb") as f:
+                json.load(f)
+
+        print(f"whole-JSON load             {timed(legacy_load, args.repeats):8.1f} ms")
+
+        store = ProjectStore(os.path.join(tmp, "store"))
+        start = time.perf_counter()
+        store.save(project)
+        print(
+            f"store first save            {(time.perf_counter() - start) * 1000:8.1f} ms"
+        )
+
+        def full_edit():
+            edit_one_line(project, rng)
+            store.save(project)
+
+        print(f"store full save, 1-line edit {timed(full_edit, args.repeats):7.1f} ms")
+
+        def patch_edit():
+            name = edit_one_line(project, rng)
+            store.patch({"files": {name: project["files"][name]}})
+
+        print(f"store patch save, 1-line edit{timed(patch_edit, args.repeats):7.1f} ms")
+
+        def stream_load():
+            manifest = store.read_manifest()
+            for _ in store.iter_json(manifest):
+                pass
+
+        print(f"store streamed load         {timed(stream_load, args.repeats):8.1f} ms")
+        etag = store.read_manifest()["etag"]
+        revalidate = lambda: store.read_manifest()["etag"] == etag
+        print(f"store ETag revalidation     {timed(revalidate, args.repeats):8.1f} ms")
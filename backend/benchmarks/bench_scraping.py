@@ -0,0 +1,105 @@
+# backend/benchmarks/bench_scraping.py
+"""
+bench_scraping.py
+
+Crawls a local static site through the old blocking scrape path (a new
+requests connection and BeautifulSoup's html.parser per page, one page at a
+time) and through scrape_url_async with each available text extractor, then
+crawls it again to measure revalidation with conditional requests.
+
+Usage:
+    python -m backend.benchmarks.bench_scraping --pages 10000
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import requests
+from bs4 import BeautifulSoup
+
+from backend.benchmarks.stub_servers import StaticSiteStubHandler, start_stub_server
+
+
+def crawl_blocking(urls):
+    for url in urls:
+        response = requests.get(url, timeout=10)
+        response.raise_for_status()
+        text = BeautifulSoup(response.content, "html.parser").get_text(
+            separator=" ", strip=True
+        )
+        assert text, "empty page"
+
+
+async def crawl_async(scraping, urls):
+    texts = await asyncio.gather(*(scraping.scrape_url_async(url) for url in urls))
+    assert all(texts), "scrape failed"
+
+
+def report(label, pages, elapsed, scraping=None):
+    line = f"{label:>28}: {elapsed:7.2f} s  {pages / elapsed:8.1f} pages/s"
+    if scraping is not None:
+        stats = scraping.stats
+        line += (
+            f"  200 {stats['fetched']:>5}  304 {stats['not_modified']:>5}"
+            f"  {stats['bytes'] / 1e6:6.1f} MB"
+        )
+    print(line)
+
+
+async def main(args, base_url, cache_dir):
+    from backend.app.core import scraping
+
+    urls = [f"{base_url}/page/{n}" for n in range(args.pages)]
+    start = time.perf_counter()
+    crawl_blocking(urls[: args.blocking_pages])
+    report("blocking, html.parser", args.blocking_pages, time.perf_counter() - start)
+
+    scraping.SCRAPE_PER_HOST_CONCURRENCY = args.per_host
+    parsers = ["html.parser"]
+    for parser, module in (("lxml", "lxml"), ("selectolax", "selectolax")):
+        try:
+            __import__(module)
+            parsers.append(parser)
+        except ImportError:
+            print(f"{parser} is not installed; skipping it")
+    for parser in parsers:
+        scraping._parser = parser
+        scraping.page_cache = scraping.PageCache(
+            os.path.join(cache_dir, f"{parser}.db")
+        )
+        scraping.stats.update(fetched=0, not_modified=0, bytes=0)
+        start = time.perf_counter()
+        await crawl_async(scraping, urls)
+        report(f"async, {parser}", args.pages, time.perf_counter() - start, scraping)
+    scraping.stats.update(fetched=0, not_modified=0, bytes=0)
+    start = time.perf_counter()
+    await crawl_async(scraping, urls)
+    report(
+        f"async revalidate, {parsers[-1]}",
+        args.pages,
+        time.perf_counter() - start,
+        scraping,
+    )
+    await scraping.close_async_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark page scraping.")
+    parser.add_argument("--pages", type=int, default=10000)
+    # The blocking path is slow; it crawls only this many pages.
+    parser.add_argument("--blocking_pages", type=int, default=1000)
+    parser.add_argument("--per_host", type=int, default=16)
+    parser.add_argument("--delay", type=float, default=0.005)
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(
+        StaticSiteStubHandler, delay=args.delay, pages=args.pages
+    )
+    with tempfile.TemporaryDirectory() as cache_dir:
+        # Read by backend.app.core.scraping at import time.
+        os.environ["SCRAPE_CACHE_DB"] = os.path.join(cache_dir, "pages.db")
+        asyncio.run(main(args, base_url, cache_dir))
+    server.shutdown()
@@ -0,0 +1,293 @@
+# backend/benchmarks/stub_servers.py
+"""
+stub_servers.py
+
+Minimal local HTTP servers that mimic the upstream LLM APIs for benchmarks.
+"""
+
+import hashlib
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Real servers set TCP_NODELAY; without it keep-alive connections hit
+    # Nagle/delayed-ACK stalls and the numbers measure the kernel, not us.
+    disable_nagle_algorithm = True
+    # Seconds to wait before answering, simulating model latency.
+    delay = 0.0
+    # Fraction of chat requests that take slow_delay extra seconds (a latency
+    # tail), and fraction that fail with HTTP 503.
+    slow_fraction = 0.0
+    slow_delay = 0.0
+    error_fraction = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _tail_or_error(self):
+        """Adds tail latency; returns True after answering with a 503."""
+        if self.slow_fraction and random.random() < self.slow_fraction:
+            time.sleep(self.slow_delay)
+        if self.error_fraction and random.random() < self.error_fraction:
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return True
+        return False
+
+    def _send_body(self, body, content_type="application/json"):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class OllamaStubHandler(_StubHandler):
+    """Answers /api/generate, and /api/chat when asked to stream, with a short
+    NDJSON token stream, and other /api/chat requests with a single JSON
+    message."""
+
+    tokens = ["def ", "add", "(a, b):", "\n    return a + b"]
+
+    def do_POST(self):
+        payload = self._read_json()
+        if self.delay:
+            time.sleep(self.delay)
+        if self.path == "/api/chat" and payload.get("stream"):
+            lines = [
+                {"message": {"role": "assistant", "content": token}, "done": False}
+                for token in self.tokens
+            ]
+            lines.append(
+                {"message": {"role": "assistant", "content": ""}, "done": True}
+            )
+            body = b"".join(json.dumps(line).encode() + b"\n" for line in lines)
+            self._send_body(body, "application/x-ndjson")
+            return
+        if self.path == "/api/chat":
+            if self._tail_or_error():
+                return
+            message = {"role": "assistant", "content": "".join(self.tokens)}
+            body = {"model": payload.get("model"), "message": message, "done": True}
+            self._send_body(json.dumps(body).encode())
+            return
+        lines = [{"response": token, "done": False} for token in self.tokens]
+        lines.append({"response": "", "done": True})
+        body = b"".join(json.dumps(line).encode() + b"\n" for line in lines)
+        self._send_body(body, "application/x-ndjson")
+
+
+class OpenAIStubHandler(_StubHandler):
+    """Answers OpenAI /chat/completions and /embeddings requests."""
+
+    text = "def add(a, b):\n    return a + b"
+    # Embeddings are hashed bags of words, so texts sharing words are similar.
+    dimensions = 64
+    # Seconds before answering an embeddings request; None uses delay.
+    embedding_delay = None
+    # Extra seconds per prompt in a batched /completions request, and the
+    # number of requests processed at once (None: unlimited). Together they
+    # model a local server that batches prompts on one accelerator.
+    batch_item_delay = 0.0
+    slots = None
+    # Streamed completions send text in tokens of this many characters, this
+    # many seconds apart (after the initial delay).
+    token_chars = 4
+    token_delay = 0.0
+    # Non-streamed chat replies end with a digest of the prompt, so distinct
+    # prompts get distinct answers.
+    digest_replies = False
+
+    def _send_chunk(self, data):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def _stream_completion(self, payload):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i in range(0, len(self.text), self.token_chars):
+            if i and self.token_delay:
+                time.sleep(self.token_delay)
+            chunk = {
+                "object": "chat.completion.chunk",
+                "model": payload.get("model"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "delta": {"content": self.text[i : i + self.token_chars]},
+                    }
+                ],
+            }
+            self._send_chunk(b"data: " + json.dumps(chunk).encode() + b"\n\n")
+        self._send_chunk(b"data: [DONE]\n\n")
+        self._send_chunk(b"")
+
+    def _work(self, seconds):
+        if self.slots is not None:
+            self.slots.acquire()
+        try:
+            time.sleep(seconds)
+        finally:
+            if self.slots is not None:
+                self.slots.release()
+
+    def _complete_batch(self, payload):
+        prompts = payload.get("prompt", [])
+        if isinstance(prompts, str):
+            prompts = [prompts]
+        self._work(self.delay + self.batch_item_delay * len(prompts))
+        choices = [
+            {"index": i, "text": f"{self.text} ({prompt})", "finish_reason": "stop"}
+            for i, prompt in enumerate(prompts)
+        ]
+        body = {"object": "text_completion", "model": payload.get("model")}
+        self._send_body(json.dumps({**body, "choices": choices}).encode())
+
+    def _embedding(self, text):
+        vector = [0.0] * self.dimensions
+        for word in text.lower().split():
+            digest = hashlib.md5(word.encode()).digest()
+            vector[int.from_bytes(digest[:4], "little") % self.dimensions] += 1.0
+        return vector
+
+    def do_POST(self):
+        payload = self._read_json()
+        if self.path.endswith("/embeddings"):
+            delay = self.delay if self.embedding_delay is None else self.embedding_delay
+            time.sleep(delay)
+            data = [
+                {"index": i, "embedding": self._embedding(text)}
+                for i, text in enumerate(payload.get("input", []))
+            ]
+            body = {"object": "list", "data": data, "model": payload.get("model")}
+            self._send_body(json.dumps(body).encode())
+            return
+        if self.path.endswith("/completions") and not self.path.endswith(
+            "/chat/completions"
+        ):
+            self._complete_batch(payload)
+            return
+        if payload.get("stream"):
+            if self.delay:
+                time.sleep(self.delay)
+            self._stream_completion(payload)
+            return
+        # A non-streamed completion arrives once every token is generated.
+        tokens = -(-len(self.text) // self.token_chars)
+        self._work(self.delay + self.batch_item_delay + self.token_delay * (tokens - 1))
+        if self._tail_or_error():
+            return
+        text = self.text
+        if self.digest_replies:
+            prompt = json.dumps(payload.get("messages")).encode()
+            text += f" [{hashlib.md5(prompt).hexdigest()[:8]}]"
+        body = {
+            "object": "chat.completion",
+            "model": payload.get("model"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": text},
+                    "finish_reason": "stop",
+                }
+            ],
+        }
+        self._send_body(json.dumps(body).encode())
+
+
+class StaticSiteStubHandler(_StubHandler):
+    """Serves pages /page/<n> of a generated static site with ETags.
+
+    A GET with a matching If-None-Match is answered 304 Not Modified. Bump
+    version to change every page.
+    """
+
+    pages = 10000
+    paragraphs = 20
+    version = 1
+    # Declared in Content-Type, whether or not it names a real encoding.
+    charset = "utf-8"
+
+    def _page(self, number):
+        links = " ".join(
+            f'<a href="/page/{(number + i) % self.pages}">page {i}</a>'
+            for i in range(1, 11)
+        )
+        body = "".join(
+            f"<p>Page {number} paragraph {i}: the quick brown fox jumps over the "
+            f"lazy dog while the <b>service</b> handles request {number * i}.</p>"
+            for i in range(self.paragraphs)
+        )
+        return (
+            f"<!DOCTYPE html><html><head><title>Page {number}</title>"
+            f"<style>body {{ font-family: sans-serif; }}</style>"
+            f"<script>var page = {number};</script></head>"
+            f"<body><nav>{links}</nav><main>{body}</main></body></html>"
+        ).encode()
+
+    def do_GET(self):
+        # Query strings are ignored, so /page/1?ref=x serves the same page.
+        path = self.path.split("?")[0]
+        if not path.startswith("/page/") or not path[len("/page/") :].isdigit():
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        number = int(path[len("/page/") :])
+        if self.delay:
+            time.sleep(self.delay)
+        etag = f'"{self.version}-{number}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = self._page(number)
+        self.send_response(200)
+        self.send_header("Content-Type", f"text/html; charset={self.charset}")
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default listen backlog of 5 makes bursts of concurrent clients wait
+    # out SYN retransmits.
+    request_queue_size = 1024
+
+    def handle_error(self, request, client_address):
+        # Clients that hang up early (e.g. the losing side of a hedged
+        # request) are expected; anything else is still reported.
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def start_stub_server(handler_class, delay=0.0, **attributes):
+    """Starts a stub server on a free port and returns (server, base_url).
+
+    Extra keyword arguments override attributes of the handler class.
+    """
+    if attributes.get("slots") is not None:
+        attributes["slots"] = threading.BoundedSemaphore(attributes["slots"])
+    handler = type(
+        handler_class.__name__, (handler_class,), {"delay": delay, **attributes}
+    )
+    server = _StubServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
@@ -0,0 +1,363 @@
+# backend/collector_supervisor.py
+import collections
+import json
+import os
+import signal
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+
+from . import spool
+
+COLLECTOR_SCRIPT = os.path.join(os.path.dirname(__file__), "data_collection.py")
+MAX_COLLECTORS = int(os.getenv("MAX_COLLECTORS", "32"))
+COLLECTOR_STATS_INTERVAL = float(os.getenv("COLLECTOR_STATS_INTERVAL", "1"))
+COLLECTOR_STOP_TIMEOUT = float(os.getenv("COLLECTOR_STOP_TIMEOUT", "10"))
+# Collectors are recorded next to the agents, so every worker process sees
+# (and can stop) the collectors the others started.
+DB_PATH = os.getenv("COLLECTORS_DB", os.path.join("projects", "agents.sqlite3"))
+# A collector whose smoothed spool batch write takes longer than this, or
+# whose queue is over half full, marks the spool disk as saturated: it is
+# reported as throttled and no further collectors are started until it
+# recovers.
+SLOW_WRITE_MS = float(os.getenv("COLLECTOR_SLOW_WRITE_MS", "200"))
+THROTTLE_QUEUE_FRACTION = 0.5
+OUTPUT_LINES = 50
+# Must match data_collection.STATS_PREFIX.
+STATS_PREFIX = "@stats "
+SPOOL_OPTIONS = {
+    "compression": str,
+    "segment_bytes": int,
+    "segment_seconds": float,
+    "fsync": str,
+    "max_pending_events": int,
+}
+
+
+class CollectorError(Exception):
+    """A collector cannot be started or stopped; status is the HTTP code."""
+
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+def _throttled(stats):
+    queue_full = (
+        stats.get("queued_events", 0)
+        >= stats.get("max_pending_events", 0) * THROTTLE_QUEUE_FRACTION
+    )
+    return stats.get("write_ms", 0) > SLOW_WRITE_MS or queue_full
+
+
+def _is_collector(pid, script):
+    """True if pid is alive and, where /proc tells, running script."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            # The pid may have been reused after the collector exited.
+            return os.path.basename(script).encode() in f.read()
+    except OSError:
+        return True
+
+
+class CollectorProcess:
+    """One data_collection.py process and the stats it last reported."""
+
+    def __init__(self, agent_id, options, process, on_stats=None):
+        self.agent_id = agent_id
+        self.options = options
+        self.process = process
+        self.on_stats = on_stats
+        self.started_at = time.time()
+        self.stopped_at = None
+        self.stats = {}
+        self.stats_at = None
+        self.output = collections.deque(maxlen=OUTPUT_LINES)
+        self.reader = threading.Thread(
+            target=self._read_output,
+            name=f"collector-{agent_id}",
+            daemon=True,
+        )
+        self.reader.start()
+
+    def _read_output(self):
+        for line in self.process.stdout:
+            line = line.rstrip("\n")
+            if line.startswith(STATS_PREFIX):
+                try:
+                    self.stats = json.loads(line[len(STATS_PREFIX) :])
+                    self.stats_at = time.time()
+                except ValueError:
+                    continue
+                if self.on_stats is not None:
+                    self.on_stats(self)
+            else:
+                self.output.append(line)
+        self.process.stdout.close()
+        # Reap the process, so other workers polling its pid see it gone.
+        self.process.wait()
+
+    def running(self):
+        return self.process.poll() is None
+
+    def throttled(self):
+        if not self.running() or not self.stats:
+            return False
+        return _throttled(self.stats)
+
+    def state(self):
+        if self.running():
+            return "throttled" if self.throttled() else "running"
+        return "stopped" if self.stopped_at is not None else "exited"
+
+    def to_dict(self):
+        return {
+            "agent_id": self.agent_id,
+            "state": self.state(),
+            "pid": self.process.pid,
+            "returncode": self.process.poll(),
+            "started_at": self.started_at,
+            "uptime": round((self.stopped_at or time.time()) - self.started_at, 1),
+            "options": self.options,
+            "stats": self.stats,
+            "stats_at": self.stats_at,
+            "output": list(self.output)[-10:],
+        }
+
+
+class CollectorSupervisor:
+    """Starts, stops and monitors one data collector process per agent.
+
+    Each collector runs data_collection.py in its own process and prints a
+    stats line every stats_interval seconds, which a reader thread keeps as
+    the collector's latest stats. Collectors that exit on their own stay
+    listed (with their last output) until they are started again.
+
+    Collectors are also recorded in SQLite with their pid and latest stats,
+    so a supervisor in another worker process reports them, counts them
+    against max_collectors and can stop them.
+    """
+
+    def __init__(
+        self,
+        script=COLLECTOR_SCRIPT,
+        max_collectors=MAX_COLLECTORS,
+        stats_interval=COLLECTOR_STATS_INTERVAL,
+        stop_timeout=COLLECTOR_STOP_TIMEOUT,
+        db_path=DB_PATH,
+    ):
+        self.script = script
+        self.max_collectors = max_collectors
+        self.stats_interval = stats_interval
+        self.stop_timeout = stop_timeout
+        self.db_path = db_path
+        self._collectors = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with self._db() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS collectors ("
+                "agent_id TEXT PRIMARY KEY, pid INTEGER NOT NULL, "
+                "started_at REAL NOT NULL, options TEXT NOT NULL, "
+                "stats TEXT NOT NULL, stats_at REAL)"
+            )
+
+    def _db(self):
+        # sqlite3 connections must not be shared between threads.
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = sqlite3.connect(self.db_path, timeout=10)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def _record(self, collector):
+        with self._db() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO collectors VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    collector.agent_id,
+                    collector.process.pid,
+                    collector.started_at,
+                    json.dumps(collector.options),
+                    json.dumps(collector.stats),
+                    collector.stats_at,
+                ),
+            )
+
+    def _remote(self, agent_id=None):
+        """Recorded collectors that this process did not start, by agent."""
+        query = "SELECT * FROM collectors"
+        params = ()
+        if agent_id is not None:
+            query += " WHERE agent_id = ?"
+            params = (agent_id,)
+        rows = self._db().execute(query, params).fetchall()
+        with self._lock:
+            local = {
+                agent: collector.process.pid
+                for agent, collector in self._collectors.items()
+            }
+        remote = {}
+        for agent, pid, started_at, options, stats, stats_at in rows:
+            if local.get(agent) == pid:
+                continue
+            running = _is_collector(pid, self.script)
+            stats = json.loads(stats)
+            remote[agent] = {
+                "agent_id": agent,
+                "state": (
+                    ("throttled" if _throttled(stats) else "running")
+                    if running and stats
+                    else "running" if running else "exited"
+                ),
+                "pid": pid,
+                "returncode": None,
+                "started_at": started_at,
+                "uptime": round(time.time() - started_at, 1) if running else None,
+                "options": json.loads(options),
+                "stats": stats,
+                "stats_at": stats_at,
+                # Output is only kept by the process that started it.
+                "output": [],
+            }
+        return remote
+
+    @staticmethod
+    def _parse_options(options):
+        parsed = {}
+        for name, value in (options or {}).items():
+            if name not in SPOOL_OPTIONS:
+                raise CollectorError(f"Unknown collector option: {name}", 400)
+            if value is None:
+                continue
+            try:
+                parsed[name] = SPOOL_OPTIONS[name](value)
+            except (TypeError, ValueError):
+                raise CollectorError(f"Invalid value for {name}: {value!r}", 400)
+        if parsed.get("compression") not in spool.COMPRESSION_SUFFIXES:
+            raise CollectorError(
+                f"Unsupported compression: {parsed['compression']}", 400
+            )
+        if parsed.get("fsync", "segment") not in spool.FSYNC_POLICIES:
+            raise CollectorError(f"Unsupported fsync policy: {parsed['fsync']}", 400)
+        return parsed
+
+    def _command(self, agent_id, options):
+        command = [sys.executable, "-u", self.script, "--agent_id", agent_id]
+        command += ["--stats_interval", str(self.stats_interval)]
+        for name, value in options.items():
+            command += [f"--{name}", str(value)]
+        return command
+
+    def start(self, agent_id, options=None):
+        """Starts a collector for agent_id and returns its status."""
+        options = self._parse_options(options)
+        remote = [
+            status
+            for status in self._remote().values()
+            if status["state"] in ("running", "throttled")
+        ]
+        with self._lock:
+            current = self._collectors.get(agent_id)
+            if (current is not None and current.running()) or any(
+                status["agent_id"] == agent_id for status in remote
+            ):
+                raise CollectorError("Data collection is already running", 409)
+            running = [c for c in self._collectors.values() if c.running()]
+            if len(running) + len(remote) >= self.max_collectors:
+                raise CollectorError("Too many data collectors running", 503)
+            if any(c.throttled() for c in running) or any(
+                status["state"] == "throttled" for status in remote
+            ):
+                raise CollectorError("Spool disk is saturated; try again later", 503)
+            process = subprocess.Popen(
+                self._command(agent_id, options),
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                bufsize=1,
+            )
+            collector = CollectorProcess(agent_id, options, process, self._record)
+            self._collectors[agent_id] = collector
+        self._record(collector)
+        return collector.to_dict()
+
+    def stop(self, agent_id):
+        """Stops agent_id's collector, letting it save its recording first."""
+        with self._lock:
+            collector = self._collectors.get(agent_id)
+        if collector is None or not collector.running():
+            status = self._remote(agent_id).get(agent_id)
+            if status is None or status["state"] == "exited":
+                raise CollectorError("Data collection is not running", 404)
+            return self._terminate_remote(status)
+        self._terminate(collector)
+        return collector.to_dict()
+
+    def _terminate_remote(self, status):
+        """Stops a collector another process started; it reaps the process."""
+        pid = status["pid"]
+        try:
+            os.kill(pid, signal.SIGTERM)
+            deadline = time.monotonic() + self.stop_timeout
+            while _is_collector(pid, self.script):
+                if time.monotonic() >= deadline:
+                    os.kill(pid, signal.SIGKILL)
+                    break
+                time.sleep(0.05)
+        except ProcessLookupError:
+            pass
+        return {**status, "state": "stopped", "uptime": None}
+
+    def _terminate(self, collector):
+        collector.stopped_at = time.time()
+        try:
+            collector.process.send_signal(signal.SIGTERM)
+            collector.process.wait(self.stop_timeout)
+        except subprocess.TimeoutExpired:
+            collector.process.kill()
+            collector.process.wait()
+        except ProcessLookupError:
+            pass
+        collector.reader.join(1)
+        collector.stopped_at = time.time()
+
+    def status(self, agent_id):
+        with self._lock:
+            collector = self._collectors.get(agent_id)
+        if collector is not None:
+            return collector.to_dict()
+        return self._remote(agent_id).get(agent_id)
+
+    def statuses(self):
+        remote = self._remote()
+        with self._lock:
+            collectors = list(self._collectors.values())
+        return [collector.to_dict() for collector in collectors] + list(remote.values())
+
+    def active_count(self):
+        remote = sum(status["state"] != "exited" for status in self._remote().values())
+        with self._lock:
+            return remote + sum(c.running() for c in self._collectors.values())
+
+    def shutdown(self):
+        """Stops every running collector."""
+        with self._lock:
+            running = [c for c in self._collectors.values() if c.running()]
+        for collector in running:
+            self._terminate(collector)
+
+
+supervisor = CollectorSupervisor()
@@ -1,32 +1,95 @@
 # backend/data_collection.py
+import argparse
 import atexit
 import datetime
 import json
 import os
+import queue
 import random
+import signal
 import subprocess
 import sys
 import threading
 import time
 
 import pynput
+import requests
 from pynput.keyboard import Key, KeyCode, Listener
 
+import spool
+
 DATA_DIR = "data_collection"
 os.makedirs(DATA_DIR, exist_ok=True)
+# How often the background worker drains the event queue.
+FLUSH_INTERVAL = 0.05
+# How often the active window title is re-sampled while recording.
+WINDOW_POLL_INTERVAL = 0.5
+
+# Upload chunk size when streaming a recording to the fine-tuning endpoint.
+UPLOAD_CHUNK_BYTES = 64 * 1024
+# Backpressure: once this many key events are waiting for the spool (e.g. the
+# disk is slow), new ones are dropped and counted instead of queued, since the
+# keyboard listener itself must never block.
+MAX_PENDING_EVENTS = 10_000
+# Prefix of the machine-readable stats lines printed with --stats_interval,
+# read by collector_supervisor.py.
+STATS_PREFIX = "@stats "
+
+# Control markers passed through the event queue alongside key events.
+_START = "start"
+_STOP = "stop"
+_KEY = "key"
 
 
 class DataCollector:
-    def __init__(self, agent_id):
+    """Records keystrokes while Ctrl+R recording is active.
+
+    The pynput callbacks only push (kind, timestamp, key) tuples onto a
+    SimpleQueue; a background worker drains it in batches, tags events with
+    the most recently sampled active window and appends them to a rotating
+    JSONL spool, so slow window lookups, disk writes or HTTP calls never
+    stall the keyboard listener and memory stays flat during long sessions.
+    """
+
+    def __init__(
+        self,
+        agent_id,
+        flush_interval=FLUSH_INTERVAL,
+        window_poll_interval=WINDOW_POLL_INTERVAL,
+        compression=None,
+        segment_bytes=spool.SEGMENT_MAX_BYTES,
+        segment_seconds=spool.SEGMENT_MAX_SECONDS,
+        fsync="segment",
+        max_pending_events=MAX_PENDING_EVENTS,
+        stats_interval=None,
+    ):
         self.agent_id = agent_id
         self.start_time = time.time()
-        self.data = []
-        self.current_entry = {}
+        self.spool = None
+        self.compression = compression
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.fsync = fsync
         self.modifier_pressed = False
         self.recording = False
         self.stop_event = threading.Event()
         self.last_batch_end_time = None
         self.lock = threading.Lock()
+        self.flush_interval = flush_interval
+        self.window_poll_interval = window_poll_interval
+        self.events = queue.SimpleQueue()
+        self.active_window = "Unknown Window"
+        self.window_sampled_at = 0.0
+        self.processed_events = 0
+        self.max_pending_events = max_pending_events
+        self.dropped_events = 0
+        self.write_seconds = 0.0
+        self.stats_interval = stats_interval
+        self.stats_reported_at = time.time()
+        self.stats_reported_events = 0
+        self.listener = None
+        self.worker = None
+        self.worker_stop = threading.Event()
 
     def get_active_window_title(self):
         try:
@@ -37,7 +100,7 @@ class DataCollector:
                 return win32gui.GetWindowText(window)
             elif sys.platform == "darwin":
                 # Requires 'appscript' to be installed
-                from appscript import app, mactypes
+                from appscript import app, its
 
                 return (
                     app("System Events")
@@ -78,15 +141,10 @@ class DataCollector:
         else:
             self.modifier_pressed = False
         if self.recording:
-            timestamp = time.time()
-            active_window = self.get_active_window_title()
-            self.current_entry = {
-                "timestamp": timestamp,
-                "event": "keypress",
-                "key": str(key),
-                "active_window": active_window,
-            }
-            self.data.append(self.current_entry)
+            if self.events.qsize() >= self.max_pending_events:
+                self.dropped_events += 1
+            else:
+                self.events.put((_KEY, time.time(), str(key)))
 
     def on_release(self, key):
         if key == Key.ctrl_r:
@@ -98,7 +156,7 @@ class DataCollector:
                 print("Starting data collection...")
                 self.recording = True
                 self.start_time = time.time()
-                self.data = []  # Reset data
+                self.events.put((_START, self.start_time, None))
 
     def stop_recording_and_trigger_finetuning(self):
         with self.lock:
@@ -106,36 +164,167 @@ class DataCollector:
                 self.recording = False
                 print("Stopping data collection...")
                 self.last_batch_end_time = time.time()
-                self.save_data()
-                self.trigger_fine_tuning()
+                # The worker saves once every earlier key event is processed.
+                self.events.put((_STOP, self.last_batch_end_time, None))
 
-    def save_data(self):
-        if not self.data:
-            return
+    def start_worker(self):
+        if self.worker is None or not self.worker.is_alive():
+            self.worker_stop.clear()
+            self.worker = threading.Thread(
+                target=self._work, name="data-collection-worker", daemon=True
+            )
+            self.worker.start()
+
+    def stop_worker(self, timeout=None):
+        """Stops the worker after it has drained every queued event."""
+        self.worker_stop.set()
+        if self.worker is not None:
+            self.worker.join(timeout)
+
+    def _sample_active_window(self, now):
+        if now - self.window_sampled_at >= self.window_poll_interval:
+            self.active_window = self.get_active_window_title()
+            self.window_sampled_at = now
+
+    def _drain(self):
+        """Processes every queued event; returns False once the queue is empty."""
+        batch = []
+        while True:
+            try:
+                batch.append(self.events.get_nowait())
+            except queue.Empty:
+                break
+        if not batch:
+            return False
+        entries = []
+        for kind, timestamp, key in batch:
+            if kind == _KEY:
+                self.processed_events += 1
+                entries.append(
+                    {
+                        "timestamp": timestamp,
+                        "event": "keypress",
+                        "key": key,
+                        "active_window": self.active_window,
+                    }
+                )
+            elif kind == _START:
+                entries = []
+                self.spool = self._open_spool()
+                self.window_sampled_at = 0.0
+                self._sample_active_window(time.time())
+            elif kind == _STOP:
+                self._write(entries)
+                entries = []
+                segments = self.save_data()
+                self.trigger_fine_tuning(segments)
+        self._write(entries)
+        return True
+
+    def stats(self):
+        """Returns collector counters; events_per_sec covers the time since the last call."""
+        now = time.time()
+        elapsed = now - self.stats_reported_at
+        events_per_sec = (
+            (self.processed_events - self.stats_reported_events) / elapsed
+            if elapsed > 0
+            else 0.0
+        )
+        self.stats_reported_at = now
+        self.stats_reported_events = self.processed_events
+        recording = self.spool
+        return {
+            "recording": self.recording,
+            "processed_events": self.processed_events,
+            "events_per_sec": round(events_per_sec, 1),
+            "queued_events": self.events.qsize(),
+            "dropped_events": self.dropped_events,
+            "max_pending_events": self.max_pending_events,
+            "buffered_bytes": recording.unflushed_bytes if recording else 0,
+            "spooled_bytes": recording.bytes_written if recording else 0,
+            "last_flush": recording.last_flush if recording else None,
+            "write_ms": round(self.write_seconds * 1000, 2),
+        }
+
+    def _report_stats(self):
+        if self.stats_interval and (
+            time.time() - self.stats_reported_at >= self.stats_interval
+        ):
+            print(STATS_PREFIX + json.dumps(self.stats()), flush=True)
+
+    def _work(self):
+        while not self.worker_stop.is_set():
+            if self.recording:
+                self._sample_active_window(time.time())
+            self._drain()
+            self._report_stats()
+            self.worker_stop.wait(self.flush_interval)
+        while self._drain():
+            pass
+
+    def _open_spool(self):
         timestamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
-        data_file_path = os.path.join(
-            DATA_DIR, f"data_{self.agent_id}_{timestamp}.json"
+        return spool.SpoolWriter(
+            DATA_DIR,
+            f"data_{self.agent_id}_{timestamp}",
+            compression=self.compression,
+            max_bytes=self.segment_bytes,
+            max_seconds=self.segment_seconds,
+            fsync=self.fsync,
         )
-        with open(data_file_path, "w", encoding="utf-8") as f:
-            json.dump(self.data, f, indent=4)
-        print(f"Data collected and saved to {data_file_path}")
-        self.data = []  # Reset data after saving
 
-    def trigger_fine_tuning(self):
+    def _write(self, entries):
+        if entries and self.spool is not None:
+            start = time.monotonic()
+            self.spool.write_many(entries)
+            # Smoothed batch write time, reported as a sign of a slow disk.
+            elapsed = time.monotonic() - start
+            self.write_seconds += 0.2 * (elapsed - self.write_seconds)
+
+    def save_data(self):
+        """Closes the recording's spool and returns its segment files."""
+        if self.spool is None:
+            return []
+        recording, self.spool = self.spool, None
+        segments = recording.close()
+        if segments:
+            print(
+                f"Data collected and saved to {len(segments)} segment(s) "
+                f"in {DATA_DIR} ({recording.records_written} events)"
+            )
+        return segments
+
+    def _upload_body(self, segments):
+        """Streams the recorded events as a {"data": [...]} JSON body."""
+        chunk = [b'{"data":[']
+        size = 0
+        first = True
+        for record in spool.iter_records(segments):
+            encoded = json.dumps(record, separators=(",", ":")).encode("utf-8")
+            chunk.append(encoded if first else b"," + encoded)
+            size += len(encoded) + 1
+            first = False
+            if size >= UPLOAD_CHUNK_BYTES:
+                yield b"".join(chunk)
+                chunk, size = [], 0
+        chunk.append(b"]}")
+        yield b"".join(chunk)
+
+    def trigger_fine_tuning(self, segments):
         """Triggers fine-tuning for the specified agent using the collected data."""
         print(
             f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Triggering fine-tuning for agent {self.agent_id}..."
         )
         try:
-            # Here, instead of reading from a file, we're using the collected data directly
-            fine_tuning_data = self.data
-            # Ensure fine_tuning_data is not empty
-            if not fine_tuning_data:
+            # Ensure there is data to fine-tune with
+            if not segments:
                 print("No data to fine-tune with.")
                 return
+            # The segments are streamed from disk rather than loaded whole.
             response = requests.post(
                 f"http://localhost:5000/api/agents/{self.agent_id}/fine_tune",
-                json={"data": fine_tuning_data},
+                data=self._upload_body(segments),
+                headers={"Content-Type": "application/json"},
                 timeout=30,
             )
             response.raise_for_status()
@@ -147,17 +336,27 @@ class DataCollector:
         except Exception as e:
             print(f"An unexpected error occurred during fine-tuning: {e}")
 
+    def stop(self):
+        """Stops the keyboard listener, saving any recording in progress."""
+        if self.listener is not None:
+            self.listener.stop()
+
     def run(self):
+        self.start_worker()
         with Listener(on_press=self.on_press, on_release=self.on_release) as listener:
+            self.listener = listener
             print("Press Ctrl+R to start/stop recording, Esc to quit.")
             listener.join()
             if not self.stop_event.is_set():
                 print("Stopping data collection process...")
                 self.stop_recording_and_trigger_finetuning()
+        self.stop_worker()
 
 
-def start_data_collection(agent_id):
-    collector = DataCollector(agent_id)
+def start_data_collection(agent_id, **options):
+    collector = DataCollector(agent_id, **options)
+    # collector_supervisor.py stops collectors with SIGTERM.
+    signal.signal(signal.SIGTERM, lambda signum, frame: collector.stop())
     collector.run()
 
 
@@ -169,5 +368,51 @@ if __name__ == "__main__":
         required=True,
         help="ID of the agent for which data is being collected.",
     )
+    parser.add_argument(
+        "--compression",
+        type=str,
+        default=None,
+        choices=["gzip", "zstd"],
+        help="Compress spooled segments.",
+    )
+    parser.add_argument(
+        "--segment_bytes",
+        type=int,
+        default=spool.SEGMENT_MAX_BYTES,
+        help="Rotate a segment after this many uncompressed bytes.",
+    )
+    parser.add_argument(
+        "--segment_seconds",
+        type=float,
+        default=spool.SEGMENT_MAX_SECONDS,
+        help="Rotate a segment after it has been open this long.",
+    )
+    parser.add_argument(
+        "--fsync",
+        type=str,
+        default="segment",
+        choices=spool.FSYNC_POLICIES,
+        help="When to fsync spooled data to disk.",
+    )
+    parser.add_argument(
+        "--max_pending_events",
+        type=int,
+        default=MAX_PENDING_EVENTS,
+        help="Drop key events once this many are waiting to be spooled.",
+    )
+    parser.add_argument(
+        "--stats_interval",
+        type=float,
+        default=None,
+        help="Print a stats line for the supervisor every this many seconds.",
+    )
     args = parser.parse_args()
-    start_data_collection(args.agent_id)
+    start_data_collection(
+        args.agent_id,
+        compression=args.compression,
+        segment_bytes=args.segment_bytes,
+        segment_seconds=args.segment_seconds,
+        fsync=args.fsync,
+        max_pending_events=args.max_pending_events,
+        stats_interval=args.stats_interval,
+    )
@@ -0,0 +1,151 @@
+# backend/dataset_cache.py
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+CACHE_DIR = os.getenv("FINETUNE_CACHE_DIR", "/app/projects/.token_cache")
+TOKENIZE_BATCH_SIZE = 1024
+TOKEN_DTYPE = np.int32
+PROMPT_TEMPLATE = "### System:\n{system_prompt}\n### User:\n{user_prompt}\n</s>"
+
+
+def format_example(item, template=PROMPT_TEMPLATE):
+    """Renders a data record into the prompt template used for training."""
+    return template.format(
+        system_prompt=item.get("system_prompt", ""),
+        user_prompt=item.get("user_prompt", ""),
+    )
+
+
+def _file_digest(path):
+    """Hashes a file, or every closed file of a spool directory in order."""
+    if os.path.isdir(path):
+        names = sorted(name for name in os.listdir(path) if not name.endswith(".open"))
+        paths = [os.path.join(path, name) for name in names]
+    else:
+        paths = [path]
+    digest = hashlib.sha256()
+    for file_path in paths:
+        digest.update(os.path.basename(file_path).encode("utf-8"))
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_key(data_file, tokenizer_name, template=PROMPT_TEMPLATE):
+    """Hashes the data file contents, tokenizer and template into a cache key."""
+    digest = hashlib.sha256()
+    for part in (_file_digest(data_file), tokenizer_name, template):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class TokenCache:
+    """Token ids for a whole dataset in one flat memory-mapped array.
+
+    Example ``i`` is ``ids[offsets[i]:offsets[i + 1]]``; slicing the memmap
+    does not copy, so only the pages actually read are brought into memory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.offsets = np.load(os.path.join(path, "offsets.npy"))
+        if self.offsets[-1]:
+            self.ids = np.memmap(
+                os.path.join(path, "ids.bin"), dtype=TOKEN_DTYPE, mode="r"
+            )
+        else:
+            # np.memmap refuses empty files.
+            self.ids = np.empty(0, dtype=TOKEN_DTYPE)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, idx):
+        return self.ids[self.offsets[idx] : self.offsets[idx + 1]]
+
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    @property
+    def num_tokens(self):
+        return int(self.offsets[-1])
+
+
+def build_token_cache(records, tokenizer, path, template=PROMPT_TEMPLATE):
+    """Tokenizes records in batches and writes ids.bin/offsets.npy under path."""
+    offsets = [0]
+    with open(os.path.join(path, "ids.bin"), "wb") as ids_file:
+        for start in range(0, len(records), TOKENIZE_BATCH_SIZE):
+            batch = records[start : start + TOKENIZE_BATCH_SIZE]
+            texts = [format_example(item, template) for item in batch]
+            encoded = tokenizer(texts, truncation=True)["input_ids"]
+            for input_ids in encoded:
+                np.asarray(input_ids, dtype=TOKEN_DTYPE).tofile(ids_file)
+                offsets.append(offsets[-1] + len(input_ids))
+    np.save(os.path.join(path, "offsets.npy"), np.asarray(offsets, dtype=np.int64))
+
+
+def load_or_build_token_cache(
+    data_file,
+    records,
+    tokenizer,
+    tokenizer_name,
+    template=PROMPT_TEMPLATE,
+    cache_dir=CACHE_DIR,
+):
+    """Returns the cached tokenization of data_file, building it on a miss."""
+    key = cache_key(data_file, tokenizer_name, template)
+    path = os.path.join(cache_dir, key)
+    if os.path.exists(os.path.join(path, "meta.json")):
+        print(f"Using cached tokenization: {path}")
+        return TokenCache(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    # Build into a temporary directory and rename it into place so that a
+    # crashed or concurrent run never leaves a half-written cache behind.
+    tmp_path = tempfile.mkdtemp(prefix=f".{key}-", dir=cache_dir)
+    try:
+        build_token_cache(records, tokenizer, tmp_path, template)
+        with open(os.path.join(tmp_path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "data_file": os.path.abspath(data_file),
+                    "tokenizer": tokenizer_name,
+                    "template": template,
+                    "num_examples": len(records),
+                },
+                f,
+            )
+        os.replace(tmp_path, path)
+    except OSError:
+        # Another run finished the same cache first.
+        if not os.path.exists(os.path.join(path, "meta.json")):
+            raise
+    finally:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+    print(f"Tokenized {len(records)} examples into {path}")
+    return TokenCache(path)
+
+
+class MemmapDataset:
+    """Map-style training dataset reading examples from a TokenCache."""
+
+    def __init__(self, token_cache):
+        self.token_cache = token_cache
+
+    def __len__(self):
+        return len(self.token_cache)
+
+    def __getitem__(self, idx):
+        # Labels need int64; widen just this example's slice.
+        input_ids = self.token_cache[idx].astype(np.int64)
+        return {
+            "input_ids": input_ids,
+            "attention_mask": np.ones_like(input_ids),
+        }
@@ -1,53 +0,0 @@
-# backend/fine_tune.py
-import argparse
-import json
-import os
-import time
-
-
-def run_fine_tuning(data_file, output_dir, agent_id):
-    """
-    Simulates a fine-tuning process based on the provided data file.
-    Replace this with your actual fine-tuning code.
-    """
-    print(f"Starting fine-tuning for agent {agent_id}...")
-    print(f"Data file: {data_file}")
-    print(f"Output directory: {output_dir}")
-    # Load and process the fine-tuning data
-    try:
-        with open(data_file, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            print(f"Loaded data: {data}")
-    except Exception as e:
-        print(f"Error loading data: {e}")
-        return
-    # Simulate fine-tuning time
-    time.sleep(10)
-    # Create a dummy output file to simulate the result of fine-tuning
-    results_file = os.path.join(output_dir, "fine_tuning_results.txt")
-    with open(results_file, "w", encoding="utf-8") as f:
-        f.write(f"Fine-tuning completed at {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
-        f.write(f"Agent ID: {agent_id}\n")
-        f.write("Fine-tuning data used:\n")
-        json.dump(data, f, indent=4)
-    print(
-        f"Fine-tuning completed for agent {agent_id}. Results written to {results_file}"
-    )
-
-
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Run fine-tuning process.")
-    parser.add_argument(
-        "--data_file", type=str, required=True, help="Path to the data file."
-    )
-    parser.add_argument(
-        "--output_dir", type=str, required=True, help="Path to the output directory."
-    )
-    parser.add_argument(
-        "--agent_id",
-        type=str,
-        required=True,
-        help="ID of the agent running fine-tuning.",
-    )
-    args = parser.parse_args()
-    run_fine_tuning(args.data_file, args.output_dir, args.agent_id)
@@ -1,24 +1,54 @@
 # backend/finetune.py
 import argparse
-import datetime
+import itertools
 import json
+import math
 import os
 import time
 
-import torch
-from peft import LoraConfig, get_peft_model
-from transformers import (
-    AutoModelForCausalLM,
-    AutoTokenizer,
-    DataCollatorForLanguageModeling,
-    Trainer,
-    TrainingArguments,
-)
+# Heavy ML dependencies (torch, transformers, peft) are imported inside the
+# backends that need them, so simulated runs and callers that only want the
+# backend registry do not pay their import cost. Sibling helper modules are
+# imported lazily too, as this file runs both as a script and as
+# backend.finetune.
 
+DEFAULT_BACKEND = os.getenv("FINETUNE_BACKEND", "peft")
+CPU_BASE_MODEL = os.getenv("FINETUNE_CPU_MODEL", "sshleifer/tiny-gpt2")
 
-def load_and_prepare_data(data_file):
-    """Loads and prepares the data for fine-tuning."""
+BACKENDS = {}
+
+
+def register_backend(name):
+    """Registers a training backend under the given name."""
+
+    def decorator(fn):
+        BACKENDS[name] = fn
+        return fn
+
+    return decorator
+
+
+def load_and_prepare_data(data_file, compiled=False):
+    """Loads and prepares the data for fine-tuning.
+
+    data_file is a JSON array, a JSONL spool segment or a spool directory.
+    Spooled keystroke logs are compiled into examples while streaming, so the
+    raw events are never all held in memory. With compiled, the data is
+    known to hold examples already and is not inspected.
+    """
     try:
+        if os.path.isdir(data_file) or ".jsonl" in os.path.basename(data_file):
+            from keystroke_compiler import compile_keystrokes, is_keystroke_log
+            from spool import iter_records
+
+            records = iter_records(data_file)
+            first = next(records, None)
+            if first is None:
+                return []
+            records = itertools.chain([first], records)
+            if not compiled and is_keystroke_log([first]):
+                return compile_keystrokes(records)
+            return list(records)
         with open(data_file, "r", encoding="utf-8") as f:
             data = json.load(f)
         return data
@@ -27,114 +57,298 @@ def load_and_prepare_data(data_file):
         return []
 
 
-def run_fine_tuning(data_file, output_dir, agent_id):
-    """
-    Fine-tunes a model based on the provided data file.
+def train_with_transformers(
+    data_file,
+    output_dir,
+    raw_data,
+    base_model,
+    model_kwargs,
+    lora_kwargs,
+    training_kwargs,
+    packing=False,
+    block_size=1024,
+    batch_size=1,
+    group_by_length=False,
+    resume_from=None,
+    incremental=False,
+):
+    """Shared tokenization and LoRA training path for transformer backends.
+
+    With resume_from, the adapter and optimizer state continue from that
+    trainer checkpoint. Incremental runs train for at most one epoch over
+    the (new) data instead of the full max_steps.
+
+    Returns a dict of throughput metrics.
     """
-    print(f"Starting fine-tuning for agent {agent_id}...")
-    print(f"Data file: {data_file}")
-    print(f"Output directory: {output_dir}")
-    # Load and prepare the fine-tuning data
-    raw_data = load_and_prepare_data(data_file)
-    if not raw_data:
-        print("No data loaded. Exiting.")
-        return
-    # Use the first entry in the dataset to determine the base model
-    base_model = raw_data[0].get("base_model", "mistralai/Mistral-7B-v0.1")
+    from peft import LoraConfig, get_peft_model
+    from transformers import (
+        AutoModelForCausalLM,
+        AutoTokenizer,
+        DataCollatorForLanguageModeling,
+        Trainer,
+        TrainingArguments,
+        default_data_collator,
+    )
+
+    from dataset_cache import MemmapDataset, load_or_build_token_cache
+    from finetune_state import checkpoint_step
+    from packing import (
+        LengthBucketSampler,
+        PackedDataset,
+        ThroughputCollator,
+        packing_attn_implementation,
+        packing_mode,
+    )
+
+    class BucketedTrainer(Trainer):
+        """Trainer that draws batches from a LengthBucketSampler."""
+
+        def __init__(self, *args, train_sampler=None, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.train_sampler = train_sampler
+
+        def _get_train_sampler(self, *args, **kwargs):
+            if self.train_sampler is not None:
+                return self.train_sampler
+            return super()._get_train_sampler(*args, **kwargs)
+
     print(f"Using base model: {base_model}")
     # Load tokenizer and model
     tokenizer = AutoTokenizer.from_pretrained(base_model)
     tokenizer.pad_token = tokenizer.eos_token
-    model = AutoModelForCausalLM.from_pretrained(
-        base_model, load_in_4bit=True, device_map="auto", trust_remote_code=True
-    )
-    # Tokenize the data
-    tokenized_data = []
-    for item in raw_data:
-        messages = [
-            {"role": "system", "content": item.get("system_prompt", "")},
-            {"role": "user", "content": item.get("user_prompt", "")},
-        ]
-
-        # Format the messages in a way that the tokenizer understands
-        formatted_messages = []
-        for message in messages:
-            if message["role"] == "system":
-                formatted_messages.append(f"### System:\n{message['content']}")
-            elif message["role"] == "user":
-                formatted_messages.append(f"### User:\n{message['content']}")
-            elif message["role"] == "assistant":
-                formatted_messages.append(f"### Assistant:\n{message['content']}")
-
-        # Add the EOS token to indicate the end of the conversation
-        formatted_messages.append("</s>")
-
-        # Join the formatted messages into a single string
-        text = "\n".join(formatted_messages)
-
-        # Tokenize the text
-        tokenized_input = tokenizer(
-            text, return_tensors="pt", padding=True, truncation=True
+    if packing and "attn_implementation" not in model_kwargs:
+        attn_implementation = packing_attn_implementation()
+        if attn_implementation:
+            model_kwargs = {**model_kwargs, "attn_implementation": attn_implementation}
+    model = AutoModelForCausalLM.from_pretrained(base_model, **model_kwargs)
+    mode = packing_mode(model) if packing else None
+    if packing and mode is None:
+        # Other attention implementations ignore position_ids and custom
+        # masks, so packed examples would attend to each other.
+        print(
+            "Packing needs flash_attention_2, eager or sdpa attention; "
+            "padding each example instead."
         )
-        tokenized_data.append(tokenized_input)
+        packing = False
+    # Tokenize the data (cached across runs in a memory-mapped token file)
+    token_cache = load_or_build_token_cache(
+        data_file, raw_data, tokenizer, tokenizer.name_or_path
+    )
     # Configure LoRA
     config = LoraConfig(
         r=16,
         lora_alpha=32,
-        target_modules=["q_proj", "v_proj"],
         lora_dropout=0.05,
         bias="none",
         task_type="CAUSAL_LM",
+        **lora_kwargs,
     )
     model = get_peft_model(model, config)
+    train_sampler = None
+    if packing:
+        dataset = PackedDataset(token_cache, block_size, tokenizer.pad_token_id)
+        print(
+            f"Packed {len(token_cache)} examples into {len(dataset)} blocks "
+            f"of {block_size} tokens (padding ratio {dataset.padding_ratio():.3f})"
+        )
+        # flash_attention_2 splits examples at position_ids resets; eager
+        # and SDPA get a block-diagonal causal mask instead.
+        data_collator = ThroughputCollator(
+            default_data_collator,
+            drop_attention_mask=mode == "position_ids",
+            block_mask_dtype=model.dtype if mode == "block_mask" else None,
+        )
+    else:
+        dataset = MemmapDataset(token_cache)
+        if group_by_length:
+            train_sampler = LengthBucketSampler(token_cache.lengths(), batch_size)
+        data_collator = ThroughputCollator(
+            DataCollatorForLanguageModeling(tokenizer=tokenizer, mlm=False)
+        )
+    steps = training_kwargs.pop("max_steps")
+    if incremental:
+        per_step = batch_size * training_kwargs.get("gradient_accumulation_steps", 1)
+        steps = min(steps, max(1, math.ceil(len(dataset) / per_step)))
+    # Step counts are global across resumed runs.
+    start_step = checkpoint_step(resume_from) if resume_from else 0
+    if resume_from:
+        print(f"Resuming from {resume_from} at step {start_step}")
     # Define training arguments
     training_args = TrainingArguments(
         output_dir=output_dir,
-        per_device_train_batch_size=1,  # Adjust as necessary
-        gradient_accumulation_steps=4,  # Adjust as necessary
+        per_device_train_batch_size=batch_size,
         learning_rate=2e-4,
         logging_steps=10,
-        max_steps=500,
         remove_unused_columns=False,
+        max_steps=start_step + steps,
+        # Keep exactly one checkpoint (with optimizer state) at the final
+        # step so the next incremental run can resume from it.
+        save_strategy="steps",
+        save_steps=start_step + steps,
+        save_total_limit=1,
+        # The resumed run trains on different data, so do not skip batches.
+        ignore_data_skip=bool(resume_from),
+        **training_kwargs,
     )
-
-    # Create a dummy dataset
-    class SimpleDataset(torch.utils.data.Dataset):
-        def __init__(self, tokenized_data):
-            self.input_ids = [item["input_ids"].squeeze() for item in tokenized_data]
-            self.attention_mask = [
-                item["attention_mask"].squeeze() for item in tokenized_data
-            ]
-
-        def __len__(self):
-            return len(self.input_ids)
-
-        def __getitem__(self, idx):
-            return {
-                "input_ids": self.input_ids[idx],
-                "attention_mask": self.attention_mask[idx],
-            }
-
-    dataset = SimpleDataset(tokenized_data)
-    # Create data collator
-    data_collator = DataCollatorForLanguageModeling(tokenizer=tokenizer, mlm=False)
     # Create trainer
-    trainer = Trainer(
+    trainer = BucketedTrainer(
         model=model,
         args=training_args,
         train_dataset=dataset,
         data_collator=data_collator,
+        train_sampler=train_sampler,
     )
     # Train the model
-    trainer.train()
+    train_output = trainer.train(resume_from_checkpoint=resume_from)
+    runtime = train_output.metrics.get("train_runtime") or 0.0
+    tokens_per_second = data_collator.real_tokens / runtime if runtime else 0.0
+    print(
+        f"Trained on {data_collator.real_tokens} tokens: "
+        f"{tokens_per_second:.1f} tokens/s, "
+        f"padding ratio {data_collator.padding_ratio():.3f}"
+    )
     # Save the model
     model.save_pretrained(output_dir)
+    return {
+        "Tokens/sec": f"{tokens_per_second:.1f}",
+        "Padding ratio": f"{data_collator.padding_ratio():.3f}",
+    }
+
+
+@register_backend("peft")
+def run_peft_backend(data_file, output_dir, raw_data, max_steps=500, **options):
+    """LoRA fine-tuning of a 4-bit quantized model on the available GPU(s)."""
+    # Use the first entry in the dataset to determine the base model
+    base_model = raw_data[0].get("base_model", "mistralai/Mistral-7B-v0.1")
+    return train_with_transformers(
+        data_file,
+        output_dir,
+        raw_data,
+        base_model,
+        model_kwargs={
+            "load_in_4bit": True,
+            "device_map": "auto",
+            "trust_remote_code": True,
+        },
+        lora_kwargs={"target_modules": ["q_proj", "v_proj"]},
+        training_kwargs={
+            "gradient_accumulation_steps": 4,  # Adjust as necessary
+            "max_steps": max_steps,
+        },
+        **options,
+    )
+
+
+@register_backend("cpu")
+def run_cpu_backend(data_file, output_dir, raw_data, max_steps=20, **options):
+    """Short LoRA run of a tiny model on CPU, for smoke tests and benchmarks."""
+    return train_with_transformers(
+        data_file,
+        output_dir,
+        raw_data,
+        CPU_BASE_MODEL,
+        model_kwargs={},
+        # Let peft pick the attention projections for the tiny architecture.
+        lora_kwargs={},
+        training_kwargs={"max_steps": max_steps, "use_cpu": True, "report_to": []},
+        **options,
+    )
+
+
+@register_backend("simulate")
+def run_simulated_backend(data_file, output_dir, raw_data, max_steps=10, **options):
+    """Pretends to train, printing trainer-style progress without any ML imports."""
+    step_seconds = float(os.getenv("FINETUNE_SIMULATED_STEP_SECONDS", "0"))
+    for step in range(1, max_steps + 1):
+        time.sleep(step_seconds)
+        print(f"{step}/{max_steps} [simulated]", flush=True)
+    return {"Records": len(raw_data)}
+
+
+def run_fine_tuning(
+    data_file,
+    output_dir,
+    agent_id,
+    backend=DEFAULT_BACKEND,
+    agent_dir=None,
+    incremental=False,
+    compiled=False,
+    **options,
+):
+    """
+    Fine-tunes a model based on the provided data file with the chosen backend.
+
+    When agent_dir is given, trained records are added to the agent's ledger
+    and the final checkpoint becomes the agent's latest. Incremental runs
+    train only on records missing from the ledger, resume from the latest
+    checkpoint, and are skipped when there is nothing new. Callers that
+    compiled a keystroke log themselves pass compiled=True.
+    """
+    from finetune_state import (
+        RecordLedger,
+        find_checkpoint,
+        latest_checkpoint,
+        mark_latest,
+        prune_checkpoints,
+    )
+    from keystroke_compiler import compile_keystrokes, is_keystroke_log
+
+    if backend not in BACKENDS:
+        raise ValueError(
+            f"Unknown training backend '{backend}', expected one of {sorted(BACKENDS)}"
+        )
+    print(f"Starting fine-tuning for agent {agent_id}...")
+    print(f"Data file: {data_file}")
+    print(f"Output directory: {output_dir}")
+    print(f"Backend: {backend}")
+    os.makedirs(output_dir, exist_ok=True)
+    # Load and prepare the fine-tuning data
+    raw_data = load_and_prepare_data(data_file, compiled)
+    if not raw_data:
+        print("No data loaded. Exiting.")
+        return
+    if not compiled and is_keystroke_log(raw_data):
+        raw_data = compile_keystrokes(raw_data)
+        print(f"Compiled keystrokes into {len(raw_data)} training examples")
+        if not raw_data:
+            return
+        data_file = os.path.join(output_dir, "compiled_examples.json")
+        with open(data_file, "w", encoding="utf-8") as f:
+            json.dump(raw_data, f)
+    ledger = RecordLedger(agent_dir, backend) if agent_dir else None
+    if ledger is not None:
+        new_data, new_hashes = ledger.filter_new(raw_data)
+    if incremental and ledger is not None:
+        if not new_data:
+            print("No new records since the last fine-tuning. Skipping.")
+            return
+        print(f"Incremental run on {len(new_data)} of {len(raw_data)} records")
+        if len(new_data) != len(raw_data):
+            # The token cache is keyed by file contents, so train from a file
+            # holding exactly the new records.
+            data_file = os.path.join(output_dir, "new_records.json")
+            with open(data_file, "w", encoding="utf-8") as f:
+                json.dump(new_data, f)
+        raw_data = new_data
+        options["resume_from"] = latest_checkpoint(agent_dir, backend)
+        options["incremental"] = True
+    metrics = BACKENDS[backend](data_file, output_dir, raw_data, **options)
+    checkpoint = find_checkpoint(output_dir) if ledger is not None else None
+    if checkpoint:
+        # Only runs that saved a checkpoint (not simulated ones) count as
+        # having trained on their records.
+        mark_latest(agent_dir, checkpoint, backend)
+        ledger.add(new_hashes)
+        prune_checkpoints(agent_dir)
     # Save the results
     results_file = os.path.join(output_dir, "fine_tuning_results.txt")
     with open(results_file, "w", encoding="utf-8") as f:
         f.write(f"Fine-tuning completed at {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
         f.write(f"Agent ID: {agent_id}\n")
+        f.write(f"Backend: {backend}\n")
         f.write(f"Model saved to: {output_dir}\n")
+        for name, value in (metrics or {}).items():
+            f.write(f"{name}: {value}\n")
     print(
         f"Fine-tuning completed for agent {agent_id}. Results written to {results_file}"
     )
@@ -154,5 +368,67 @@ if __name__ == "__main__":
         required=True,
         help="ID of the agent running fine-tuning.",
     )
+    parser.add_argument(
+        "--backend",
+        type=str,
+        default=DEFAULT_BACKEND,
+        choices=sorted(BACKENDS),
+        help="Training backend to run.",
+    )
+    parser.add_argument(
+        "--agent_dir",
+        type=str,
+        default=None,
+        help="Agent directory holding the record ledger and latest checkpoint.",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Train only on unseen records, resuming from the latest checkpoint.",
+    )
+    parser.add_argument(
+        "--compiled",
+        action="store_true",
+        help="The data file holds examples already compiled from keystrokes.",
+    )
+    parser.add_argument(
+        "--max_steps",
+        type=int,
+        default=None,
+        help="Number of training steps (defaults to the backend's own).",
+    )
+    parser.add_argument(
+        "--packing",
+        action="store_true",
+        help="Pack examples into fixed-length blocks.",
+    )
+    parser.add_argument(
+        "--block_size", type=int, default=1024, help="Tokens per packed block."
+    )
+    parser.add_argument(
+        "--batch_size", type=int, default=1, help="Per-device train batch size."
+    )
+    parser.add_argument(
+        "--group_by_length",
+        action="store_true",
+        help="Batch similar-length examples together (ignored with --packing).",
+    )
     args = parser.parse_args()
-    run_fine_tuning(args.data_file, args.output_dir, args.agent_id)
+    options = {
+        "packing": args.packing,
+        "block_size": args.block_size,
+        "batch_size": args.batch_size,
+        "group_by_length": args.group_by_length,
+    }
+    if args.max_steps is not None:
+        options["max_steps"] = args.max_steps
+    run_fine_tuning(
+        args.data_file,
+        args.output_dir,
+        args.agent_id,
+        backend=args.backend,
+        agent_dir=args.agent_dir,
+        incremental=args.incremental,
+        compiled=args.compiled,
+        **options,
+    )
@@ -0,0 +1,446 @@
+# backend/finetune_jobs.py
+import datetime
+import os
+import queue
+import re
+import signal
+import sqlite3
+import subprocess
+import threading
+import uuid
+
+MAX_CONCURRENT_JOBS = int(os.getenv("FINETUNE_MAX_CONCURRENT", "1"))
+# Jobs are recorded next to the agents, so every worker process sees them.
+DB_PATH = os.getenv("FINETUNE_JOBS_DB", os.path.join("projects", "agents.sqlite3"))
+# Finished jobs are forgotten this many seconds after they end.
+JOB_TTL_SECONDS = float(os.getenv("FINETUNE_JOB_TTL_SECONDS", str(7 * 24 * 3600)))
+# How much of the end of a job log to scan when estimating progress.
+PROGRESS_SCAN_BYTES = 8192
+# Matches trainer progress bars such as " 120/500 [01:02<03:04, ...]".
+PROGRESS_RE = re.compile(rb"(\d+)/(\d+) \[")
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (COMPLETED, FAILED, CANCELLED)
+COLUMNS = (
+    "job_id",
+    "agent_id",
+    "status",
+    "returncode",
+    "created_at",
+    "started_at",
+    "finished_at",
+    "output_dir",
+    "pid",
+    "cancel_requested",
+    "owner",
+)
+# Owner tokens of the schedulers alive in this process.
+_live_owners = set()
+
+
+def _proc_stat(pid):
+    """Fields of /proc/<pid>/stat after the command name, or None."""
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            return f.read().rsplit(b")", 1)[1].split()
+    except (OSError, IndexError):
+        return None
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _owner_token():
+    """Identifies a scheduler: pid, process start time and a random id."""
+    stat = _proc_stat(os.getpid())
+    start = stat[19].decode() if stat else ""
+    return f"{os.getpid()}:{start}:{uuid.uuid4().hex}"
+
+
+def _owner_alive(owner):
+    if not owner:
+        return False
+    pid, start, _ = owner.split(":")
+    if int(pid) == os.getpid():
+        # Also covers a restarted worker that got its old pid back.
+        return owner in _live_owners
+    if not _pid_alive(int(pid)):
+        return False
+    stat = _proc_stat(int(pid))
+    # The pid may have been reused since the owner exited.
+    return stat is None or not start or stat[19].decode() == start
+
+
+def _is_job_process(pid, owner):
+    """True if pid is alive and, where /proc tells, a child of owner."""
+    stat = _proc_stat(pid)
+    if stat is None:
+        return _pid_alive(pid)
+    return int(stat[1]) == int(owner.split(":")[0])
+
+
+class FineTuneJob:
+    def __init__(self, agent_id, command, cwd, output_dir, on_finish=None):
+        self.job_id = str(uuid.uuid4())
+        self.agent_id = agent_id
+        self.command = command
+        self.cwd = cwd
+        self.output_dir = output_dir
+        self.log_path = os.path.join(output_dir, "fine_tuning.log")
+        self.on_finish = on_finish
+        self.status = QUEUED
+        self.returncode = None
+        self.created_at = datetime.datetime.now()
+        self.started_at = None
+        self.finished_at = None
+        self.process = None
+        self.pid = None
+        self.cancel_requested = False
+        self.owner = None
+
+    def progress(self):
+        """Estimates progress from the last trainer progress bar in the log."""
+        if self.status == COMPLETED:
+            return 1.0
+        try:
+            with open(self.log_path, "rb") as f:
+                f.seek(0, os.SEEK_END)
+                f.seek(max(0, f.tell() - PROGRESS_SCAN_BYTES))
+                tail = f.read()
+        except OSError:
+            return 0.0
+        matches = PROGRESS_RE.findall(tail)
+        if not matches:
+            return 0.0
+        done, total = (int(n) for n in matches[-1])
+        return done / total if total else 0.0
+
+    @classmethod
+    def from_row(cls, row):
+        """Rebuilds a job recorded by another process; it cannot be run."""
+        values = dict(zip(COLUMNS, row))
+        job = cls(values["agent_id"], None, None, values["output_dir"])
+        job.job_id = values["job_id"]
+        job.status = values["status"]
+        job.returncode = values["returncode"]
+        job.created_at, job.started_at, job.finished_at = (
+            datetime.datetime.fromtimestamp(values[key]) if values[key] else None
+            for key in ("created_at", "started_at", "finished_at")
+        )
+        job.pid = values["pid"]
+        job.cancel_requested = bool(values["cancel_requested"])
+        job.owner = values["owner"]
+        return job
+
+    def to_row(self):
+        def ts(moment):
+            return moment.timestamp() if moment else None
+
+        return (
+            self.job_id,
+            self.agent_id,
+            self.status,
+            self.returncode,
+            ts(self.created_at),
+            ts(self.started_at),
+            ts(self.finished_at),
+            self.output_dir,
+            self.process.pid if self.process else self.pid,
+            int(self.cancel_requested),
+            self.owner,
+        )
+
+    def to_dict(self):
+        def fmt(moment):
+            return moment.strftime("%Y-%m-%d %H:%M:%S") if moment else None
+
+        return {
+            "job_id": self.job_id,
+            "agent_id": self.agent_id,
+            "status": self.status,
+            "progress": round(self.progress(), 4),
+            "returncode": self.returncode,
+            "created_at": fmt(self.created_at),
+            "started_at": fmt(self.started_at),
+            "finished_at": fmt(self.finished_at),
+            "output_dir": self.output_dir,
+            "log_path": self.log_path,
+        }
+
+
+class FineTuneScheduler:
+    """Runs fine-tuning subprocesses on a bounded pool of worker threads.
+
+    Jobs run in the process that submitted them, but are recorded in SQLite,
+    so any worker process can report on or cancel them. Finished jobs are
+    dropped after job_ttl seconds. Unfinished jobs whose scheduler is gone,
+    e.g. because its worker died or restarted, are marked failed when they
+    are loaded, since nothing else would ever finish them.
+    """
+
+    def __init__(
+        self,
+        max_concurrent=MAX_CONCURRENT_JOBS,
+        db_path=DB_PATH,
+        job_ttl=JOB_TTL_SECONDS,
+    ):
+        self.max_concurrent = max(1, max_concurrent)
+        self.db_path = db_path
+        self.job_ttl = job_ttl
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.queue = queue.Queue()
+        self.workers = []
+        self._local = threading.local()
+        self.owner = _owner_token()
+        _live_owners.add(self.owner)
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with self._db() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS fine_tune_jobs ("
+                "job_id TEXT PRIMARY KEY, agent_id TEXT NOT NULL, "
+                "status TEXT NOT NULL, returncode INTEGER, created_at REAL NOT NULL, "
+                "started_at REAL, finished_at REAL, output_dir TEXT NOT NULL, "
+                "pid INTEGER, cancel_requested INTEGER NOT NULL DEFAULT 0, "
+                "owner TEXT)"
+            )
+            columns = [
+                row[1] for row in db.execute("PRAGMA table_info(fine_tune_jobs)")
+            ]
+            if "owner" not in columns:
+                db.execute("ALTER TABLE fine_tune_jobs ADD COLUMN owner TEXT")
+        # Jobs left behind by a scheduler that is gone.
+        self._load("status IN (?, ?)", (QUEUED, RUNNING))
+
+    def _db(self):
+        # sqlite3 connections must not be shared between threads.
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = sqlite3.connect(self.db_path, timeout=10)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def _save(self, job):
+        with self._db() as db:
+            db.execute(
+                f"INSERT OR REPLACE INTO fine_tune_jobs ({', '.join(COLUMNS)}) "
+                f"VALUES ({', '.join('?' for _ in COLUMNS)})",
+                job.to_row(),
+            )
+
+    def _load(self, where, params):
+        rows = (
+            self._db()
+            .execute(
+                f"SELECT {', '.join(COLUMNS)} FROM fine_tune_jobs WHERE {where} "
+                "ORDER BY created_at",
+                params,
+            )
+            .fetchall()
+        )
+        jobs = [FineTuneJob.from_row(row) for row in rows]
+        self._reconcile(jobs)
+        return jobs
+
+    def _reconcile(self, jobs):
+        """Fails unfinished jobs whose owning scheduler is gone."""
+        for job in jobs:
+            if job.status in FINISHED_STATES or _owner_alive(job.owner):
+                continue
+            job.status = FAILED
+            job.finished_at = datetime.datetime.now()
+            with self._db() as db:
+                db.execute(
+                    "UPDATE fine_tune_jobs SET status = ?, finished_at = ? "
+                    "WHERE job_id = ? AND status IN (?, ?)",
+                    (FAILED, job.finished_at.timestamp(), job.job_id, QUEUED, RUNNING),
+                )
+
+    def _ensure_workers(self):
+        # Workers are started lazily so importing this module stays cheap.
+        with self.lock:
+            while len(self.workers) < self.max_concurrent:
+                worker = threading.Thread(
+                    target=self._work,
+                    name=f"finetune-worker-{len(self.workers)}",
+                    daemon=True,
+                )
+                worker.start()
+                self.workers.append(worker)
+
+    def submit(self, agent_id, command, cwd, output_dir, on_finish=None):
+        """Queues a fine-tuning command and returns its job immediately."""
+        self._prune()
+        job = FineTuneJob(agent_id, command, cwd, output_dir, on_finish)
+        job.owner = self.owner
+        self._save(job)
+        with self.lock:
+            self.jobs[job.job_id] = job
+        self._ensure_workers()
+        self.queue.put(job)
+        return job
+
+    def get(self, job_id):
+        """Returns the job, or a snapshot of it if another process runs it."""
+        with self.lock:
+            job = self.jobs.get(job_id)
+        if job is not None:
+            return job
+        jobs = self._load("job_id = ?", (job_id,))
+        return jobs[0] if jobs else None
+
+    def jobs_for_agent(self, agent_id):
+        jobs = self._load("agent_id = ?", (agent_id,))
+        with self.lock:
+            return [self.jobs.get(job.job_id, job) for job in jobs]
+
+    def cancel(self, job_id):
+        """Cancels a queued job or terminates a running one."""
+        finished = False
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is not None and job.status not in FINISHED_STATES:
+                job.cancel_requested = True
+                if job.status == QUEUED:
+                    self._finish(job, CANCELLED)
+                    finished = True
+                elif job.process is not None:
+                    job.process.terminate()
+        if job is None:
+            return self._cancel_elsewhere(job_id)
+        if finished:
+            self._finished(job)
+        return job
+
+    def _cancel_elsewhere(self, job_id):
+        """Flags a job owned by another process; that process finishes it."""
+        job = self.get(job_id)
+        if job is None or job.status in FINISHED_STATES:
+            return job
+        job.cancel_requested = True
+        with self._db() as db:
+            db.execute(
+                "UPDATE fine_tune_jobs SET cancel_requested = 1 WHERE job_id = ?",
+                (job_id,),
+            )
+        # The pid may now belong to an unrelated process.
+        if job.status == RUNNING and job.pid and _is_job_process(job.pid, job.owner):
+            try:
+                os.kill(job.pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        return job
+
+    def _cancelled_elsewhere(self, job):
+        row = (
+            self._db()
+            .execute(
+                "SELECT cancel_requested FROM fine_tune_jobs WHERE job_id = ?",
+                (job.job_id,),
+            )
+            .fetchone()
+        )
+        return bool(row and row[0])
+
+    def _finish(self, job, status):
+        """Marks the job finished; call with the lock held, then _finished."""
+        job.status = status
+        job.finished_at = datetime.datetime.now()
+
+    def _finished(self, job):
+        # Runs without the lock, so callbacks may use the scheduler.
+        self._save(job)
+        if job.on_finish:
+            try:
+                job.on_finish(job)
+            except Exception as e:
+                print(f"Error in fine-tuning job callback: {e}")
+
+    def _prune(self):
+        """Forgets jobs that finished more than job_ttl seconds ago."""
+        cutoff = datetime.datetime.now() - datetime.timedelta(seconds=self.job_ttl)
+        with self.lock:
+            for job_id, job in list(self.jobs.items()):
+                if job.status in FINISHED_STATES and job.finished_at < cutoff:
+                    del self.jobs[job_id]
+        with self._db() as db:
+            db.execute(
+                "DELETE FROM fine_tune_jobs WHERE finished_at < ? AND status IN "
+                f"({', '.join('?' for _ in FINISHED_STATES)})",
+                (cutoff.timestamp(), *FINISHED_STATES),
+            )
+
+    def _work(self):
+        while True:
+            job = self.queue.get()
+            try:
+                self._run(job)
+            finally:
+                self.queue.task_done()
+
+    def _run(self, job):
+        cancelled = self._cancelled_elsewhere(job)
+        with self.lock:
+            if job.status != QUEUED:
+                return
+            if cancelled:
+                job.cancel_requested = True
+                self._finish(job, CANCELLED)
+            else:
+                job.status = RUNNING
+                job.started_at = datetime.datetime.now()
+        if cancelled:
+            self._finished(job)
+            return
+        try:
+            with open(job.log_path, "ab") as log_file:
+                with self.lock:
+                    if not job.cancel_requested:
+                        job.process = subprocess.Popen(
+                            job.command,
+                            cwd=job.cwd,
+                            stdout=log_file,
+                            stderr=subprocess.STDOUT,
+                        )
+                if job.process is None:
+                    with self.lock:
+                        self._finish(job, CANCELLED)
+                    self._finished(job)
+                    return
+                # Record the pid so other processes can cancel the job.
+                self._save(job)
+                job.returncode = job.process.wait()
+        except OSError as e:
+            print(f"Error starting fine-tuning job {job.job_id}: {e}")
+            with self.lock:
+                self._finish(job, FAILED)
+            self._finished(job)
+            return
+        cancelled = self._cancelled_elsewhere(job)
+        with self.lock:
+            job.pid = job.process.pid
+            job.process = None
+            if job.cancel_requested or cancelled:
+                job.cancel_requested = True
+                self._finish(job, CANCELLED)
+            elif job.returncode == 0:
+                self._finish(job, COMPLETED)
+            else:
+                self._finish(job, FAILED)
+        self._finished(job)
+
+
+scheduler = FineTuneScheduler()
@@ -0,0 +1,138 @@
+# backend/finetune_state.py
+import glob
+import hashlib
+import json
+import os
+import re
+import shutil
+
+LEDGER_FILE = "seen_records_{backend}.txt"
+# Written before ledgers were kept per backend.
+LEGACY_LEDGER_FILE = "seen_records.txt"
+LATEST_FILE = "latest_checkpoint.json"
+# Trainer checkpoints carry optimizer state, several times the adapter's
+# size; only the newest ones are kept for incremental runs to resume from.
+KEEP_CHECKPOINTS = int(os.getenv("FINETUNE_KEEP_CHECKPOINTS", "2"))
+
+
+def record_hash(record):
+    """Content hash of a data record, independent of key order."""
+    canonical = json.dumps(record, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class RecordLedger:
+    """Append-only set of record hashes an agent has trained on with backend.
+
+    Each backend trains its own base model, so each keeps its own ledger.
+    """
+
+    def __init__(self, agent_dir, backend):
+        self.path = os.path.join(agent_dir, LEDGER_FILE.format(backend=backend))
+        self.hashes = set()
+        path = self.path
+        if not os.path.exists(path) and _latest(agent_dir).get("backend") == backend:
+            # The old shared ledger belongs to the backend of the latest run.
+            path = os.path.join(agent_dir, LEGACY_LEDGER_FILE)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.hashes.update(line.strip() for line in f if line.strip())
+
+    def filter_new(self, records):
+        """Returns (records, hashes) for records not yet in the ledger."""
+        new_records, new_hashes, batch = [], [], set()
+        for record in records:
+            digest = record_hash(record)
+            if digest in self.hashes or digest in batch:
+                continue
+            batch.add(digest)
+            new_records.append(record)
+            new_hashes.append(digest)
+        return new_records, new_hashes
+
+    def add(self, hashes):
+        """Appends hashes to the ledger and flushes them to disk."""
+        if not os.path.exists(self.path):
+            # Carries over hashes read from the legacy ledger.
+            hashes = [*self.hashes, *hashes]
+            self.hashes = set()
+        hashes = [digest for digest in hashes if digest not in self.hashes]
+        if not hashes:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(f"{digest}\n" for digest in hashes))
+            f.flush()
+            os.fsync(f.fileno())
+        self.hashes.update(hashes)
+
+
+def _latest(agent_dir):
+    try:
+        with open(os.path.join(agent_dir, LATEST_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def latest_checkpoint(agent_dir, backend):
+    """Returns the agent's most recent checkpoint for backend, if any."""
+    latest = _latest(agent_dir)
+    # Adapters from another backend belong to a different base model.
+    if latest.get("backend") != backend:
+        return None
+    checkpoint = latest.get("checkpoint")
+    return checkpoint if checkpoint and os.path.isdir(checkpoint) else None
+
+
+def find_checkpoint(output_dir):
+    """Returns the highest-step checkpoint-<step> directory in output_dir."""
+
+    def step(path):
+        match = re.search(r"checkpoint-(\d+)$", path)
+        return int(match.group(1)) if match else -1
+
+    checkpoints = [
+        path
+        for path in glob.glob(os.path.join(output_dir, "checkpoint-*"))
+        if step(path) >= 0
+    ]
+    return max(checkpoints, key=step) if checkpoints else None
+
+
+def mark_latest(agent_dir, checkpoint, backend):
+    """Atomically points the agent's latest checkpoint at checkpoint."""
+    path = os.path.join(agent_dir, LATEST_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"checkpoint": os.path.abspath(checkpoint), "backend": backend}, f)
+    os.replace(tmp_path, path)
+
+
+def prune_checkpoints(agent_dir, keep=KEEP_CHECKPOINTS):
+    """Deletes all but the newest keep run checkpoints under agent_dir.
+
+    The checkpoint marked latest is always kept; the adapters and logs each
+    run saved next to its checkpoint are left alone.
+    """
+    latest = _latest(agent_dir).get("checkpoint")
+    checkpoints = sorted(
+        glob.glob(os.path.join(agent_dir, "*", "checkpoint-*")),
+        key=os.path.getmtime,
+        reverse=True,
+    )
+    for checkpoint in checkpoints[max(keep, 1) :]:
+        if latest and os.path.abspath(checkpoint) == latest:
+            continue
+        shutil.rmtree(checkpoint, ignore_errors=True)
+
+
+def checkpoint_step(checkpoint):
+    """Reads the global step a trainer checkpoint was saved at."""
+    try:
+        with open(
+            os.path.join(checkpoint, "trainer_state.json"), "r", encoding="utf-8"
+        ) as f:
+            return int(json.load(f).get("global_step", 0))
+    except (OSError, ValueError):
+        return 0
@@ -0,0 +1,189 @@
+# backend/keystroke_compiler.py
+import argparse
+import ast
+import functools
+import hashlib
+import json
+
+IDLE_GAP_SECONDS = 30.0
+MIN_SESSION_CHARS = 20
+MAX_SESSION_CHARS = 4000
+# How many events to process between sweeps for sessions that went idle.
+SWEEP_EVERY = 10000
+SYSTEM_PROMPT = "You are a coding assistant. The user is typing in: {window}"
+
+SPECIAL_KEYS = {
+    "Key.space": " ",
+    "Key.enter": "\n",
+    "Key.tab": "\t",
+}
+BACKSPACE = "Key.backspace"
+
+
+@functools.lru_cache(maxsize=4096)
+def decode_key(key):
+    """Maps a recorded str(key) to the text it types, or None."""
+    if key in SPECIAL_KEYS:
+        return SPECIAL_KEYS[key]
+    if len(key) >= 3 and key[0] in "'\"" and key[-1] == key[0]:
+        try:
+            char = ast.literal_eval(key)
+        except (ValueError, SyntaxError):
+            return None
+        return char if isinstance(char, str) and char.isprintable() else None
+    return None
+
+
+def is_keystroke_log(records):
+    """True when records look like raw DataCollector events."""
+    return (
+        bool(records)
+        and isinstance(records[0], dict)
+        and records[0].get("event") == "keypress"
+    )
+
+
+class _Session:
+    __slots__ = ("window", "chars", "started_at", "last_at")
+
+    def __init__(self, window, timestamp):
+        self.window = window
+        self.chars = []
+        self.started_at = timestamp
+        self.last_at = timestamp
+
+
+class KeystrokeCompiler:
+    """Turns a stream of keypress events into deduplicated training examples.
+
+    Typed text is rebuilt per active window (honouring backspace), split into
+    sessions at idle gaps or once a session grows past max_chars, and each
+    session becomes one example. Only open sessions and 8-byte digests of
+    emitted texts are kept in memory, so arbitrarily long logs compile in a
+    single streaming pass.
+    """
+
+    def __init__(
+        self,
+        idle_gap=IDLE_GAP_SECONDS,
+        min_chars=MIN_SESSION_CHARS,
+        max_chars=MAX_SESSION_CHARS,
+    ):
+        self.idle_gap = idle_gap
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self.sessions = {}
+        self.seen = set()
+        self.events = 0
+        self.examples = 0
+        self.duplicates = 0
+
+    def _emit(self, session):
+        text = "".join(session.chars).strip()
+        if len(text) < self.min_chars:
+            return None
+        normalized = " ".join(text.split())
+        digest = hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).digest()
+        if digest in self.seen:
+            self.duplicates += 1
+            return None
+        self.seen.add(digest)
+        self.examples += 1
+        return {
+            "system_prompt": SYSTEM_PROMPT.format(window=session.window),
+            "user_prompt": text,
+            "started_at": session.started_at,
+            "ended_at": session.last_at,
+        }
+
+    def _sweep(self, now):
+        for window in [
+            window
+            for window, session in self.sessions.items()
+            if now - session.last_at > self.idle_gap
+        ]:
+            example = self._emit(self.sessions.pop(window))
+            if example:
+                yield example
+
+    def compile(self, records):
+        """Yields training examples from an iterable of keypress records."""
+        for record in records:
+            if record.get("event") != "keypress":
+                continue
+            self.events += 1
+            timestamp = record.get("timestamp", 0.0)
+            window = record.get("active_window") or "Unknown Window"
+            session = self.sessions.get(window)
+            if session is not None and timestamp - session.last_at > self.idle_gap:
+                example = self._emit(self.sessions.pop(window))
+                if example:
+                    yield example
+                session = None
+            if session is None:
+                session = self.sessions[window] = _Session(window, timestamp)
+            session.last_at = timestamp
+            key = record.get("key", "")
+            if key == BACKSPACE:
+                if session.chars:
+                    session.chars.pop()
+            else:
+                char = decode_key(key)
+                if char is not None:
+                    session.chars.append(char)
+                    if len(session.chars) >= self.max_chars:
+                        example = self._emit(self.sessions.pop(window))
+                        if example:
+                            yield example
+            if self.events % SWEEP_EVERY == 0:
+                yield from self._sweep(timestamp)
+        for window in list(self.sessions):
+            example = self._emit(self.sessions.pop(window))
+            if example:
+                yield example
+
+
+def compile_keystrokes(records, **options):
+    """Compiles keypress records into a list of training examples."""
+    return list(KeystrokeCompiler(**options).compile(records))
+
+
+if __name__ == "__main__":
+    from spool import SpoolWriter, iter_records
+
+    parser = argparse.ArgumentParser(
+        description="Compile collected keystrokes into training examples."
+    )
+    parser.add_argument(
+        "inputs", nargs="+", help="Spool segments or spool directories to read."
+    )
+    parser.add_argument(
+        "--output_dir", type=str, required=True, help="Directory for the output."
+    )
+    parser.add_argument(
+        "--prefix", type=str, default="examples", help="Output segment prefix."
+    )
+    parser.add_argument("--idle_gap", type=float, default=IDLE_GAP_SECONDS)
+    parser.add_argument("--min_chars", type=int, default=MIN_SESSION_CHARS)
+    parser.add_argument("--max_chars", type=int, default=MAX_SESSION_CHARS)
+    args = parser.parse_args()
+    compiler = KeystrokeCompiler(args.idle_gap, args.min_chars, args.max_chars)
+    writer = SpoolWriter(args.output_dir, args.prefix)
+    batch = []
+    for example in compiler.compile(iter_records(args.inputs)):
+        batch.append(example)
+        if len(batch) >= 1000:
+            writer.write_many(batch)
+            batch = []
+    writer.write_many(batch)
+    segments = writer.close()
+    print(
+        json.dumps(
+            {
+                "events": compiler.events,
+                "examples": compiler.examples,
+                "duplicates": compiler.duplicates,
+                "segments": segments,
+            }
+        )
+    )
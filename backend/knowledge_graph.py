@@ -1,13 +1,604 @@
 # backend/knowledge_graph.py
+import contextlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+import numpy as np
+
+from .vector_index import DEFAULT_NPROBE, VectorStore
+
+INDEX_DTYPE = np.int32
+# Uncompacted edges are merged into the CSR arrays once they exceed this
+# share of the compacted edge count (and at least MIN_COMPACT_EDGES).
+COMPACT_RATIO = 0.1
+MIN_COMPACT_EDGES = 65536
+
+OUT = "out"
+IN = "in"
+BOTH = "both"
+
+
+@contextlib.contextmanager
+def _snapshot_lock(path, shared=False):
+    """Holds an flock on the lock file next to the snapshot at path.
+
+    save() swaps snapshots under an exclusive lock and load() reads under a
+    shared one, so a reader never sees the moment between the two renames of
+    a swap.
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(f"{path}.lock", "a", encoding="utf-8") as lock:
+        fcntl.flock(lock, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        yield
+
+
+class _Adjacency:
+    """CSR adjacency for one edge direction plus a small uncompacted delta.
+
+    Row ``v`` of the CSR is ``indices[indptr[v]:indptr[v + 1]]`` (sorted);
+    edges added since the last compaction live in ``delta`` until merged.
+    """
+
+    def __init__(self, indptr=None, indices=None, edge_ids=None):
+        self.indptr = np.zeros(1, dtype=np.int64) if indptr is None else indptr
+        self.indices = np.empty(0, INDEX_DTYPE) if indices is None else indices
+        self.edge_ids = np.empty(0, INDEX_DTYPE) if edge_ids is None else edge_ids
+        self.delta = {}
+        self.delta_count = 0
+
+    @property
+    def compacted_rows(self):
+        return len(self.indptr) - 1
+
+    def add(self, node, neighbor, edge_id):
+        self.delta.setdefault(node, {})[neighbor] = edge_id
+        self.delta_count += 1
+
+    def find(self, node, neighbor):
+        """Returns the edge id of node -> neighbor, or None."""
+        if node < self.compacted_rows:
+            start, end = self.indptr[node], self.indptr[node + 1]
+            pos = start + np.searchsorted(self.indices[start:end], neighbor)
+            if pos < end and self.indices[pos] == neighbor:
+                return int(self.edge_ids[pos])
+        return self.delta.get(node, {}).get(neighbor)
+
+    def neighbors(self, node):
+        parts = []
+        if node < self.compacted_rows:
+            parts.append(self.indices[self.indptr[node] : self.indptr[node + 1]])
+        if node in self.delta:
+            parts.append(np.fromiter(self.delta[node], INDEX_DTYPE))
+        return np.concatenate(parts) if parts else np.empty(0, INDEX_DTYPE)
+
+    def expand(self, frontier):
+        """Returns (sources, neighbors) for every edge leaving frontier."""
+        if len(frontier) == 1:
+            node = int(frontier[0])
+            neighbors = self.neighbors(node)
+            return np.full(len(neighbors), node, INDEX_DTYPE), neighbors
+        rows = frontier[frontier < self.compacted_rows]
+        starts = self.indptr[rows]
+        lengths = self.indptr[rows + 1] - starts
+        total = int(lengths.sum())
+        # Gather all CSR row slices at once: position i of row r maps to
+        # starts[r] + (i - offset of row r in the output).
+        offsets = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+        positions = offsets + np.arange(total)
+        sources = [np.repeat(rows, lengths)]
+        neighbors = [self.indices[positions]]
+        if self.delta:
+            delta_nodes = np.fromiter(self.delta, INDEX_DTYPE, len(self.delta))
+            for node in np.intersect1d(frontier, delta_nodes).tolist():
+                targets = np.fromiter(self.delta[node], INDEX_DTYPE)
+                sources.append(np.full(len(targets), node, INDEX_DTYPE))
+                neighbors.append(targets)
+        return np.concatenate(sources), np.concatenate(neighbors)
+
+    def edge_arrays(self):
+        """Returns (sources, neighbors, edge_ids) for all edges, delta included."""
+        src = np.repeat(
+            np.arange(self.compacted_rows, dtype=INDEX_DTYPE), np.diff(self.indptr)
+        )
+        dst = np.asarray(self.indices)
+        eids = np.asarray(self.edge_ids)
+        if self.delta:
+            delta_src, delta_dst, delta_eids = [], [], []
+            for node, targets in self.delta.items():
+                delta_src.extend([node] * len(targets))
+                delta_dst.extend(targets.keys())
+                delta_eids.extend(targets.values())
+            src = np.concatenate([src, np.asarray(delta_src, INDEX_DTYPE)])
+            dst = np.concatenate([dst, np.asarray(delta_dst, INDEX_DTYPE)])
+            eids = np.concatenate([eids, np.asarray(delta_eids, INDEX_DTYPE)])
+        return src, dst, eids
+
+    def rebuild(self, src, dst, eids, num_nodes):
+        """Replaces the adjacency with the given (duplicate-free) edges."""
+        order = np.lexsort((dst, src))
+        counts = np.bincount(src, minlength=num_nodes)
+        self.indptr = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        self.indices = dst[order]
+        self.edge_ids = eids[order]
+        self.delta = {}
+        self.delta_count = 0
+
+    def compact(self, num_nodes):
+        """Merges the delta into the CSR arrays, keeping rows sorted."""
+        self.rebuild(*self.edge_arrays(), num_nodes)
+
+    @property
+    def nbytes(self):
+        return self.indptr.nbytes + self.indices.nbytes + self.edge_ids.nbytes
+
+
 class KnowledgeGraph:
+    """Directed property graph with CSR adjacency in both directions.
+
+    Nodes keep their caller-supplied ids and data; internally each id maps to
+    a dense integer so adjacency fits in compact NumPy arrays. Adding an edge
+    that already exists replaces its data. Nodes may also carry embeddings
+    (see set_embedding/similar_nodes), kept in a VectorStore.
+    """
+
     def __init__(self):
         self.nodes = {}
-        self.edges = {}
+        self.edge_data = {}
+        self.num_edges = 0
+        self.indexes = {}
+        self._index_arrays = {}
+        self._ids = {}
+        self._keys = []
+        self._out = _Adjacency()
+        self._in = _Adjacency()
+        self._scratch = threading.local()
+        self.embeddings = None
+
+    def _intern(self, node_id):
+        idx = self._ids.get(node_id)
+        if idx is None:
+            idx = self._ids[node_id] = len(self._keys)
+            self._keys.append(node_id)
+        return idx
+
+    def _index_node(self, node, node_data, remove=False):
+        if not isinstance(node_data, dict):
+            return
+        for attr, index in self.indexes.items():
+            if attr not in node_data:
+                continue
+            value = node_data[attr]
+            try:
+                if remove:
+                    index.get(value, set()).discard(node)
+                else:
+                    index.setdefault(value, set()).add(node)
+                self._index_arrays.pop((attr, value), None)
+            except TypeError:
+                # Unhashable attribute values are not indexed.
+                pass
 
     def add_node(self, node_id, node_data):
+        node = self._intern(node_id)
+        if node_id in self.nodes:
+            self._index_node(node, self.nodes[node_id], remove=True)
         self.nodes[node_id] = node_data
+        self._index_node(node, node_data)
+
+    def remove_nodes(self, node_ids):
+        """Removes nodes with their data, edges and embeddings."""
+        nodes = [self._ids[node_id] for node_id in node_ids if node_id in self._ids]
+        if not nodes:
+            return
+        for node in nodes:
+            node_data = self.nodes.pop(self._keys[node], None)
+            if node_data is not None:
+                self._index_node(node, node_data, remove=True)
+        src, dst, eids = self._out.edge_arrays()
+        removed = np.isin(src, nodes) | np.isin(dst, nodes)
+        for edge_id in eids[removed].tolist():
+            self.edge_data.pop(edge_id, None)
+        keep = ~removed
+        self._out.rebuild(src[keep], dst[keep], eids[keep], len(self._keys))
+        self._in.rebuild(dst[keep], src[keep], eids[keep], len(self._keys))
+        if self.embeddings is not None:
+            self.embeddings.remove(nodes)
 
     def add_edge(self, source_node_id, target_node_id, edge_data):
-        if source_node_id not in self.edges:
-            self.edges[source_node_id] = {}
-        self.edges[source_node_id][target_node_id] = edge_data
+        source = self._intern(source_node_id)
+        target = self._intern(target_node_id)
+        edge_id = self._out.find(source, target)
+        if edge_id is None:
+            edge_id = self.num_edges
+            self.num_edges += 1
+            self._out.add(source, target, edge_id)
+            self._in.add(target, source, edge_id)
+            self._maybe_compact()
+        if edge_data is None:
+            self.edge_data.pop(edge_id, None)
+        else:
+            self.edge_data[edge_id] = edge_data
+
+    def add_edges(self, edges):
+        """Adds (source, target, edge_data) triples in one vectorized merge.
+
+        Equivalent to calling add_edge() for each triple in order, but the CSR
+        arrays are rebuilt once instead of growing edge by edge.
+        """
+        edges = list(edges)
+        if not edges:
+            return
+        src = np.fromiter(
+            (self._intern(source) for source, _, _ in edges), INDEX_DTYPE, len(edges)
+        )
+        dst = np.fromiter(
+            (self._intern(target) for _, target, _ in edges), INDEX_DTYPE, len(edges)
+        )
+        old_src, old_dst, old_eids = self._out.edge_arrays()
+        all_src = np.concatenate([old_src, src])
+        all_dst = np.concatenate([old_dst, dst])
+        # Stable sort by (source, target): each run of equal pairs starts
+        # with the existing edge if there is one, then the batch in order.
+        order = np.lexsort((all_dst, all_src))
+        sorted_src, sorted_dst = all_src[order], all_dst[order]
+        run_start = np.ones(len(order), dtype=bool)
+        run_start[1:] = (sorted_src[1:] != sorted_src[:-1]) | (
+            sorted_dst[1:] != sorted_dst[:-1]
+        )
+        firsts = order[run_start]
+        is_new = firsts >= len(old_src)
+        run_eids = np.empty(len(firsts), dtype=INDEX_DTYPE)
+        run_eids[~is_new] = old_eids[firsts[~is_new]]
+        run_eids[is_new] = self.num_edges + np.arange(int(is_new.sum()))
+        self.num_edges += int(is_new.sum())
+        eids = np.empty(len(order), dtype=INDEX_DTYPE)
+        eids[order] = run_eids[np.cumsum(run_start) - 1]
+        for edge_id, (_, _, edge_data) in zip(eids[len(old_src) :].tolist(), edges):
+            if edge_data is None:
+                self.edge_data.pop(edge_id, None)
+            else:
+                self.edge_data[edge_id] = edge_data
+        unique_src, unique_dst = all_src[firsts], all_dst[firsts]
+        self._out.rebuild(unique_src, unique_dst, run_eids, len(self._keys))
+        self._in.rebuild(unique_dst, unique_src, run_eids, len(self._keys))
+
+    def get_edge(self, source_node_id, target_node_id, default=None):
+        """Returns the data of an edge, or default if there is no such edge."""
+        source = self._ids.get(source_node_id)
+        target = self._ids.get(target_node_id)
+        if source is None or target is None:
+            return default
+        edge_id = self._out.find(source, target)
+        if edge_id is None:
+            return default
+        return self.edge_data.get(edge_id)
+
+    def has_edge(self, source_node_id, target_node_id):
+        source = self._ids.get(source_node_id)
+        target = self._ids.get(target_node_id)
+        if source is None or target is None:
+            return False
+        return self._out.find(source, target) is not None
+
+    def _maybe_compact(self):
+        threshold = max(MIN_COMPACT_EDGES, int(len(self._out.indices) * COMPACT_RATIO))
+        if self._out.delta_count >= threshold:
+            self.compact()
+
+    def compact(self):
+        """Merges all pending edges into the CSR arrays."""
+        self._out.compact(len(self._keys))
+        self._in.compact(len(self._keys))
+
+    def _adjacencies(self, direction):
+        if direction == OUT:
+            return (self._out,)
+        if direction == IN:
+            return (self._in,)
+        if direction == BOTH:
+            return (self._out, self._in)
+        raise ValueError(f"Unknown direction: {direction}")
+
+    def _expand(self, frontier, direction):
+        pairs = [
+            adjacency.expand(frontier) for adjacency in self._adjacencies(direction)
+        ]
+        if len(pairs) == 1:
+            return pairs[0]
+        return (
+            np.concatenate([sources for sources, _ in pairs]),
+            np.concatenate([neighbors for _, neighbors in pairs]),
+        )
+
+    def neighbors(self, node_id, direction=OUT):
+        """Returns the ids of nodes adjacent to node_id."""
+        node = self._ids.get(node_id)
+        if node is None:
+            return []
+        found = np.unique(
+            np.concatenate(
+                [
+                    adjacency.neighbors(node)
+                    for adjacency in self._adjacencies(direction)
+                ]
+            )
+        )
+        return [self._keys[idx] for idx in found.tolist()]
+
+    def _bfs(self, source, max_depth, direction, target=None):
+        """Level-synchronous BFS; returns (depth, parent) arrays."""
+        depth = np.full(len(self._keys), -1, dtype=np.int32)
+        parent = np.full(len(self._keys), -1, dtype=INDEX_DTYPE)
+        depth[source] = 0
+        frontier = np.asarray([source], dtype=INDEX_DTYPE)
+        level = 0
+        while len(frontier) and (max_depth is None or level < max_depth):
+            level += 1
+            sources, neighbors = self._expand(frontier, direction)
+            fresh = depth[neighbors] < 0
+            neighbors, first = np.unique(neighbors[fresh], return_index=True)
+            depth[neighbors] = level
+            parent[neighbors] = sources[fresh][first]
+            frontier = neighbors.astype(INDEX_DTYPE)
+            if target is not None and depth[target] >= 0:
+                break
+        return depth, parent
+
+    def bfs(self, node_id, max_depth=None, direction=OUT):
+        """Returns {node_id: hops} for every node reachable from node_id."""
+        source = self._ids.get(node_id)
+        if source is None:
+            return {}
+        depth, _ = self._bfs(source, max_depth, direction)
+        reached = np.flatnonzero(depth >= 0)
+        return {self._keys[idx]: int(depth[idx]) for idx in reached.tolist()}
+
+    def _visited_mask(self):
+        """Per-thread all-False mask over nodes; callers must clear what they set."""
+        mask = getattr(self._scratch, "visited", None)
+        if mask is None or len(mask) < len(self._keys):
+            mask = self._scratch.visited = np.zeros(len(self._keys), dtype=bool)
+        return mask
+
+    def k_hop(self, node_id, k, direction=OUT):
+        """Returns the ids of nodes within 1..k hops of node_id."""
+        node = self._ids.get(node_id)
+        if node is None:
+            return []
+        # Reusing one mask (and resetting only the entries touched) keeps
+        # small neighborhoods from paying for a graph-sized allocation.
+        visited = self._visited_mask()
+        visited[node] = True
+        frontier = np.asarray([node], dtype=INDEX_DTYPE)
+        reached = []
+        try:
+            for _ in range(k):
+                _, neighbors = self._expand(frontier, direction)
+                frontier = np.unique(neighbors[~visited[neighbors]])
+                if not len(frontier):
+                    break
+                visited[frontier] = True
+                reached.append(frontier)
+        finally:
+            visited[node] = False
+            for nodes in reached:
+                visited[nodes] = False
+        if not reached:
+            return []
+        keys = self._keys
+        return [keys[idx] for idx in np.concatenate(reached).tolist()]
+
+    def shortest_path(self, source_node_id, target_node_id, direction=OUT):
+        """Returns the node ids on a shortest (fewest hops) path, or None."""
+        source = self._ids.get(source_node_id)
+        target = self._ids.get(target_node_id)
+        if source is None or target is None:
+            return None
+        if source == target:
+            return [source_node_id]
+        depth, parent = self._bfs(source, None, direction, target=target)
+        if depth[target] < 0:
+            return None
+        path = [target]
+        while path[-1] != source:
+            path.append(int(parent[path[-1]]))
+        return [self._keys[idx] for idx in reversed(path)]
+
+    def create_index(self, attr):
+        """Indexes node_data[attr] so find_nodes() can look it up directly."""
+        index = self.indexes[attr] = {}
+        self._index_arrays = {
+            key: nodes for key, nodes in self._index_arrays.items() if key[0] != attr
+        }
+        for node_id, node_data in self.nodes.items():
+            if isinstance(node_data, dict) and attr in node_data:
+                try:
+                    index.setdefault(node_data[attr], set()).add(self._ids[node_id])
+                except TypeError:
+                    pass
+
+    def _indexed_nodes(self, attr, value):
+        """Sorted array of the nodes with node_data[attr] == value (cached)."""
+        try:
+            nodes = self._index_arrays.get((attr, value))
+        except TypeError:
+            return np.empty(0, INDEX_DTYPE)
+        if nodes is None:
+            matches = self.indexes[attr].get(value, ())
+            nodes = np.sort(np.fromiter(matches, INDEX_DTYPE, len(matches)))
+            self._index_arrays[(attr, value)] = nodes
+        return nodes
+
+    def _matching_nodes(self, criteria):
+        """Returns a sorted array of the nodes matching every attr=value."""
+        matches = None
+        unindexed = {}
+        for attr, value in criteria.items():
+            if attr not in self.indexes:
+                unindexed[attr] = value
+                continue
+            nodes = self._indexed_nodes(attr, value)
+            matches = (
+                nodes
+                if matches is None
+                else np.intersect1d(matches, nodes, assume_unique=True)
+            )
+        if unindexed:
+            if matches is None:
+                candidates = self.nodes
+            else:
+                candidates = [self._keys[node] for node in matches.tolist()]
+            matches = np.asarray(
+                sorted(
+                    self._ids[node_id]
+                    for node_id in candidates
+                    if isinstance(self.nodes.get(node_id), dict)
+                    and all(
+                        self.nodes[node_id].get(attr) == value
+                        for attr, value in unindexed.items()
+                    )
+                ),
+                dtype=INDEX_DTYPE,
+            )
+        return matches
+
+    def find_nodes(self, **criteria):
+        """Returns ids of nodes whose data matches every attr=value given."""
+        if not criteria:
+            return list(self.nodes)
+        return [self._keys[node] for node in self._matching_nodes(criteria).tolist()]
+
+    def set_embeddings(self, node_ids, vectors):
+        """Attaches one embedding per node; all embeddings share a dimension."""
+        node_ids = list(node_ids)
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        if self.embeddings is None:
+            self.embeddings = VectorStore(vectors.shape[1])
+        self.embeddings.add([self._intern(node_id) for node_id in node_ids], vectors)
+
+    def set_embedding(self, node_id, vector):
+        self.set_embeddings([node_id], [vector])
+
+    def get_embedding(self, node_id):
+        """Returns the (normalized) embedding of a node, or None."""
+        node = self._ids.get(node_id)
+        if node is None or self.embeddings is None:
+            return None
+        return self.embeddings.get(node)
+
+    def build_vector_index(self, nlist=None, force=False):
+        """Trains the approximate (IVF) index over all node embeddings.
+
+        An existing index is kept unless force is set or the number of
+        embeddings has drifted too far from the one it was trained on.
+        """
+        if self.embeddings is not None and len(self.embeddings):
+            if force or self.embeddings.ivf_is_stale():
+                self.embeddings.build_ivf(nlist)
+
+    def similar_nodes(
+        self, vector, k=10, exact=False, nprobe=DEFAULT_NPROBE, **criteria
+    ):
+        """Returns [(node_id, score)] of the k nodes most similar to vector.
+
+        Keyword criteria filter candidates by node attributes as in
+        find_nodes(), e.g. similar_nodes(query, k=5, type="chunk").
+        """
+        if self.embeddings is None:
+            return []
+        rows = None
+        if criteria:
+            rows = self.embeddings.rows_for(self._matching_nodes(criteria))
+            if not len(rows):
+                return []
+        nodes, scores = self.embeddings.search(vector, k, rows, exact, nprobe)
+        return [
+            (self._keys[node], score)
+            for node, score in zip(nodes.tolist(), scores.tolist())
+        ]
+
+    @property
+    def adjacency_nbytes(self):
+        """Bytes used by the compacted adjacency arrays of both directions."""
+        return self._out.nbytes + self._in.nbytes
+
+    def save(self, path):
+        """Snapshots the graph to a directory of .npy arrays and JSON files.
+
+        Node ids, node data and edge data must be JSON-serializable. Several
+        processes may save to the same path; the last one to finish wins.
+        """
+        self.compact()
+        parent, name = os.path.split(os.path.abspath(path))
+        # A directory of our own, on the same filesystem so it can be renamed.
+        tmp_path = tempfile.mkdtemp(prefix=f"{name}.", suffix=".tmp", dir=parent)
+        try:
+            self._write_snapshot(tmp_path)
+            with _snapshot_lock(path):
+                # Swap the new snapshot in; the old one is removed only afterwards.
+                old_path = f"{path}.old"
+                shutil.rmtree(old_path, ignore_errors=True)
+                if os.path.exists(path):
+                    os.rename(path, old_path)
+                os.rename(tmp_path, path)
+                shutil.rmtree(old_path, ignore_errors=True)
+        finally:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+    def _write_snapshot(self, tmp_path):
+        for name, adjacency in (("out", self._out), ("in", self._in)):
+            np.save(os.path.join(tmp_path, f"{name}_indptr.npy"), adjacency.indptr)
+            np.save(os.path.join(tmp_path, f"{name}_indices.npy"), adjacency.indices)
+            np.save(os.path.join(tmp_path, f"{name}_edge_ids.npy"), adjacency.edge_ids)
+        with open(os.path.join(tmp_path, "graph.json"), "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "keys": self._keys,
+                    "nodes": [[node_id, data] for node_id, data in self.nodes.items()],
+                    "edge_data": [[eid, data] for eid, data in self.edge_data.items()],
+                    "num_edges": self.num_edges,
+                    "indexes": list(self.indexes),
+                },
+                f,
+            )
+        if self.embeddings is not None:
+            self.embeddings.save(tmp_path)
+
+    @classmethod
+    def load(cls, path):
+        """Restores a snapshot; adjacency and embedding arrays are memory-mapped."""
+        with _snapshot_lock(path, shared=True):
+            # Memory-mapped files stay readable after a later save removes them.
+            return cls._read_snapshot(path)
+
+    @classmethod
+    def _read_snapshot(cls, path):
+        graph = cls()
+        with open(os.path.join(path, "graph.json"), "r", encoding="utf-8") as f:
+            state = json.load(f)
+        graph._keys = state["keys"]
+        graph._ids = {node_id: idx for idx, node_id in enumerate(graph._keys)}
+        graph.nodes = {node_id: data for node_id, data in state["nodes"]}
+        graph.edge_data = {eid: data for eid, data in state["edge_data"]}
+        graph.num_edges = state["num_edges"]
+        for name in ("out", "in"):
+            arrays = [
+                np.load(os.path.join(path, f"{name}_{part}.npy"), mmap_mode="r")
+                for part in ("indptr", "indices", "edge_ids")
+            ]
+            setattr(graph, f"_{name}", _Adjacency(*arrays))
+        for attr in state["indexes"]:
+            graph.create_index(attr)
+        if os.path.exists(os.path.join(path, "embeddings.npy")):
+            graph.embeddings = VectorStore.load(path)
+        return graph
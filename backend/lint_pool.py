@@ -0,0 +1,198 @@
+# backend/lint_pool.py
+import collections
+import concurrent.futures
+import hashlib
+import io
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+LINT_WORKERS = int(os.getenv("LINT_WORKERS", "2"))
+LINT_CACHE_SIZE = int(os.getenv("LINT_CACHE_SIZE", "1024"))
+LINT_TIMEOUT_SECONDS = float(os.getenv("LINT_TIMEOUT_SECONDS", "30"))
+# Workers are recycled after this many snippets to cap astroid cache growth.
+LINT_TASKS_PER_WORKER = int(os.getenv("LINT_TASKS_PER_WORKER", "500"))
+LATENCY_WINDOW = 1000
+MODULE_NAME = "temp_code.py"
+PYLINT_ARGS = ("--persistent=n",)
+
+
+def lint_source(code, args=PYLINT_ARGS):
+    """Runs pylint in this process on code, fed through stdin, and returns its report."""
+    from pylint.lint import Run
+    from pylint.reporters.text import TextReporter
+
+    output = io.StringIO()
+    stdin = sys.stdin
+    # pylint re-wraps sys.stdin.buffer as UTF-8 text before reading it.
+    sys.stdin = io.TextIOWrapper(io.BytesIO(code.encode("utf-8")), encoding="utf-8")
+    try:
+        Run(
+            ["--from-stdin", MODULE_NAME, *args],
+            reporter=TextReporter(output),
+            exit=False,
+        )
+    finally:
+        sys.stdin = stdin
+    return output.getvalue()
+
+
+def _warm_up():
+    # Pay for importing pylint and inferring common stdlib modules once per
+    # worker instead of on the first real request.
+    lint_source("import os\nimport sys\nimport json\n")
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * fraction))
+    return round(sorted_values[index], 1)
+
+
+class LintPool:
+    """Lints snippets in long-lived pylint worker processes.
+
+    Results are cached by a hash of the snippet (LRU), and concurrent
+    requests for the same snippet share one lint run.
+    """
+
+    def __init__(
+        self,
+        workers=LINT_WORKERS,
+        cache_size=LINT_CACHE_SIZE,
+        timeout=LINT_TIMEOUT_SECONDS,
+        tasks_per_worker=LINT_TASKS_PER_WORKER,
+    ):
+        self.workers = workers
+        self.cache_size = cache_size
+        self.timeout = timeout
+        self.tasks_per_worker = tasks_per_worker
+        self._executor = None
+        self._cache = collections.OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._latencies = collections.deque(maxlen=LATENCY_WINDOW)
+        self._miss_latencies = collections.deque(maxlen=LATENCY_WINDOW)
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _get_executor(self):
+        if self._executor is None:
+            options = {}
+            if sys.version_info >= (3, 11):
+                # Older Pythons keep their workers for good.
+                options["max_tasks_per_child"] = self.tasks_per_worker
+            # spawn: workers must not inherit the Flask process's threads.
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_warm_up,
+                **options,
+            )
+        return self._executor
+
+    def _recycle(self):
+        """Kills the workers and starts a fresh pool next time; call with the lock held.
+
+        Lints still running in the old pool fail with BrokenProcessPool.
+        """
+        if self._executor is None:
+            return
+        executor, self._executor = self._executor, None
+        # The executor cannot stop a running task, so kill its processes.
+        for process in list((executor._processes or {}).values()):
+            process.kill()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def start(self):
+        """Starts and warms up the workers ahead of the first request."""
+        with self._lock:
+            executor = self._get_executor()
+        for future in [executor.submit(len, "") for _ in range(self.workers)]:
+            future.result()
+
+    def lint(self, code):
+        """Returns (report, cached) for code, raising on lint failures."""
+        start = time.monotonic()
+        key = hashlib.sha256(code.encode("utf-8")).hexdigest()
+        with self._lock:
+            report = self._cache.get(key)
+            if report is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                self._latencies.append((time.monotonic() - start) * 1000)
+                return report, True
+            self.misses += 1
+            future = self._inflight.get(key)
+            if future is None:
+                future = self._get_executor().submit(lint_source, code)
+                self._inflight[key] = future
+        try:
+            report = future.result(timeout=self.timeout)
+        except concurrent.futures.TimeoutError:
+            with self._lock:
+                self.errors += 1
+                self._inflight.pop(key, None)
+                # A snippet still waiting for a worker is simply dropped; one
+                # being linted would hold its worker until it finished.
+                if not future.cancel():
+                    self._recycle()
+            raise
+        except concurrent.futures.process.BrokenProcessPool:
+            with self._lock:
+                self.errors += 1
+                self._inflight.pop(key, None)
+                # A worker died mid-lint; start a fresh pool next time.
+                if self._executor is not None:
+                    self._executor.shutdown(wait=False)
+                    self._executor = None
+            raise
+        except Exception:
+            with self._lock:
+                self.errors += 1
+                self._inflight.pop(key, None)
+            raise
+        with self._lock:
+            self._inflight.pop(key, None)
+            self._cache[key] = report
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            elapsed_ms = (time.monotonic() - start) * 1000
+            self._latencies.append(elapsed_ms)
+            self._miss_latencies.append(elapsed_ms)
+        return report, False
+
+    def stats(self):
+        """Latency percentiles over the last LATENCY_WINDOW lints, and cache counters."""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            miss_latencies = sorted(self._miss_latencies)
+            lookups = self.hits + self.misses
+            return {
+                "workers": self.workers,
+                "samples": len(latencies),
+                "p50_ms": _percentile(latencies, 0.50),
+                "p99_ms": _percentile(latencies, 0.99),
+                "uncached_p50_ms": _percentile(miss_latencies, 0.50),
+                "uncached_p99_ms": _percentile(miss_latencies, 0.99),
+                "cache_entries": len(self._cache),
+                "cache_size": self.cache_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "errors": self.errors,
+            }
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+pool = LintPool()
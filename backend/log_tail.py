@@ -0,0 +1,143 @@
+# backend/log_tail.py
+import datetime
+import logging
+import os
+import re
+import time
+
+BLOCK_SIZE = 64 * 1024
+# Upper bound on bytes scanned backwards for one request, so level/since
+# filters that match nothing cannot turn a tail into a full read.
+MAX_SCAN_BYTES = 64 * 1024 * 1024
+FOLLOW_POLL_INTERVAL = 0.5
+# Matches the "%(asctime)s - %(levelname)s - %(message)s" format app.py uses.
+RECORD_START = re.compile(
+    r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}),(\d{3}) - ([A-Z]+) - "
+)
+
+
+def log_files(path):
+    """Returns path and its rotated backups (path.1, path.2, ...), newest first."""
+    files = [path] if os.path.exists(path) else []
+    index = 1
+    while os.path.exists(f"{path}.{index}"):
+        files.append(f"{path}.{index}")
+        index += 1
+    return files
+
+
+def parse_record_start(line):
+    """Returns (timestamp, levelno) if line starts a log record, else None."""
+    match = RECORD_START.match(line)
+    if not match:
+        return None
+    timestamp = datetime.datetime.strptime(
+        match.group(1), "%Y-%m-%d %H:%M:%S"
+    ) + datetime.timedelta(milliseconds=int(match.group(2)))
+    return timestamp, logging.getLevelName(match.group(3))
+
+
+def reverse_lines(path, block_size=BLOCK_SIZE):
+    """Yields the lines of path from last to first, reading blocks from the end."""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        remainder = b""
+        while position > 0:
+            size = min(block_size, position)
+            position -= size
+            f.seek(position)
+            lines = (f.read(size) + remainder).split(b"\n")
+            # The first piece may continue in the previous block.
+            remainder = lines.pop(0)
+            for line in reversed(lines):
+                yield line.decode("utf-8", errors="replace")
+        yield remainder.decode("utf-8", errors="replace")
+
+
+def _matches(levelno, min_level):
+    return min_level is None or (isinstance(levelno, int) and levelno >= min_level)
+
+
+def tail_records(
+    path, count=10, min_level=None, since=None, max_scan_bytes=MAX_SCAN_BYTES
+):
+    """Returns up to count most recent log records, oldest first.
+
+    A record is a line starting with a timestamp plus any continuation lines
+    (e.g. a traceback). Only the end of the log is read: work grows with the
+    records requested, not the log size. Rotated backups are read only when
+    the current file holds fewer matching records.
+    """
+    records = []
+    continuation = []
+    scanned = 0
+    for file_path in log_files(path):
+        for line in reverse_lines(file_path):
+            scanned += len(line) + 1
+            if not line:
+                continue
+            start = parse_record_start(line)
+            if start is None:
+                continuation.append(line)
+                continue
+            timestamp, levelno = start
+            if since is not None and timestamp < since:
+                return records[::-1]
+            if _matches(levelno, min_level):
+                records.append("\n".join([line, *reversed(continuation)]) + "\n")
+                if len(records) >= count:
+                    return records[::-1]
+            continuation = []
+            if scanned >= max_scan_bytes:
+                return records[::-1]
+    return records[::-1]
+
+
+def follow_records(path, min_level=None, poll_interval=FOLLOW_POLL_INTERVAL):
+    """Yields log records appended to path from now on; yields None when idle.
+
+    Survives rotation: when path is replaced or truncated it is reopened
+    from the start. Continuation lines inherit their record's level.
+    """
+    f = None
+    inode = None
+    levelno = None
+    try:
+        while True:
+            if f is None:
+                try:
+                    f = open(path, "rb")
+                except FileNotFoundError:
+                    yield None
+                    time.sleep(poll_interval)
+                    continue
+                stat = os.fstat(f.fileno())
+                if inode is None:
+                    f.seek(0, os.SEEK_END)
+                inode = stat.st_ino
+            raw = f.readline()
+            if raw.endswith(b"\n"):
+                line = raw.decode("utf-8", errors="replace")
+                start = parse_record_start(line)
+                if start is not None:
+                    levelno = start[1]
+                if _matches(levelno, min_level):
+                    yield line
+                continue
+            # Partial or no line: rewind to its start and wait for more.
+            f.seek(f.tell() - len(raw))
+            try:
+                stat = os.stat(path)
+                rotated = stat.st_ino != inode or stat.st_size < f.tell()
+            except FileNotFoundError:
+                rotated = True
+            if rotated:
+                f.close()
+                f = None
+                continue
+            yield None
+            time.sleep(poll_interval)
+    finally:
+        if f is not None:
+            f.close()
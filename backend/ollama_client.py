@@ -0,0 +1,69 @@
+# backend/ollama_client.py
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+POOL_SIZE = int(os.getenv("OLLAMA_POOL_SIZE", "32"))
+MAX_RETRIES = int(os.getenv("OLLAMA_MAX_RETRIES", "3"))
+BACKOFF_FACTOR = float(os.getenv("OLLAMA_BACKOFF_FACTOR", "0.5"))
+CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "3.05"))
+READ_TIMEOUT = float(os.getenv("OLLAMA_READ_TIMEOUT", "30"))
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def _build_session(pool_size, max_retries, backoff_factor):
+    """Creates a keep-alive session with a bounded connection pool."""
+    retry = Retry(
+        total=max_retries,
+        connect=max_retries,
+        # Generation is not idempotent, so never replay a request that was
+        # already sent; only retry connection failures and overload statuses.
+        read=0,
+        status=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(429, 502, 503, 504),
+        allowed_methods=frozenset(["GET", "POST"]),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=pool_size,
+        max_retries=retry,
+        pool_block=True,
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_session(base_url):
+    """Returns the process-wide pooled session for an Ollama base URL."""
+    key = base_url.rstrip("/")
+    session = _sessions.get(key)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(key)
+            if session is None:
+                session = _build_session(POOL_SIZE, MAX_RETRIES, BACKOFF_FACTOR)
+                _sessions[key] = session
+    return session
+
+
+def post(base_url, path, **kwargs):
+    """POSTs to an Ollama endpoint over the pooled session."""
+    kwargs.setdefault("timeout", (CONNECT_TIMEOUT, READ_TIMEOUT))
+    return get_session(base_url).post(f"{base_url.rstrip('/')}{path}", **kwargs)
+
+
+def close_all():
+    """Closes every pooled session, e.g. on worker shutdown."""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
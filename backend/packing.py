@@ -0,0 +1,227 @@
+# backend/packing.py
+import bisect
+import importlib.util
+
+import numpy as np
+
+IGNORE_INDEX = -100
+# The only attention implementation in transformers that starts a new
+# sequence wherever position_ids restart.
+PACKING_ATTN_IMPLEMENTATION = "flash_attention_2"
+# Implementations that take a ready-made 4D mask, so packed examples can be
+# kept apart with a block-diagonal causal mask instead (e.g. on CPU).
+BLOCK_MASK_ATTN_IMPLEMENTATIONS = ("eager", "sdpa")
+
+
+def packing_attn_implementation():
+    """Returns flash_attention_2 if this machine can run it, else None
+    (no CUDA device or no flash_attn package)."""
+    if importlib.util.find_spec("flash_attn") is None:
+        return None
+    import torch
+
+    return PACKING_ATTN_IMPLEMENTATION if torch.cuda.is_available() else None
+
+
+def packing_mode(model):
+    """How the loaded model keeps packed examples apart.
+
+    "position_ids" for flash_attention_2, "block_mask" for implementations
+    that accept a 4D attention mask, None if packing is not supported.
+    """
+    implementation = getattr(model.config, "_attn_implementation", None)
+    if implementation == PACKING_ATTN_IMPLEMENTATION:
+        return "position_ids"
+    if implementation in BLOCK_MASK_ATTN_IMPLEMENTATIONS:
+        return "block_mask"
+    return None
+
+
+def supports_packing(model):
+    """True if the loaded model keeps packed examples apart."""
+    return packing_mode(model) is not None
+
+
+def block_causal_mask(position_ids, dtype):
+    """Builds a (batch, 1, seq, seq) additive mask from packed position_ids.
+
+    A token attends to earlier tokens of its own example only; examples (and
+    the trailing padding) start wherever position_ids restart at 0.
+    """
+    import torch
+
+    segments = torch.cumsum(position_ids == 0, dim=-1)
+    same_example = segments[:, :, None] == segments[:, None, :]
+    seq_len = position_ids.shape[-1]
+    causal = torch.ones(
+        seq_len, seq_len, dtype=torch.bool, device=position_ids.device
+    ).tril()
+    mask = torch.zeros(same_example.shape, dtype=dtype, device=position_ids.device)
+    mask.masked_fill_(~(same_example & causal), torch.finfo(dtype).min)
+    return mask[:, None]
+
+
+def pack_examples(lengths, block_size):
+    """Groups example indices into blocks of at most block_size tokens.
+
+    Uses best-fit decreasing: longest examples are placed first, each into
+    the fullest block that still has room. Examples longer than block_size
+    are truncated to it.
+    """
+    order = np.argsort(-np.asarray(lengths), kind="stable")
+    blocks = []
+    # Sorted (free_tokens, block_index) pairs for blocks that are not full.
+    free_slots = []
+    for idx in order:
+        size = min(int(lengths[idx]), block_size)
+        pos = bisect.bisect_left(free_slots, (size, -1))
+        if pos < len(free_slots):
+            free, block = free_slots.pop(pos)
+            blocks[block].append(int(idx))
+            free -= size
+        else:
+            block = len(blocks)
+            blocks.append([int(idx)])
+            free = block_size - size
+        if free > 0:
+            bisect.insort(free_slots, (free, block))
+    return blocks
+
+
+class PackedDataset:
+    """Fixed-length training blocks built from several examples each.
+
+    position_ids restart at every example, and at the padding after the
+    last one, so a flash_attention_2 model given no attention_mask keeps them
+    apart; use ThroughputCollator(..., drop_attention_mask=True). Eager and
+    SDPA models need ThroughputCollator(..., block_mask_dtype=...) instead,
+    which swaps in a block_causal_mask. The first
+    token of each example is masked out of the labels so the loss never asks
+    the model to predict across an example boundary.
+    """
+
+    def __init__(self, token_cache, block_size, pad_token_id):
+        self.token_cache = token_cache
+        self.block_size = block_size
+        self.pad_token_id = pad_token_id
+        self.blocks = pack_examples(token_cache.lengths(), block_size)
+
+    def __len__(self):
+        return len(self.blocks)
+
+    def __getitem__(self, idx):
+        input_ids = np.full(self.block_size, self.pad_token_id, dtype=np.int64)
+        labels = np.full(self.block_size, IGNORE_INDEX, dtype=np.int64)
+        attention_mask = np.zeros(self.block_size, dtype=np.int64)
+        position_ids = np.zeros(self.block_size, dtype=np.int64)
+        pos = 0
+        for example in self.blocks[idx]:
+            ids = self.token_cache[example][: self.block_size]
+            end = pos + len(ids)
+            input_ids[pos:end] = ids
+            labels[pos + 1 : end] = ids[1:]
+            attention_mask[pos:end] = 1
+            position_ids[pos:end] = np.arange(len(ids))
+            pos = end
+        position_ids[pos:] = np.arange(self.block_size - pos)
+        return {
+            "input_ids": input_ids,
+            "labels": labels,
+            "attention_mask": attention_mask,
+            "position_ids": position_ids,
+        }
+
+    def padding_ratio(self):
+        real = sum(
+            min(int(length), self.block_size) for length in self.token_cache.lengths()
+        )
+        return 1.0 - real / max(1, len(self.blocks) * self.block_size)
+
+
+class LengthBucketSampler:
+    """Yields indices so that consecutive batches hold similar-length examples.
+
+    Indices are shuffled, cut into mega-batches of batch_size *
+    bucket_multiplier, sorted by length inside each mega-batch and split into
+    batches; batch order is then shuffled so training still sees a random mix.
+    """
+
+    def __init__(self, lengths, batch_size, bucket_multiplier=50, seed=0):
+        self.lengths = np.asarray(lengths)
+        self.batch_size = batch_size
+        self.bucket_multiplier = bucket_multiplier
+        self.seed = seed
+        self.epoch = 0
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def batches(self):
+        rng = np.random.default_rng(self.seed + self.epoch)
+        perm = rng.permutation(len(self.lengths))
+        mega = self.batch_size * self.bucket_multiplier
+        batches = []
+        for start in range(0, len(perm), mega):
+            chunk = perm[start : start + mega]
+            chunk = chunk[np.argsort(-self.lengths[chunk], kind="stable")]
+            batches.extend(
+                chunk[i : i + self.batch_size]
+                for i in range(0, len(chunk), self.batch_size)
+            )
+        # Keep a short final batch last so every other batch stays aligned
+        # with the DataLoader's batch boundaries after shuffling.
+        tail = []
+        if batches and len(batches[-1]) < self.batch_size:
+            tail.append(batches.pop())
+        rng.shuffle(batches)
+        return batches + tail
+
+    def __iter__(self):
+        for batch in self.batches():
+            yield from (int(idx) for idx in batch)
+
+    def __len__(self):
+        return len(self.lengths)
+
+
+def batch_padding_ratio(lengths, batches):
+    """Fraction of padded slots when each batch is padded to its longest item."""
+    lengths = np.asarray(lengths)
+    real = padded = 0
+    for batch in batches:
+        batch_lengths = lengths[np.asarray(batch)]
+        real += int(batch_lengths.sum())
+        padded += int(batch_lengths.max()) * len(batch_lengths)
+    return 1.0 - real / max(1, padded)
+
+
+class ThroughputCollator:
+    """Wraps a data collator and counts real versus padded tokens.
+
+    With drop_attention_mask the mask is removed once counted, so that
+    flash-attention separates packed examples by their position_ids. With
+    block_mask_dtype it is replaced by a block_causal_mask of that dtype.
+    """
+
+    def __init__(self, collator, drop_attention_mask=False, block_mask_dtype=None):
+        self.collator = collator
+        self.drop_attention_mask = drop_attention_mask
+        self.block_mask_dtype = block_mask_dtype
+        self.real_tokens = 0
+        self.total_slots = 0
+
+    def __call__(self, features):
+        batch = self.collator(features)
+        mask = batch["attention_mask"]
+        self.real_tokens += int(mask.sum())
+        self.total_slots += int(mask.numel())
+        if self.drop_attention_mask:
+            del batch["attention_mask"]
+        elif self.block_mask_dtype is not None:
+            batch["attention_mask"] = block_causal_mask(
+                batch["position_ids"], self.block_mask_dtype
+            )
+        return batch
+
+    def padding_ratio(self):
+        return 1.0 - self.real_tokens / max(1, self.total_slots)
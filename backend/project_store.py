@@ -0,0 +1,276 @@
+# backend/project_store.py
+import collections
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+MANIFEST_FILE = "manifest.json"
+LEGACY_FILE = "project_data.json"
+LOCK_FILE = ".lock"
+BLOB_DIR = "blobs"
+# A top-level "files" object is split into one blob per file, so editing one
+# file only rewrites that file's blob.
+FILES_KEY = "files"
+# Unreferenced blobs are swept once they add up to this much (or to the live
+# project size, whichever is larger)...
+GC_MIN_GARBAGE_BYTES = 1024 * 1024
+# ...but only if older than this, so a blob written by a concurrent save that
+# has not committed its manifest yet is never removed.
+GC_GRACE_SECONDS = 60
+
+
+# Used instead of flock where fcntl is unavailable; they only lock out other
+# threads of this process.
+_thread_locks = collections.defaultdict(threading.Lock)
+
+
+class PreconditionFailed(Exception):
+    """The project changed since the version named by If-Match."""
+
+
+class NotAnObject(Exception):
+    """A patch was sent to a project that is not a JSON object."""
+
+
+@contextlib.contextmanager
+def _locked(path):
+    """Holds an exclusive lock on the project across threads and processes."""
+    os.makedirs(path, exist_ok=True)
+    if fcntl is None:
+        with _thread_locks[os.path.abspath(path)]:
+            yield
+        return
+    with open(os.path.join(path, LOCK_FILE), "a", encoding="utf-8") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+
+def _atomic_write(path, data):
+    """Writes data to path via a fsynced temp file and rename."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _encode(value):
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+
+class ProjectStore:
+    """Project data kept as content-addressed JSON blobs plus a manifest.
+
+    The manifest maps each top-level key (and each entry of a top-level
+    "files" object) to the sha256 of its JSON encoding; a project that is
+    not a JSON object is kept whole as its "value" blob. Saves only write
+    blobs that do not exist yet and then atomically replace the manifest;
+    loads stream the blobs back out without parsing them.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.manifest_path = os.path.join(path, MANIFEST_FILE)
+        self.blob_dir = os.path.join(path, BLOB_DIR)
+
+    def _blob_path(self, digest):
+        return os.path.join(self.blob_dir, digest[:2], digest)
+
+    def _put_blob(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _atomic_write(path, data)
+        return {"hash": digest, "size": len(data)}
+
+    def _read_current(self):
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def read_manifest(self):
+        """Returns the current manifest, importing a legacy project_data.json."""
+        manifest = self._read_current()
+        if manifest is None and os.path.exists(os.path.join(self.path, LEGACY_FILE)):
+            with _locked(self.path):
+                manifest = self._read_locked()
+        return manifest
+
+    def _read_locked(self):
+        """read_manifest() for callers already holding the project lock."""
+        manifest = self._read_current()
+        legacy_path = os.path.join(self.path, LEGACY_FILE)
+        if manifest is None and os.path.exists(legacy_path):
+            with open(legacy_path, "r", encoding="utf-8") as f:
+                manifest = self._commit(self._split(json.load(f)), None)
+            os.remove(legacy_path)
+        return manifest
+
+    def _split(self, payload):
+        if not isinstance(payload, dict):
+            return {
+                "entries": {},
+                "files": None,
+                "value": self._put_blob(_encode(payload)),
+            }
+        entries, files = {}, None
+        for key, value in payload.items():
+            if key == FILES_KEY and isinstance(value, dict):
+                files = {
+                    name: self._put_blob(_encode(content))
+                    for name, content in value.items()
+                }
+            else:
+                entries[key] = self._put_blob(_encode(value))
+        return {"entries": entries, "files": files}
+
+    def _commit(self, manifest, if_match, previous=None):
+        """Writes a new manifest version; call with the project lock held."""
+        if if_match is not None and (previous or {}).get("etag") not in if_match:
+            raise PreconditionFailed()
+        versioned = [manifest["entries"], manifest["files"]]
+        if manifest.get("value"):
+            versioned.append(manifest["value"])
+        digest = hashlib.sha256(_encode(versioned)).hexdigest()
+        manifest["etag"] = digest[:32]
+        manifest["version"] = (previous or {}).get("version", 0) + 1
+        manifest["saved_at"] = time.time()
+        live = {meta["hash"]: meta["size"] for meta in self._blobs(manifest)}
+        released = {
+            meta["hash"]: meta["size"]
+            for meta in self._blobs(previous)
+            if meta["hash"] not in live
+        }
+        manifest["garbage_bytes"] = (previous or {}).get("garbage_bytes", 0) + sum(
+            released.values()
+        )
+        os.makedirs(self.path, exist_ok=True)
+        _atomic_write(self.manifest_path, _encode(manifest))
+        live_bytes = sum(live.values())
+        if manifest["garbage_bytes"] > max(GC_MIN_GARBAGE_BYTES, live_bytes):
+            self.collect_garbage(manifest)
+        return manifest
+
+    @staticmethod
+    def _blobs(manifest):
+        if not manifest:
+            return []
+        blobs = list(manifest["entries"].values())
+        blobs.extend((manifest["files"] or {}).values())
+        if manifest.get("value"):
+            blobs.append(manifest["value"])
+        return blobs
+
+    def save(self, payload, if_match=None):
+        """Replaces the project with payload, any JSON value, and returns the
+        new manifest."""
+        with _locked(self.path):
+            previous = self._read_locked()
+            return self._commit(self._split(payload), if_match, previous)
+
+    def patch(self, payload, if_match=None):
+        """Merges payload into the project and returns the new manifest.
+
+        Top-level keys replace existing ones and a null value removes the key.
+        Inside "files" the same applies per file, so a patch of
+        {"files": {"a.py": "..."}} rewrites only a.py. Raises NotAnObject if
+        the stored project is not a JSON object.
+        """
+        with _locked(self.path):
+            previous = self._read_locked()
+            if previous is None:
+                previous = {"entries": {}, "files": None}
+            if previous.get("value"):
+                raise NotAnObject()
+            manifest = {
+                "entries": dict(previous["entries"]),
+                "files": previous["files"],
+            }
+            for key, value in payload.items():
+                if key == FILES_KEY and isinstance(value, dict):
+                    files = dict(manifest["files"] or {})
+                    for name, content in value.items():
+                        if content is None:
+                            files.pop(name, None)
+                        else:
+                            files[name] = self._put_blob(_encode(content))
+                    manifest["files"] = files
+                elif value is None:
+                    manifest["entries"].pop(key, None)
+                    if key == FILES_KEY:
+                        manifest["files"] = None
+                else:
+                    manifest["entries"][key] = self._put_blob(_encode(value))
+                    if key == FILES_KEY:
+                        manifest["files"] = None
+            return self._commit(manifest, if_match, previous)
+
+    def _read_blob(self, meta):
+        with open(self._blob_path(meta["hash"]), "rb") as f:
+            return f.read()
+
+    def iter_json(self, manifest):
+        """Yields the project as a JSON document, one blob at a time."""
+        if manifest.get("value"):
+            yield self._read_blob(manifest["value"])
+            return
+        yield b"{"
+        first = True
+        for key, meta in manifest["entries"].items():
+            yield (b"" if first else b",") + _encode(key) + b":"
+            yield self._read_blob(meta)
+            first = False
+        if manifest["files"] is not None:
+            yield (b"" if first else b",") + _encode(FILES_KEY) + b":{"
+            for i, (name, meta) in enumerate(manifest["files"].items()):
+                yield (b"," if i else b"") + _encode(name) + b":"
+                yield self._read_blob(meta)
+            yield b"}"
+        yield b"}"
+
+    def load(self):
+        """Returns the project as a dict, or None if nothing was saved yet."""
+        manifest = self.read_manifest()
+        if manifest is None:
+            return None
+        return json.loads(b"".join(self.iter_json(manifest)))
+
+    def collect_garbage(self, manifest):
+        """Removes blobs the manifest no longer references."""
+        live = {meta["hash"] for meta in self._blobs(manifest)}
+        cutoff = time.time() - GC_GRACE_SECONDS
+        remaining = 0
+        for root, _, names in os.walk(self.blob_dir):
+            for name in names:
+                if name in live:
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                    if stat.st_mtime < cutoff:
+                        os.remove(path)
+                    else:
+                        remaining += stat.st_size
+                except FileNotFoundError:
+                    pass
+        if remaining != manifest["garbage_bytes"]:
+            manifest["garbage_bytes"] = remaining
+            _atomic_write(self.manifest_path, _encode(manifest))
@@ -0,0 +1,279 @@
+# backend/spool.py
+import glob
+import gzip
+import io
+import json
+import os
+import re
+import time
+import zlib
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+SEGMENT_MAX_BYTES = 8 * 1024 * 1024
+SEGMENT_MAX_SECONDS = 60
+OPEN_SUFFIX = ".open"
+COMPRESSION_SUFFIXES = {None: "", "gzip": ".gz", "zstd": ".zst"}
+# fsync policies: flush and fsync after every write_many() batch, only when
+# a segment is closed, or never (leave it to the OS). With "segment" and
+# "none" a crash can lose at most the open segment, which time-based rotation
+# keeps short.
+FSYNC_POLICIES = ("batch", "segment", "none")
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError as e:
+        raise RuntimeError(
+            "zstd spooling requires the 'zstandard' package to be installed"
+        ) from e
+    return zstandard
+
+
+def _try_lock(f):
+    """Takes an exclusive lock on f unless another open file holds one."""
+    if fcntl is None:
+        return False
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return False
+    return True
+
+
+def _complete_lines(data):
+    return data[: data.rfind(b"\n") + 1]
+
+
+def _recover_segment(open_path, raw):
+    """Cuts the segment in raw back to its last complete line.
+
+    Returns False if not a single line survives.
+    """
+    data = raw.read()
+    if open_path.endswith(".gz" + OPEN_SUFFIX):
+        # Unlike GzipFile, a decompressobj returns what it can of a cut stream.
+        text = _complete_lines(zlib.decompressobj(wbits=31).decompress(data))
+        compressed = gzip.compress(text)
+    elif open_path.endswith(".zst" + OPEN_SUFFIX):
+        zstandard = _zstandard()
+        text = _complete_lines(
+            zstandard.ZstdDecompressor().decompressobj().decompress(data)
+        )
+        compressed = zstandard.ZstdCompressor().compress(text)
+    else:
+        text = compressed = _complete_lines(data)
+    if compressed != data:
+        raw.seek(0)
+        raw.write(compressed)
+        raw.truncate()
+        raw.flush()
+        os.fsync(raw.fileno())
+    return bool(text)
+
+
+def recover_segments(directory, prefix=""):
+    """Closes segments left open by writers that died, oldest first.
+
+    A torn final line is dropped, and a segment without one complete line
+    is deleted. Live writers lock their open segment and are left alone;
+    without fcntl (on Windows) nothing is recovered. Returns the recovered
+    segments.
+    """
+    recovered = []
+    pattern = os.path.join(directory, f"{prefix}*.jsonl*{OPEN_SUFFIX}")
+    for open_path in sorted(glob.glob(pattern)):
+        path = open_path[: -len(OPEN_SUFFIX)]
+        try:
+            with open(open_path, "r+b") as raw:
+                if not _try_lock(raw):
+                    continue
+                complete = _recover_segment(open_path, raw)
+                # Rename while still holding the lock.
+                if complete:
+                    os.replace(open_path, path)
+                else:
+                    os.remove(open_path)
+        except (OSError, zlib.error, RuntimeError) as e:
+            print(f"Could not recover spool segment {open_path}: {e}")
+            continue
+        if complete:
+            print(f"Recovered spool segment {path}")
+            recovered.append(path)
+    return recovered
+
+
+class SpoolWriter:
+    """Appends records as compact JSONL to size/time-rotated segment files.
+
+    Segments are named <prefix>-<seq>.jsonl[.gz|.zst]. The segment being
+    written carries an extra .open suffix, which is dropped once it is
+    closed, so readers only ever see complete files. On start-up, segments
+    in directory that crashed writers left open are recovered.
+    """
+
+    def __init__(
+        self,
+        directory,
+        prefix,
+        compression=None,
+        max_bytes=SEGMENT_MAX_BYTES,
+        max_seconds=SEGMENT_MAX_SECONDS,
+        fsync="segment",
+    ):
+        if compression not in COMPRESSION_SUFFIXES:
+            raise ValueError(f"Unsupported compression: {compression}")
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unsupported fsync policy: {fsync}")
+        if compression == "zstd":
+            _zstandard()
+        self.directory = directory
+        self.prefix = prefix
+        self.compression = compression
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.fsync = fsync
+        self.segments = []
+        self.records_written = 0
+        self.bytes_written = 0
+        # Bytes handed to the segment stream since the last flush to disk.
+        self.unflushed_bytes = 0
+        self.last_flush = None
+        self._seq = 0
+        self._raw = None
+        self._stream = None
+        self._path = None
+        self._segment_bytes = 0
+        self._segment_opened_at = 0.0
+        os.makedirs(directory, exist_ok=True)
+        self.recovered = recover_segments(directory)
+        self._seq = self._next_seq()
+
+    def _next_seq(self):
+        """Continues after segments an earlier writer left with this prefix."""
+        seq_re = re.compile(re.escape(self.prefix) + r"-(\d+)\.jsonl")
+        seqs = [
+            int(match.group(1))
+            for match in map(seq_re.match, os.listdir(self.directory))
+            if match
+        ]
+        return max(seqs) + 1 if seqs else 0
+
+    def _open_segment(self):
+        suffix = COMPRESSION_SUFFIXES[self.compression]
+        self._path = os.path.join(
+            self.directory, f"{self.prefix}-{self._seq:05d}.jsonl{suffix}"
+        )
+        self._seq += 1
+        self._raw = open(self._path + OPEN_SUFFIX, "wb")
+        # Tells recover_segments() that this segment is still being written.
+        _try_lock(self._raw)
+        if self.compression == "gzip":
+            self._stream = gzip.GzipFile(fileobj=self._raw, mode="wb")
+        elif self.compression == "zstd":
+            self._stream = (
+                _zstandard().ZstdCompressor().stream_writer(self._raw, closefd=False)
+            )
+        else:
+            self._stream = self._raw
+        self._segment_bytes = 0
+        self._segment_opened_at = time.time()
+
+    def _flush(self, sync):
+        if self._stream is not self._raw:
+            self._stream.flush()
+        self._raw.flush()
+        if sync:
+            os.fsync(self._raw.fileno())
+        self.last_flush = time.time()
+        self.unflushed_bytes = 0
+
+    def _close_segment(self):
+        if self._raw is None:
+            return
+        if self._stream is not self._raw:
+            # Closing the compressor writes its trailer into the raw file.
+            self._stream.close()
+        self._raw.flush()
+        if self.fsync != "none":
+            os.fsync(self._raw.fileno())
+        self.last_flush = time.time()
+        self.unflushed_bytes = 0
+        self._raw.close()
+        os.replace(self._path + OPEN_SUFFIX, self._path)
+        self.segments.append(self._path)
+        self._raw = self._stream = self._path = None
+
+    def write_many(self, records):
+        """Appends records to the current segment, rotating when it is full."""
+        if not records:
+            return
+        if self._raw is not None and (
+            self._segment_bytes >= self.max_bytes
+            or time.time() - self._segment_opened_at >= self.max_seconds
+        ):
+            self._close_segment()
+        if self._raw is None:
+            self._open_segment()
+        payload = "".join(
+            json.dumps(record, separators=(",", ":")) + "\n" for record in records
+        ).encode("utf-8")
+        self._stream.write(payload)
+        self._segment_bytes += len(payload)
+        self.bytes_written += len(payload)
+        self.unflushed_bytes += len(payload)
+        self.records_written += len(records)
+        if self.fsync == "batch":
+            self._flush(True)
+
+    def close(self):
+        """Closes the current segment and returns every segment written."""
+        self._close_segment()
+        return list(self.segments)
+
+
+def _open_segment_for_reading(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    if path.endswith(".zst"):
+        raw = open(path, "rb")
+        reader = _zstandard().ZstdDecompressor().stream_reader(raw, closefd=True)
+        return io.TextIOWrapper(reader, encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def list_segments(directory, prefix=""):
+    """Returns the closed segments in directory, oldest first."""
+    paths = glob.glob(os.path.join(directory, f"{prefix}*.jsonl*"))
+    return sorted(path for path in paths if not path.endswith(OPEN_SUFFIX))
+
+
+def iter_segment(path):
+    """Yields the records of one segment, skipping a torn final line."""
+    with _open_segment_for_reading(path) as f:
+        try:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    print(f"Skipping unreadable record in {path}")
+        except EOFError:
+            # A compressed segment cut short by a crash.
+            print(f"Segment {path} is truncated")
+
+
+def iter_records(paths):
+    """Lazily yields records from segment files or spool directories."""
+    if isinstance(paths, str):
+        paths = [paths]
+    for path in paths:
+        if os.path.isdir(path):
+            yield from iter_records(list_segments(path))
+        else:
+            yield from iter_segment(path)
@@ -0,0 +1,32 @@
+# backend/tests/conftest.py
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def pytest_configure(config):
+    # Importing the app configuration converts ./.env into ./config.json and
+    # deletes the .env, and both apps create databases and logs in the working
+    # directory, so the tests run from a scratch directory instead.
+    workdir = tempfile.mkdtemp(prefix="llmcoder-tests-")
+    with open(os.path.join(workdir, "config.json"), "w", encoding="utf-8") as f:
+        json.dump({}, f)
+    os.chdir(workdir)
+
+
+@pytest.fixture(scope="session")
+def flask_app():
+    """The Flask app module in backend/app.py (backend.app is the FastAPI package)."""
+    spec = importlib.util.spec_from_file_location(
+        "backend.flask_app", os.path.join(BACKEND_DIR, "app.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,76 @@
+import sys
+
+import pytest
+
+from backend import finetune_jobs
+from backend.agent_registry import AgentRegistry
+from backend.agents import LlmCoderAgent
+
+
+@pytest.fixture
+def make_registry(tmp_path):
+    def make(**kwargs):
+        return AgentRegistry(
+            LlmCoderAgent.from_dict, db_path=str(tmp_path / "agents.sqlite3"), **kwargs
+        )
+
+    return make
+
+
+def test_least_recently_used_agents_are_evicted_and_rehydrated(make_registry):
+    registry = make_registry(max_live=2)
+    first, second, third = (registry.add(LlmCoderAgent()) for _ in range(3))
+    first.model = "llama3"
+    registry.save(first)
+
+    assert registry.live_ids() == [second.agent_id, third.agent_id]
+    assert registry.evicted_lru == 1
+    rehydrated = registry.get(first.agent_id)
+    assert rehydrated is not first
+    assert rehydrated.model == "llama3"
+    assert registry.live_ids() == [third.agent_id, first.agent_id]
+    assert registry.metrics()["rehydrated"] == 1
+    assert len(registry) == 3
+
+
+def test_idle_agents_are_evicted(make_registry):
+    registry = make_registry(idle_ttl=0)
+    agent = registry.add(LlmCoderAgent())
+    registry.add(LlmCoderAgent())
+    assert agent.agent_id not in registry.live_ids()
+    assert registry.evicted_idle >= 1
+    assert registry.get("unknown") is None
+
+
+def test_busy_agents_stay_live(make_registry):
+    registry = make_registry(max_live=1)
+    busy = registry.add(LlmCoderAgent())
+    busy.status = "Fine-tuning"
+    registry.add(LlmCoderAgent())
+    assert busy.agent_id in registry.live_ids()
+    assert registry.metrics()["busy"] == 1
+
+
+@pytest.mark.parametrize("status", ["Getting suggestion", "Converting to Ollama"])
+def test_request_statuses_are_saved_as_idle(make_registry, status):
+    registry = make_registry()
+    agent = registry.add(LlmCoderAgent())
+    agent.status = status
+    registry.save(agent)
+    assert registry._load(agent.agent_id)["status"] == "Idle"
+
+
+@pytest.mark.parametrize(
+    "code, status", [("raise SystemExit(1)", "Error"), ("pass", "Idle")]
+)
+def test_fine_tuning_status_follows_the_latest_job(monkeypatch, tmp_path, code, status):
+    scheduler = finetune_jobs.FineTuneScheduler(db_path=str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setattr(finetune_jobs, "scheduler", scheduler)
+    agent = LlmCoderAgent()
+    agent.status = "Fine-tuning"
+    metadata = agent.to_dict()
+    assert LlmCoderAgent.from_dict(metadata).status == "Idle"
+
+    scheduler.submit(agent.agent_id, [sys.executable, "-c", code], None, str(tmp_path))
+    scheduler.queue.join()
+    assert LlmCoderAgent.from_dict(metadata).status == status
@@ -0,0 +1,89 @@
+# backend/tests/test_agents.py
+import json
+
+import pytest
+
+from backend import agents
+
+
+class FakeResponse:
+    def __init__(self, lines):
+        self.lines = lines
+
+    def raise_for_status(self):
+        pass
+
+    def iter_lines(self):
+        return iter(self.lines)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+def ollama_lines(*tokens):
+    lines = [
+        json.dumps({"response": token, "done": False}).encode() for token in tokens
+    ]
+    return lines + [json.dumps({"response": "", "done": True}).encode()]
+
+
+@pytest.fixture
+def respond(monkeypatch):
+    """Makes Ollama answer with the given NDJSON lines."""
+
+    def respond(lines):
+        monkeypatch.setattr(
+            agents.ollama_client, "post", lambda *args, **kwargs: FakeResponse(lines)
+        )
+
+    return respond
+
+
+@pytest.fixture
+def agent():
+    return agents.LlmCoderAgent()
+
+
+def test_stream_suggestion_yields_tokens_and_ends_idle(respond, agent):
+    respond(ollama_lines("def ", "add"))
+    assert list(agent.stream_suggestion("p")) == ["def ", "add"]
+    assert agent.status == "Idle"
+
+
+def test_closing_stream_early_resets_status(respond, agent):
+    respond(ollama_lines("a", "b", "c"))
+    fragments = agent.stream_suggestion("p")
+    assert next(fragments) == "a"
+    assert agent.status == "Getting suggestion"
+    fragments.close()
+    assert agent.status == "Idle"
+
+
+def test_invalid_json_line_sets_error(respond, agent):
+    respond([json.dumps({"response": "a"}).encode(), b"not json"])
+    with pytest.raises(ValueError):
+        list(agent.stream_suggestion("p"))
+    assert agent.status == "Error"
+    assert agent.get_suggestion("p").startswith("Error")
+
+
+def test_suggestion_events_report_decode_errors(respond, agent, flask_app):
+    respond([b"not json"])
+    frames = list(flask_app.stream_suggestion_events(agent, "p"))
+    assert json.loads(frames[0][len("data: ") :]) == {
+        "error": "Could not get suggestion from LLM."
+    }
+    assert json.loads(frames[-1][len("data: ") :])["done"] is True
+
+
+def test_suggestion_events_disconnect_saves_idle_agent(respond, agent, flask_app):
+    respond(ollama_lines("a", "b"))
+    flask_app.agent_registry.add(agent)
+    events = flask_app.stream_suggestion_events(agent, "p")
+    next(events)
+    events.close()
+    assert agent.status == "Idle"
+    assert flask_app.agent_registry._load(agent.agent_id)["status"] == "Idle"
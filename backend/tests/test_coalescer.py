@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+
+from backend.app.core import llm
+from backend.app.core.coalescer import RequestCoalescer
+from backend.app.core.llm_router import Backend, LLMRouter, backends_from_env
+from backend.benchmarks.stub_servers import (
+    OllamaStubHandler,
+    OpenAIStubHandler,
+    start_stub_server,
+)
+
+
+async def test_concurrent_items_share_a_batch_per_key():
+    batches = []
+
+    async def dispatch(key, items):
+        batches.append((key, items))
+        return [f"{key}:{item}" for item in items]
+
+    coalescer = RequestCoalescer(dispatch, max_batch=16, max_wait=0.01)
+    results = await asyncio.gather(
+        *(coalescer.submit(i % 2, i) for i in range(6)),
+    )
+    assert results == [f"{i % 2}:{i}" for i in range(6)]
+    assert sorted(batches) == [(0, [0, 2, 4]), (1, [1, 3, 5])]
+    assert coalescer.stats()["avg_batch_size"] == 3
+
+
+async def test_full_batches_are_sent_without_waiting():
+    sizes = []
+
+    async def dispatch(key, items):
+        sizes.append(len(items))
+        return items
+
+    coalescer = RequestCoalescer(dispatch, max_batch=2, max_wait=60)
+    results = await asyncio.wait_for(
+        asyncio.gather(*(coalescer.submit("k", i) for i in range(4))), timeout=5
+    )
+    assert results == [0, 1, 2, 3]
+    assert sizes == [2, 2]
+
+
+async def test_batch_errors_reach_every_caller():
+    async def dispatch(key, items):
+        return items[:-1]
+
+    coalescer = RequestCoalescer(dispatch, max_wait=0.001)
+    results = await asyncio.gather(
+        coalescer.submit("k", 1), coalescer.submit("k", 2), return_exceptions=True
+    )
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+async def test_cancelled_callers_do_not_break_the_batch():
+    async def dispatch(key, items):
+        await asyncio.sleep(0.01)
+        return items
+
+    coalescer = RequestCoalescer(dispatch, max_wait=0.001)
+    cancelled = asyncio.ensure_future(coalescer.submit("k", 1))
+    kept = asyncio.ensure_future(coalescer.submit("k", 2))
+    await asyncio.sleep(0.005)
+    cancelled.cancel()
+    assert await kept == 2
+    assert coalescer.stats()["batches"] == 1
+
+
+@pytest.fixture
+async def coalescing(monkeypatch):
+    openai_server, openai_url = start_stub_server(OpenAIStubHandler)
+    ollama_server, ollama_url = start_stub_server(OllamaStubHandler)
+    backends = backends_from_env(openai_url, None, ollama_url, openai_batch=True)
+    monkeypatch.setattr(llm, "llm_router", LLMRouter(backends))
+    monkeypatch.setattr(llm, "LLM_COALESCE", True)
+    monkeypatch.setattr(llm, "response_cache", None)
+    coalescer = RequestCoalescer(llm._complete_batch, max_batch=8, max_wait=0.01)
+    monkeypatch.setattr(llm, "prompt_coalescer", coalescer)
+    yield {backend.kind: backend for backend in backends}
+    await llm.close_async_client()
+    for server in (openai_server, ollama_server):
+        server.shutdown()
+        server.server_close()
+
+
+async def test_generate_text_sends_one_completions_request(coalescing):
+    prompts = [f"prompt {i}" for i in range(5)]
+    texts = await asyncio.gather(
+        *(llm.generate_text_async(prompt, model="gpt-4o") for prompt in prompts)
+    )
+    assert texts == [f"{OpenAIStubHandler.text} ({prompt})" for prompt in prompts]
+    assert llm.prompt_coalescer.stats()["batches"] == 1
+    assert coalescing["openai"].requests == 1
+
+
+async def test_models_of_non_batching_backends_are_sent_as_chats(coalescing):
+    texts = await asyncio.gather(
+        *(llm.generate_text_async(f"prompt {i}", model="mistral") for i in range(3))
+    )
+    assert texts == ["".join(OllamaStubHandler.tokens)] * 3
+    assert llm.prompt_coalescer.stats()["batches"] == 0
+    assert coalescing["ollama"].requests == 3
+
+
+def test_only_openai_backends_batch():
+    with pytest.raises(ValueError):
+        Backend("local", "ollama", "http://localhost:11434", ["*"], batch=True)
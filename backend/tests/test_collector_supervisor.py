@@ -0,0 +1,84 @@
+import json
+import textwrap
+import time
+
+import pytest
+
+from backend.collector_supervisor import CollectorError, CollectorSupervisor
+
+# Stands in for data_collection.py: reports stats, then waits for SIGTERM.
+FAKE_COLLECTOR = textwrap.dedent("""
+    import json, signal, sys, time
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print("@stats " + json.dumps({"queued_events": 0, "max_pending_events": 100}))
+    while True:
+        time.sleep(0.05)
+    """)
+
+
+@pytest.fixture
+def make_supervisor(tmp_path):
+    script = tmp_path / "fake_collector.py"
+    script.write_text(FAKE_COLLECTOR)
+    supervisors = []
+
+    def make(**kwargs):
+        supervisor = CollectorSupervisor(
+            script=str(script),
+            db_path=str(tmp_path / "agents.sqlite3"),
+            stop_timeout=5,
+            **kwargs,
+        )
+        supervisors.append(supervisor)
+        return supervisor
+
+    yield make
+    for supervisor in supervisors:
+        supervisor.shutdown()
+
+
+def _wait_for_stats(supervisor, agent_id):
+    deadline = time.monotonic() + 10
+    while not supervisor.status(agent_id)["stats"]:
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+
+
+def test_other_workers_see_and_stop_collectors(make_supervisor):
+    owner, other = make_supervisor(), make_supervisor()
+    started = owner.start("agent-1")
+    _wait_for_stats(owner, "agent-1")
+
+    status = other.status("agent-1")
+    assert status["pid"] == started["pid"]
+    assert status["state"] == "running"
+    assert status["stats"]["max_pending_events"] == 100
+    assert other.active_count() == 1
+    with pytest.raises(CollectorError) as excinfo:
+        other.start("agent-1")
+    assert excinfo.value.status == 409
+
+    assert other.stop("agent-1")["state"] == "stopped"
+    assert owner.status("agent-1")["state"] == "exited"
+    assert other.status("agent-1")["state"] == "exited"
+    assert other.active_count() == 0
+    with pytest.raises(CollectorError) as excinfo:
+        other.stop("agent-1")
+    assert excinfo.value.status == 404
+
+
+def test_limit_counts_collectors_of_other_workers(make_supervisor):
+    make_supervisor(max_collectors=1).start("agent-1")
+    with pytest.raises(CollectorError) as excinfo:
+        make_supervisor(max_collectors=1).start("agent-2")
+    assert excinfo.value.status == 503
+
+
+@pytest.mark.parametrize("route", ["start", "stop"])
+def test_routes_reject_non_object_bodies(flask_app, route):
+    response = flask_app.app.test_client().post(
+        f"/api/data_collection/{route}",
+        data=json.dumps(["agent-1"]),
+        content_type="application/json",
+    )
+    assert response.status_code == 400
@@ -0,0 +1,123 @@
+import asyncio
+import json
+
+import pytest
+
+from backend.app.core import scraping
+from backend.app.services import document
+from backend.app.services.document import normalize_url, summarize_documents
+from backend.benchmarks.stub_servers import StaticSiteStubHandler, start_stub_server
+
+
+@pytest.fixture
+async def site(tmp_path, monkeypatch):
+    server, base_url = start_stub_server(StaticSiteStubHandler, paragraphs=2)
+    monkeypatch.setattr(scraping, "SCRAPE_CACHE_DB", "")
+    monkeypatch.setattr(scraping, "page_cache", None)
+    yield base_url
+    await scraping.close_async_client()
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def summaries(monkeypatch):
+    texts = []
+
+    async def summarize_text(text):
+        texts.append(text)
+        await asyncio.sleep(0.01)
+        return None if "Page 13" in text else "summary of " + " ".join(text.split()[:2])
+
+    monkeypatch.setattr(document, "summarize_text", summarize_text)
+    return texts
+
+
+async def _collect(*args, **kwargs):
+    # What the endpoint sends: one JSON document per line.
+    lines = [
+        json.dumps(result) + "\n"
+        async for result in summarize_documents(*args, **kwargs)
+    ]
+    return [json.loads(line) for line in "".join(lines).splitlines()]
+
+
+def test_normalize_url():
+    assert normalize_url(" HTTP://Example.COM/a?b=1#c ") == "http://example.com/a?b=1"
+    assert normalize_url("https://example.com") == "https://example.com/"
+    assert normalize_url("ftp://example.com/file") is None
+    assert normalize_url("not a url") is None
+
+
+async def test_streams_one_line_per_distinct_url(site, summaries):
+    urls = [
+        f"{site}/page/1",
+        f"{site}/page/1#top",
+        f"{site}/page/1?ref=feed",
+        f"{site}/page/2",
+        f"{site}/page/13",
+        f"{site}/missing",
+        "mailto:someone@example.com",
+    ]
+    *results, done = await _collect(urls, concurrency=4)
+    by_url = {result["url"]: result for result in results}
+
+    assert len(results) == 6
+    assert by_url[f"{site}/page/1"]["summary"].startswith("summary")
+    duplicate = by_url[f"{site}/page/1?ref=feed"]
+    assert duplicate["same_content_as"] == f"{site}/page/1"
+    assert duplicate["summary"] == by_url[f"{site}/page/1"]["summary"]
+    assert "error" in by_url[f"{site}/page/13"]
+    assert "error" in by_url[f"{site}/missing"]
+    assert by_url["mailto:someone@example.com"]["error"] == "Not an http(s) URL."
+    # Pages 1, 2 and 13; the duplicate reused page 1's summary.
+    assert len(summaries) == 3
+    assert done["done"] is True
+    assert (done["requested"], done["distinct"]) == (7, 6)
+    assert (done["same_content"], done["failed"]) == (1, 3)
+
+
+async def test_text_only_batches_skip_the_llm(site, summaries):
+    *results, done = await _collect(
+        [f"{site}/page/4", f"{site}/page/4?x=1"], summarize=False
+    )
+    assert results[0]["text"].startswith("Page 4")
+    assert results[1] == {
+        "url": f"{site}/page/4?x=1",
+        "same_content_as": f"{site}/page/4",
+    }
+    assert summaries == []
+    assert done["failed"] == 0
+
+
+async def test_results_arrive_as_they_complete(site, monkeypatch):
+    async def summarize_text(text):
+        await asyncio.sleep(0.5 if text.startswith("Page 5") else 0)
+        return "summary"
+
+    monkeypatch.setattr(document, "summarize_text", summarize_text)
+    results = await _collect([f"{site}/page/5", f"{site}/page/6"], concurrency=2)
+    assert [result.get("url") for result in results[:2]] == [
+        f"{site}/page/6",
+        f"{site}/page/5",
+    ]
+
+
+async def test_closing_the_stream_cancels_the_workers(site, monkeypatch):
+    started = asyncio.Event()
+
+    async def summarize_text(text):
+        started.set()
+        await asyncio.sleep(60)
+
+    monkeypatch.setattr(document, "summarize_text", summarize_text)
+    stream = summarize_documents([f"{site}/page/7", f"{site}/page/8"])
+    first = asyncio.ensure_future(stream.__anext__())
+    await started.wait()
+    first.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await first
+    await stream.aclose()
+    tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+    await asyncio.sleep(0)
+    assert all(task.done() for task in tasks)
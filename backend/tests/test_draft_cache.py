@@ -0,0 +1,46 @@
+import pytest
+
+pytest.importorskip("googleapiclient")
+pytest.importorskip("google.oauth2")
+
+from backend.app.core import llm
+from backend.app.core.llm_cache import ResponseCache
+from backend.app.core.llm_router import Backend, LLMRouter
+from backend.app.services import email
+from backend.benchmarks.stub_servers import OpenAIStubHandler, start_stub_server
+
+MESSAGE = {
+    "payload": {"headers": [{"name": "Subject", "value": "Lunch"}]},
+    "snippet": "Are you free on Friday?",
+}
+
+
+class FakeGmail:
+    """Answers the users().messages().get(...).execute() chain with MESSAGE."""
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self
+
+    def execute(self):
+        return MESSAGE
+
+
+@pytest.fixture
+async def stub_backend(monkeypatch):
+    server, base_url = start_stub_server(OpenAIStubHandler)
+    backend = Backend("stub", "openai", base_url, ["*"])
+    monkeypatch.setattr(llm, "llm_router", LLMRouter([backend], hedging=False))
+    monkeypatch.setattr(llm, "response_cache", ResponseCache())
+    monkeypatch.setattr(llm, "LLM_COALESCE", False)
+    monkeypatch.setattr(email, "get_gmail_service", FakeGmail)
+    yield backend
+    await llm.close_async_client()
+    server.shutdown()
+    server.server_close()
+
+
+async def test_repeated_draft_reply_hits_the_cache(stub_backend):
+    first = await email.draft_reply("message-1", "user")
+    assert await email.draft_reply("message-1", "user") == first
+    assert stub_backend.requests == 1
+    assert llm.response_cache.stats()["hits"]["memory"] == 1
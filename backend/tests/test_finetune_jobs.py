@@ -0,0 +1,140 @@
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import pytest
+
+from backend import finetune_jobs
+
+
+@pytest.fixture
+def make_scheduler(tmp_path):
+    def make(**kwargs):
+        return finetune_jobs.FineTuneScheduler(
+            db_path=str(tmp_path / "agents.sqlite3"), **kwargs
+        )
+
+    return make
+
+
+def python_command(code):
+    return [sys.executable, "-c", code]
+
+
+def wait_until(predicate, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.02)
+
+
+def test_finished_job_is_visible_to_other_processes(make_scheduler, tmp_path):
+    owner = make_scheduler()
+    job = owner.submit(
+        "agent-1", python_command("print(' 2/2 [00:01<00:00]')"), None, str(tmp_path)
+    )
+    owner.queue.join()
+    assert job.status == finetune_jobs.COMPLETED
+
+    other = make_scheduler()
+    snapshot = other.get(job.job_id)
+    assert snapshot.status == finetune_jobs.COMPLETED
+    assert snapshot.returncode == 0
+    assert snapshot.to_dict()["progress"] == 1.0
+    assert [j.job_id for j in other.jobs_for_agent("agent-1")] == [job.job_id]
+
+
+def test_on_finish_runs_outside_the_lock(make_scheduler, tmp_path):
+    scheduler = make_scheduler()
+    seen = []
+
+    def on_finish(job):
+        # A callback that uses the scheduler would deadlock under the lock.
+        seen.append((job.status, scheduler.get(job.job_id) is job))
+
+    scheduler.submit("agent-1", python_command("pass"), None, str(tmp_path), on_finish)
+    scheduler.queue.join()
+    assert seen == [(finetune_jobs.COMPLETED, True)]
+
+
+def test_cancel_from_another_process_terminates_the_job(make_scheduler, tmp_path):
+    owner = make_scheduler()
+    job = owner.submit(
+        "agent-1", python_command("import time; time.sleep(30)"), None, str(tmp_path)
+    )
+    other = make_scheduler()
+    wait_until(lambda: (other.get(job.job_id).pid or 0) > 0)
+
+    assert other.cancel(job.job_id).cancel_requested
+    owner.queue.join()
+    assert job.status == finetune_jobs.CANCELLED
+    assert other.get(job.job_id).status == finetune_jobs.CANCELLED
+
+
+def test_finished_jobs_expire(make_scheduler, tmp_path):
+    scheduler = make_scheduler(job_ttl=0)
+    job = scheduler.submit("agent-1", python_command("pass"), None, str(tmp_path))
+    scheduler.queue.join()
+    assert scheduler.get(job.job_id) is job
+
+    scheduler._prune()
+    assert scheduler.get(job.job_id) is None
+    assert make_scheduler().get(job.job_id) is None
+
+
+def _dead_pid():
+    process = subprocess.Popen(python_command("pass"))
+    process.wait()
+    return process.pid
+
+
+def _record_running_job(scheduler, tmp_path, owner, pid=None):
+    job = finetune_jobs.FineTuneJob("agent-1", None, None, str(tmp_path))
+    job.status = finetune_jobs.RUNNING
+    job.owner = owner
+    job.pid = pid
+    scheduler._save(job)
+    return job
+
+
+def test_jobs_of_dead_schedulers_are_failed(make_scheduler, tmp_path):
+    scheduler = make_scheduler()
+    dead = _record_running_job(scheduler, tmp_path, f"{_dead_pid()}::0")
+    # A restarted worker that got its old pid back.
+    pid, start, _ = scheduler.owner.split(":")
+    restarted = _record_running_job(scheduler, tmp_path, f"{pid}:{start}:0")
+    alive = _record_running_job(scheduler, tmp_path, scheduler.owner)
+
+    assert scheduler.get(dead.job_id).status == finetune_jobs.FAILED
+    statuses = {job.job_id: job.status for job in make_scheduler()._load("1", ())}
+    assert statuses == {
+        dead.job_id: finetune_jobs.FAILED,
+        restarted.job_id: finetune_jobs.FAILED,
+        alive.job_id: finetune_jobs.RUNNING,
+    }
+
+
+def test_cancel_does_not_signal_unrelated_processes(make_scheduler, tmp_path):
+    # A process that is not a child of the job's scheduler.
+    launcher = subprocess.Popen(
+        python_command(
+            "import subprocess, sys; "
+            "print(subprocess.Popen([sys.executable, '-c', "
+            "'import time; time.sleep(30)']).pid)"
+        ),
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    pid = int(launcher.stdout.readline())
+    launcher.wait()
+    launcher.stdout.close()
+    try:
+        owner = make_scheduler()
+        job = _record_running_job(owner, tmp_path, owner.owner, pid)
+        assert make_scheduler().cancel(job.job_id).cancel_requested
+        time.sleep(0.2)
+        os.kill(pid, 0)
+    finally:
+        os.kill(pid, signal.SIGKILL)
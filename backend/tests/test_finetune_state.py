@@ -0,0 +1,122 @@
+import json
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def finetune(monkeypatch):
+    # finetune.py runs as a script and imports its helpers as top-level modules.
+    monkeypatch.syspath_prepend(BACKEND_DIR)
+    import finetune
+
+    return finetune
+
+
+@pytest.fixture
+def finetune_state(finetune):
+    import finetune_state
+
+    return finetune_state
+
+
+@pytest.fixture
+def training_runs(finetune, monkeypatch):
+    """A fake backend that saves a checkpoint and records each call."""
+    calls = []
+
+    def run_fake_backend(data_file, output_dir, raw_data, **options):
+        calls.append({"records": list(raw_data), **options})
+        os.makedirs(os.path.join(output_dir, f"checkpoint-{len(calls)}"))
+        return {}
+
+    monkeypatch.setitem(finetune.BACKENDS, "fake", run_fake_backend)
+    return calls
+
+
+def run(finetune, tmp_path, name, records, backend="fake", incremental=False):
+    data_file = tmp_path / f"{name}.json"
+    data_file.write_text(json.dumps(records))
+    finetune.run_fine_tuning(
+        str(data_file),
+        str(tmp_path / "agent" / name),
+        "agent-1",
+        backend=backend,
+        agent_dir=str(tmp_path / "agent"),
+        incremental=incremental,
+    )
+
+
+def test_ledger_is_kept_per_backend(finetune_state, tmp_path):
+    records = [{"text": "a"}, {"text": "b"}]
+    ledger = finetune_state.RecordLedger(str(tmp_path), "peft")
+    _, hashes = ledger.filter_new(records)
+    ledger.add(hashes)
+
+    assert (
+        finetune_state.RecordLedger(str(tmp_path), "peft").filter_new(records)[0] == []
+    )
+    assert (
+        finetune_state.RecordLedger(str(tmp_path), "cpu").filter_new(records)[0]
+        == records
+    )
+
+
+def test_legacy_ledger_belongs_to_the_latest_backend(finetune_state, tmp_path):
+    digest = finetune_state.record_hash({"text": "a"})
+    (tmp_path / "seen_records.txt").write_text(f"{digest}\n")
+    checkpoint = tmp_path / "run" / "checkpoint-5"
+    checkpoint.mkdir(parents=True)
+    finetune_state.mark_latest(str(tmp_path), str(checkpoint), "peft")
+
+    peft = finetune_state.RecordLedger(str(tmp_path), "peft")
+    assert peft.filter_new([{"text": "a"}])[0] == []
+    assert finetune_state.RecordLedger(str(tmp_path), "cpu").hashes == set()
+
+    peft.add([finetune_state.record_hash({"text": "b"})])
+    assert len(finetune_state.RecordLedger(str(tmp_path), "peft").hashes) == 2
+
+
+def test_simulated_runs_do_not_fill_the_ledger(finetune, finetune_state, tmp_path):
+    run(finetune, tmp_path, "run1", [{"text": "a"}], backend="simulate")
+    ledger = finetune_state.RecordLedger(str(tmp_path / "agent"), "simulate")
+    assert ledger.hashes == set()
+    assert finetune_state.latest_checkpoint(str(tmp_path / "agent"), "simulate") is None
+
+
+def test_incremental_run_resumes_on_new_records(finetune, training_runs, tmp_path):
+    run(finetune, tmp_path, "run1", [{"text": "a"}, {"text": "b"}])
+    run(
+        finetune,
+        tmp_path,
+        "run2",
+        [{"text": "a"}, {"text": "b"}, {"text": "c"}],
+        incremental=True,
+    )
+    assert training_runs[1]["records"] == [{"text": "c"}]
+    assert training_runs[1]["resume_from"] == str(
+        tmp_path / "agent" / "run1" / "checkpoint-1"
+    )
+
+    # Nothing new: the run is skipped.
+    run(finetune, tmp_path, "run3", [{"text": "c"}], incremental=True)
+    assert len(training_runs) == 2
+
+
+def test_old_checkpoints_are_pruned(finetune_state, tmp_path):
+    checkpoints = []
+    for step in range(4):
+        checkpoint = tmp_path / f"fine_tuning_{step}" / f"checkpoint-{step}"
+        checkpoint.mkdir(parents=True)
+        (checkpoint.parent / "adapter_model.bin").write_text("adapter")
+        os.utime(checkpoint, (step, step))
+        checkpoints.append(checkpoint)
+    # The latest checkpoint is kept even when it is not among the newest.
+    finetune_state.mark_latest(str(tmp_path), str(checkpoints[0]), "peft")
+
+    finetune_state.prune_checkpoints(str(tmp_path), keep=2)
+    assert [c.exists() for c in checkpoints] == [True, False, True, True]
+    assert (tmp_path / "fine_tuning_1" / "adapter_model.bin").exists()
@@ -0,0 +1,82 @@
+import json
+import os
+
+import pytest
+
+from backend import keystroke_compiler
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def keypresses(text, window="editor.py", start=0.0):
+    return [
+        {
+            "event": "keypress",
+            "key": "Key.space" if char == " " else repr(char),
+            "timestamp": start + i,
+            "active_window": window,
+        }
+        for i, char in enumerate(text)
+    ]
+
+
+def test_compiles_sessions_per_window():
+    text = "def main(): return 42"
+    log = keypresses(text) + [
+        {
+            "event": "keypress",
+            "key": "Key.backspace",
+            "timestamp": 30.0,
+            "active_window": "editor.py",
+        },
+    ]
+    examples = keystroke_compiler.compile_keystrokes(log)
+    assert [example["user_prompt"] for example in examples] == [text[:-1]]
+    assert "editor.py" in examples[0]["system_prompt"]
+
+
+@pytest.mark.parametrize(
+    "records, expected",
+    [
+        (keypresses("a"), True),
+        ([{"system_prompt": "s", "user_prompt": "u"}], False),
+        (["keypress"], False),
+        ([["event", "keypress"]], False),
+        ([], False),
+    ],
+)
+def test_is_keystroke_log(records, expected):
+    assert keystroke_compiler.is_keystroke_log(records) is expected
+
+
+@pytest.mark.parametrize(
+    "body",
+    [["not", "an", "object"], {"data": ["keypress"]}, {"data": "some text"}],
+)
+def test_fine_tune_rejects_malformed_data(flask_app, body):
+    agent = flask_app.agent_registry.add(flask_app.LlmCoderAgent())
+    response = flask_app.app.test_client().post(
+        f"/api/agents/{agent.agent_id}/fine_tune", json=body
+    )
+    assert response.status_code == 400
+
+
+def test_compiled_examples_are_not_compiled_again(monkeypatch, tmp_path):
+    monkeypatch.syspath_prepend(BACKEND_DIR)
+    import finetune
+
+    seen = []
+    monkeypatch.setitem(
+        finetune.BACKENDS,
+        "fake",
+        lambda data_file, output_dir, raw_data, **options: seen.append(raw_data),
+    )
+    # An example whose fields happen to look like a keypress event.
+    examples = [{"event": "keypress", "user_prompt": "typed text"}]
+    data_file = tmp_path / "examples.json"
+    data_file.write_text(json.dumps(examples))
+
+    finetune.run_fine_tuning(
+        str(data_file), str(tmp_path / "out"), "agent-1", backend="fake", compiled=True
+    )
+    assert seen == [examples]
@@ -0,0 +1,99 @@
+import logging
+import os
+import threading
+
+import numpy as np
+
+from backend.knowledge_graph import BOTH, IN, KnowledgeGraph
+
+
+def build_graph():
+    graph = KnowledgeGraph()
+    for name in "abcde":
+        graph.add_node(name, {"type": "file" if name < "d" else "chunk"})
+    graph.add_edge("a", "b", {"kind": "imports"})
+    graph.add_edge("b", "c", {"kind": "imports"})
+    graph.add_edge("c", "d", {"kind": "contains"})
+    graph.add_edge("e", "a", {"kind": "calls"})
+    graph.create_index("type")
+    graph.set_embeddings(list("abcde"), np.eye(5, dtype=np.float32))
+    return graph
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / "graph")
+    build_graph().save(path)
+    graph = KnowledgeGraph.load(path)
+
+    assert graph.neighbors("a") == ["b"]
+    assert graph.neighbors("a", direction=IN) == ["e"]
+    assert sorted(graph.neighbors("a", direction=BOTH)) == ["b", "e"]
+    assert graph.get_edge("c", "d") == {"kind": "contains"}
+    assert graph.shortest_path("e", "d") == ["e", "a", "b", "c", "d"]
+    assert sorted(graph.k_hop("a", 2)) == ["b", "c"]
+    assert sorted(graph.find_nodes(type="chunk")) == ["d", "e"]
+    assert graph.similar_nodes(np.eye(5)[2], k=1, exact=True)[0][0] == "c"
+
+    # A loaded graph keeps growing and can be saved over its own snapshot.
+    graph.add_edge("d", "e", {"kind": "calls"})
+    graph.save(path)
+    assert KnowledgeGraph.load(path).shortest_path("a", "e") == [
+        "a",
+        "b",
+        "c",
+        "d",
+        "e",
+    ]
+
+
+def test_concurrent_saves_leave_one_complete_snapshot(tmp_path):
+    path = str(tmp_path / "graph")
+    graphs = [build_graph() for _ in range(4)]
+    threads = [threading.Thread(target=graph.save, args=(path,)) for graph in graphs]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert KnowledgeGraph.load(path).neighbors("b") == ["c"]
+    assert sorted(os.listdir(tmp_path)) == ["graph", "graph.lock"]
+
+
+def test_loads_never_see_a_save_half_done(tmp_path):
+    path = str(tmp_path / "graph")
+    graph = build_graph()
+    graph.save(path)
+    stop = threading.Event()
+
+    def save_repeatedly():
+        while not stop.is_set():
+            graph.save(path)
+
+    saver = threading.Thread(target=save_repeatedly)
+    saver.start()
+    try:
+        for _ in range(500):
+            assert KnowledgeGraph.load(path).neighbors("b") == ["c"]
+    finally:
+        stop.set()
+        saver.join()
+
+
+def test_missing_snapshot_starts_an_empty_graph_quietly(flask_app, tmp_path, caplog):
+    with caplog.at_level(logging.ERROR):
+        assert not flask_app.load_knowledge_graph(str(tmp_path / "graph")).nodes
+    assert not caplog.text
+
+
+def test_corrupt_snapshot_starts_an_empty_graph(flask_app, tmp_path, caplog):
+    path = tmp_path / "graph"
+    build_graph().save(str(path))
+    (path / "graph.json").write_text("{truncated")
+
+    with caplog.at_level(logging.ERROR):
+        graph = flask_app.load_knowledge_graph(str(path))
+    assert not graph.nodes
+    assert "Error loading knowledge graph" in caplog.text
+
+    (path / "graph.json").unlink()
+    assert not flask_app.load_knowledge_graph(str(path)).nodes
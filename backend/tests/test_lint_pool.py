@@ -0,0 +1,39 @@
+import concurrent.futures
+
+import pytest
+
+pytest.importorskip("pylint")
+
+from backend.lint_pool import LintPool
+
+SNIPPET = "import os\n\n\ndef main():\n    return os.getcwd()\n"
+
+
+@pytest.fixture
+def pool():
+    pool = LintPool(workers=1, timeout=60)
+    yield pool
+    pool.shutdown()
+
+
+def test_reports_are_cached(pool):
+    report, cached = pool.lint(SNIPPET)
+    assert "missing-module-docstring" in report
+    assert not cached
+    assert pool.lint(SNIPPET) == (report, True)
+    assert pool.stats()["hits"] == 1
+
+
+def test_timed_out_lint_kills_its_worker(pool):
+    pool.start()
+    processes = list(pool._executor._processes.values())
+    pool.timeout = 0.001
+    with pytest.raises(concurrent.futures.TimeoutError):
+        pool.lint(SNIPPET + "\nx = 1\n" * 2000)
+    for process in processes:
+        process.join(timeout=10)
+        assert not process.is_alive()
+    assert pool.stats()["errors"] == 1
+
+    pool.timeout = 60
+    assert not pool.lint(SNIPPET)[1]
@@ -0,0 +1,120 @@
+import asyncio
+
+import pytest
+
+from backend.app.core import llm
+from backend.app.core.llm_cache import (
+    MemoryTier,
+    ResponseCache,
+    SQLiteTier,
+    request_key,
+    should_cache,
+)
+from backend.app.core.llm_router import Backend, LLMRouter
+from backend.benchmarks.stub_servers import OpenAIStubHandler, start_stub_server
+
+MESSAGES = [{"role": "user", "content": "add two numbers"}]
+
+
+def test_request_key_covers_every_setting():
+    key = request_key("gpt-4o", MESSAGES, 0.0, 100)
+    assert request_key("gpt-4o", [dict(reversed(MESSAGES[0].items()))], 0.0, 100) == key
+    assert request_key("gpt-4o-mini", MESSAGES, 0.0, 100) != key
+    assert request_key("gpt-4o", MESSAGES + MESSAGES, 0.0, 100) != key
+    assert request_key("gpt-4o", MESSAGES, 0.2, 100) != key
+    assert request_key("gpt-4o", MESSAGES, 0.0, 200) != key
+
+
+def test_sampled_requests_are_not_cached_unless_asked():
+    assert should_cache(0.0)
+    assert not should_cache(0.7)
+    assert should_cache(0.7, cache=True)
+    assert not should_cache(0.0, cache=False)
+
+
+def test_memory_tier_expires_and_evicts():
+    tier = MemoryTier(max_entries=2, ttl=60)
+    tier.set("a", "A", 1.0)
+    tier.set("b", "B", 1.0)
+    tier.get("a")
+    tier.set("c", "C", 1.0)
+    assert tier.get("b") is None
+    assert tier.get("a") == ("A", 1.0)
+    tier.set("d", "D", 1.0, expires_at=1.0)
+    assert tier.get("d") is None
+
+
+async def test_hits_only_for_the_same_request(tmp_path):
+    calls = []
+
+    async def generate():
+        calls.append(1)
+        return f"answer {len(calls)}"
+
+    disk = SQLiteTier(str(tmp_path / "cache.sqlite3"))
+    cache = ResponseCache(disk=disk)
+    first = await cache.get_or_generate("gpt-4o", MESSAGES, 0.0, 100, generate)
+    assert await cache.get_or_generate("gpt-4o", MESSAGES, 0.0, 100, generate) == first
+    assert await cache.get_or_generate("gpt-4o", MESSAGES, 0.0, 50, generate) != first
+    assert len(calls) == 2
+    assert cache.stats()["hits"]["memory"] == 1
+
+    restarted = ResponseCache(disk=SQLiteTier(disk.path))
+    assert (
+        await restarted.get_or_generate("gpt-4o", MESSAGES, 0.0, 100, generate) == first
+    )
+    assert restarted.stats()["hits"]["disk"] == 1
+
+
+async def test_failures_are_not_stored_and_concurrent_requests_share_a_call():
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        return None
+
+    cache = ResponseCache()
+    assert await cache.get_or_generate("gpt-4o", MESSAGES, 0.0, 100, failing) is None
+    assert await cache.get_or_generate("gpt-4o", MESSAGES, 0.0, 100, failing) is None
+    assert len(calls) == 2
+
+    async def slow():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    results = await asyncio.gather(
+        *(cache.get_or_generate("gpt-4o", MESSAGES, 0.0, 100, slow) for _ in range(5))
+    )
+    assert results == ["answer"] * 5
+    assert len(calls) == 3
+    assert cache.stats()["hits"]["inflight"] == 4
+
+
+@pytest.fixture
+async def stub_backend(monkeypatch):
+    server, base_url = start_stub_server(OpenAIStubHandler)
+    backend = Backend("stub", "openai", base_url, ["*"])
+    monkeypatch.setattr(llm, "llm_router", LLMRouter([backend], hedging=False))
+    monkeypatch.setattr(llm, "response_cache", ResponseCache())
+    monkeypatch.setattr(llm, "LLM_COALESCE", False)
+    yield backend
+    await llm.close_async_client()
+    server.shutdown()
+    server.server_close()
+
+
+async def test_generate_chat_caches_only_deterministic_requests(stub_backend):
+    for _ in range(2):
+        assert await llm.generate_chat_async(MESSAGES, "gpt-4o", temperature=0.7)
+    assert stub_backend.requests == 2
+
+    for _ in range(2):
+        assert await llm.generate_chat_async(MESSAGES, "gpt-4o", temperature=0.0)
+    assert stub_backend.requests == 3
+
+    for _ in range(2):
+        assert await llm.generate_text_async(
+            "hi", "gpt-4o", temperature=0.7, cache=True
+        )
+    assert stub_backend.requests == 4
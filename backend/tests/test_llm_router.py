@@ -0,0 +1,102 @@
+import httpx
+import pytest
+
+from backend.app.core.llm_router import (
+    ERROR_THRESHOLD,
+    Backend,
+    BackendError,
+    LLMRouter,
+    backends_from_env,
+)
+from backend.benchmarks.stub_servers import (
+    OllamaStubHandler,
+    OpenAIStubHandler,
+    start_stub_server,
+)
+
+MESSAGES = [{"role": "user", "content": "add two numbers"}]
+OLLAMA_TEXT = "".join(OllamaStubHandler.tokens)
+
+
+@pytest.fixture
+def stubs():
+    servers = []
+
+    def start(handler_class, **attributes):
+        server, base_url = start_stub_server(handler_class, **attributes)
+        servers.append(server)
+        return base_url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+async def client():
+    async with httpx.AsyncClient(timeout=10) as client:
+        yield client
+
+
+def _dead_url():
+    """A URL nothing listens on, so requests fail to connect."""
+    server, base_url = start_stub_server(OllamaStubHandler)
+    server.shutdown()
+    server.server_close()
+    return base_url
+
+
+async def test_fails_over_to_the_next_backend(stubs, client):
+    failing = Backend(
+        "failing", "openai", stubs(OpenAIStubHandler, error_fraction=1.0), ["*"]
+    )
+    ollama = Backend("ollama", "ollama", stubs(OllamaStubHandler), ["*"])
+    router = LLMRouter([failing, ollama], hedging=False)
+
+    assert await router.chat(client, "llama3.1", MESSAGES) == OLLAMA_TEXT
+    assert failing.failures == 1
+    assert ollama.requests == 1 and ollama.failures == 0
+
+
+async def test_unhealthy_backends_are_tried_last(stubs):
+    failing = Backend("failing", "openai", _dead_url(), ["*"])
+    healthy = Backend("healthy", "ollama", stubs(OllamaStubHandler), ["*"])
+    while failing.error_ewma < ERROR_THRESHOLD:
+        failing.record(None, False)
+    router = LLMRouter([failing, healthy])
+
+    assert [backend for backend, _ in router.candidates("llama3.1")] == [
+        healthy,
+        failing,
+    ]
+
+
+async def test_raises_when_every_backend_fails(client):
+    router = LLMRouter([Backend("dead", "ollama", _dead_url(), ["*"])], hedging=False)
+    with pytest.raises(BackendError):
+        await router.chat(client, "llama3.1", MESSAGES)
+    with pytest.raises(BackendError):
+        [delta async for delta in router.stream_chat(client, "llama3.1", MESSAGES)]
+    with pytest.raises(BackendError):
+        await LLMRouter([]).chat(client, "llama3.1", MESSAGES)
+
+
+async def test_streams_fail_over_before_the_first_delta(stubs, client):
+    dead = Backend("dead", "openai", _dead_url(), ["*"])
+    openai = Backend("openai", "openai", stubs(OpenAIStubHandler), ["*"])
+    router = LLMRouter([dead, openai])
+
+    deltas = [delta async for delta in router.stream_chat(client, "gpt-4o", MESSAGES)]
+    assert "".join(deltas) == OpenAIStubHandler.text
+    assert len(deltas) > 1
+    assert dead.failures == 1 and openai.requests == 1
+
+
+async def test_streams_ollama_only_models_from_ollama(stubs, client):
+    backends = backends_from_env(_dead_url(), None, stubs(OllamaStubHandler))
+    router = LLMRouter(backends)
+
+    deltas = [delta async for delta in router.stream_chat(client, "mistral", MESSAGES)]
+    assert deltas == OllamaStubHandler.tokens
+    assert backends[0].requests == 0
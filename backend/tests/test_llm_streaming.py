@@ -0,0 +1,62 @@
+import pytest
+
+from backend.app.core import llm
+from backend.app.core.llm_cache import ResponseCache
+from backend.app.core.llm_router import LLMRouter, backends_from_env
+from backend.benchmarks.stub_servers import (
+    OllamaStubHandler,
+    OpenAIStubHandler,
+    start_stub_server,
+)
+
+MESSAGES = [{"role": "user", "content": "add two numbers"}]
+
+
+@pytest.fixture
+async def backends(monkeypatch):
+    openai_server, openai_url = start_stub_server(OpenAIStubHandler)
+    ollama_server, ollama_url = start_stub_server(OllamaStubHandler)
+    backends = backends_from_env(openai_url, None, ollama_url)
+    monkeypatch.setattr(llm, "llm_router", LLMRouter(backends))
+    monkeypatch.setattr(llm, "response_cache", ResponseCache())
+    yield {backend.kind: backend for backend in backends}
+    await llm.close_async_client()
+    for server in (openai_server, ollama_server):
+        server.shutdown()
+        server.server_close()
+
+
+async def _stream(**kwargs):
+    return [delta async for delta in llm.stream_chat_async(MESSAGES, **kwargs)]
+
+
+async def test_streams_ollama_only_models(backends):
+    assert await _stream(model="mistral") == OllamaStubHandler.tokens
+    assert backends["ollama"].requests == 1
+    assert backends["openai"].requests == 0
+
+
+async def test_streams_openai_models_in_pieces(backends):
+    deltas = await _stream(model="gpt-4o")
+    assert len(deltas) > 1
+    assert "".join(deltas) == OpenAIStubHandler.text
+    assert backends["openai"].requests == 1
+
+
+async def test_deterministic_streams_are_replayed_from_the_cache(backends):
+    text = "".join(OllamaStubHandler.tokens)
+    assert "".join(await _stream(model="mistral", temperature=0.0)) == text
+    assert await _stream(model="mistral", temperature=0.0) == [text]
+    assert backends["ollama"].requests == 1
+    assert llm.response_cache.stats()["hits"]["memory"] == 1
+
+    # A chat call for the same request is answered from the same entry.
+    assert await llm.generate_chat_async(MESSAGES, "mistral", temperature=0.0) == text
+    assert backends["ollama"].requests == 1
+
+
+async def test_sampled_streams_are_not_cached(backends):
+    for _ in range(2):
+        await _stream(model="mistral")
+    assert backends["ollama"].requests == 2
+    assert len(llm.response_cache.memory) == 0
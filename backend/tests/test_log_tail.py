@@ -0,0 +1,99 @@
+import datetime
+import json
+import os
+
+import pytest
+
+from backend import log_tail
+
+
+def record(minute, level, message):
+    return f"2024-05-01 12:{minute:02d}:00,000 - {level} - {message}\n"
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    path = tmp_path / "app.log"
+    (tmp_path / "app.log.1").write_text(
+        record(0, "INFO", "old start") + record(1, "ERROR", "old failure")
+    )
+    path.write_text(
+        record(2, "INFO", "started")
+        + record(3, "ERROR", "failed")
+        + "Traceback (most recent call last):\n  boom\n"
+        + record(4, "DEBUG", "detail")
+        + record(5, "WARNING", "slow")
+    )
+    return str(path)
+
+
+def test_tail_returns_the_last_records_oldest_first(log_file):
+    assert log_tail.tail_records(log_file, 2) == [
+        record(4, "DEBUG", "detail"),
+        record(5, "WARNING", "slow"),
+    ]
+
+
+def test_tail_keeps_tracebacks_and_reads_rotated_files(log_file):
+    records = log_tail.tail_records(log_file, 10, min_level=40)
+    assert records == [
+        record(1, "ERROR", "old failure"),
+        record(3, "ERROR", "failed") + "Traceback (most recent call last):\n  boom\n",
+    ]
+
+
+def test_tail_stops_at_since(log_file):
+    since = datetime.datetime(2024, 5, 1, 12, 3)
+    records = log_tail.tail_records(log_file, 10, since=since)
+    assert [line.splitlines()[0][-6:] for line in records] == [
+        "failed",
+        "detail",
+        "- slow",
+    ]
+
+
+def test_follow_yields_new_records_across_rotation(log_file):
+    follow = log_tail.follow_records(log_file, poll_interval=0)
+    assert next(follow) is None
+    with open(log_file, "a") as f:
+        f.write(record(6, "INFO", "appended"))
+    assert next(follow) == record(6, "INFO", "appended")
+
+    os.replace(log_file, log_file + ".1")
+    with open(log_file, "w") as f:
+        f.write(record(7, "INFO", "rotated"))
+    assert next(line for line in follow if line is not None) == record(
+        7, "INFO", "rotated"
+    )
+    follow.close()
+
+
+@pytest.fixture
+def logs_client(flask_app, log_file, monkeypatch):
+    monkeypatch.setattr(flask_app, "LOG_FILE", log_file)
+    return flask_app.app.test_client()
+
+
+def test_logs_route_filters_by_since(logs_client):
+    since = datetime.datetime(2024, 5, 1, 12, 4).timestamp()
+    response = logs_client.get(f"/api/logs?lines=10&since={since}")
+    assert response.get_json() == [
+        record(4, "DEBUG", "detail"),
+        record(5, "WARNING", "slow"),
+    ]
+
+
+def test_follow_starts_with_records_since(logs_client):
+    response = logs_client.get("/api/logs?follow=true&since=2024-05-01T12:05:00")
+    frames = response.response
+    first = next(frames)
+    response.close()
+    first = first.decode() if isinstance(first, bytes) else first
+    assert json.loads(first.removeprefix("data: ")) == {
+        "line": record(5, "WARNING", "slow")
+    }
+
+
+@pytest.mark.parametrize("since", ["1e300", "-1e20", "nan", "yesterday"])
+def test_out_of_range_since_is_rejected(logs_client, since):
+    assert logs_client.get(f"/api/logs?since={since}").status_code == 400
@@ -0,0 +1,142 @@
+import types
+
+import numpy as np
+import pytest
+import torch
+
+from backend import packing
+
+
+class FakeTokenCache:
+    def __init__(self, examples):
+        self.examples = [np.asarray(ids, dtype=np.int64) for ids in examples]
+
+    def __len__(self):
+        return len(self.examples)
+
+    def __getitem__(self, idx):
+        return self.examples[idx]
+
+    def lengths(self):
+        return np.asarray([len(ids) for ids in self.examples])
+
+
+def test_pack_examples_fills_blocks_and_truncates():
+    blocks = packing.pack_examples([5, 3, 2, 7, 12], block_size=8)
+    assert sorted(i for block in blocks for i in block) == [0, 1, 2, 3, 4]
+    lengths = [5, 3, 2, 7, 8]
+    assert all(sum(lengths[i] for i in block) <= 8 for block in blocks)
+    assert len(blocks) == 4
+
+
+def test_packed_block_keeps_examples_apart():
+    cache = FakeTokenCache([[11, 12, 13], [21, 22]])
+    dataset = packing.PackedDataset(cache, block_size=8, pad_token_id=0)
+    assert len(dataset) == 1
+    item = dataset[0]
+    assert item["input_ids"].tolist() == [11, 12, 13, 21, 22, 0, 0, 0]
+    # Neither the second example nor the padding predicts across a boundary.
+    assert item["labels"].tolist() == [-100, 12, 13, -100, 22, -100, -100, -100]
+    assert item["attention_mask"].tolist() == [1, 1, 1, 1, 1, 0, 0, 0]
+    # Every example, and the padding, starts again at position 0.
+    assert item["position_ids"].tolist() == [0, 1, 2, 0, 1, 0, 1, 2]
+    assert dataset.padding_ratio() == pytest.approx(3 / 8)
+
+
+def test_collator_counts_then_drops_the_mask():
+    cache = FakeTokenCache([[1, 2, 3], [4, 5]])
+    dataset = packing.PackedDataset(cache, block_size=4, pad_token_id=0)
+
+    def collate(features):
+        return {
+            key: torch.as_tensor(np.stack([f[key] for f in features]))
+            for key in features[0]
+        }
+
+    collator = packing.ThroughputCollator(collate, drop_attention_mask=True)
+    batch = collator([dataset[i] for i in range(len(dataset))])
+    assert "attention_mask" not in batch
+    assert "position_ids" in batch
+    assert collator.real_tokens == 5
+    assert collator.padding_ratio() == pytest.approx(3 / 8)
+
+
+@pytest.mark.parametrize(
+    "implementation, mode",
+    [
+        ("flash_attention_2", "position_ids"),
+        ("sdpa", "block_mask"),
+        ("eager", "block_mask"),
+        ("flex_attention", None),
+    ],
+)
+def test_packing_mode_follows_attention_implementation(implementation, mode):
+    model = types.SimpleNamespace(
+        config=types.SimpleNamespace(_attn_implementation=implementation)
+    )
+    assert packing.packing_mode(model) == mode
+    assert packing.supports_packing(model) is (mode is not None)
+
+
+def test_block_causal_mask_stays_inside_each_example():
+    position_ids = torch.tensor([[0, 1, 2, 0, 1, 0]])
+    mask = packing.block_causal_mask(position_ids, torch.float32)
+    assert mask.shape == (1, 1, 6, 6)
+    allowed = (mask[0, 0] == 0).int().tolist()
+    assert allowed == [
+        [1, 0, 0, 0, 0, 0],
+        [1, 1, 0, 0, 0, 0],
+        [1, 1, 1, 0, 0, 0],
+        [0, 0, 0, 1, 0, 0],
+        [0, 0, 0, 1, 1, 0],
+        [0, 0, 0, 0, 0, 1],
+    ]
+
+
+def test_collator_swaps_in_a_block_mask():
+    cache = FakeTokenCache([[1, 2, 3], [4, 5]])
+    dataset = packing.PackedDataset(cache, block_size=6, pad_token_id=0)
+
+    def collate(features):
+        return {
+            key: torch.as_tensor(np.stack([f[key] for f in features]))
+            for key in features[0]
+        }
+
+    collator = packing.ThroughputCollator(collate, block_mask_dtype=torch.float32)
+    batch = collator([dataset[0]])
+    assert batch["attention_mask"].shape == (1, 1, 6, 6)
+    assert collator.real_tokens == 5
+
+
+@pytest.mark.parametrize("implementation", ["eager", "sdpa"])
+def test_packed_logits_match_unpacked(implementation):
+    transformers = pytest.importorskip("transformers")
+    torch.manual_seed(0)
+    config = transformers.LlamaConfig(
+        vocab_size=64,
+        hidden_size=32,
+        intermediate_size=64,
+        num_hidden_layers=2,
+        num_attention_heads=4,
+        num_key_value_heads=4,
+    )
+    config._attn_implementation = implementation
+    model = transformers.LlamaForCausalLM(config).eval()
+    examples = [[5, 6, 7, 8], [9, 10, 11], [12, 13]]
+    dataset = packing.PackedDataset(
+        FakeTokenCache(examples), block_size=12, pad_token_id=0
+    )
+    item = {key: torch.as_tensor(value)[None] for key, value in dataset[0].items()}
+    with torch.no_grad():
+        packed = model(
+            input_ids=item["input_ids"],
+            position_ids=item["position_ids"],
+            attention_mask=packing.block_causal_mask(item["position_ids"], model.dtype),
+        ).logits[0]
+        pos = 0
+        for idx in dataset.blocks[0]:
+            ids = torch.tensor([examples[idx]])
+            alone = model(input_ids=ids).logits[0]
+            torch.testing.assert_close(packed[pos : pos + len(ids[0])], alone)
+            pos += len(ids[0])
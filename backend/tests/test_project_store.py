@@ -0,0 +1,115 @@
+import json
+import os
+import threading
+
+import pytest
+
+from backend import project_store
+from backend.project_store import PreconditionFailed, ProjectStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ProjectStore(str(tmp_path / "project"))
+
+
+def test_save_patch_and_load(store):
+    store.save({"name": "demo", "files": {"a.py": "print(1)", "b.py": "x = 2"}})
+    manifest = store.patch({"files": {"a.py": "print(2)", "b.py": None}, "name": None})
+
+    assert manifest["version"] == 2
+    assert store.load() == {"files": {"a.py": "print(2)"}}
+
+
+def test_if_match_rejects_stale_saves(store):
+    first = store.save({"name": "demo"})
+    second = store.save({"name": "renamed"}, if_match=[first["etag"]])
+    with pytest.raises(PreconditionFailed):
+        store.patch({"name": "stale"}, if_match=[first["etag"]])
+    assert store.save({"name": "current"}, if_match=[second["etag"]])["version"] == 3
+
+
+@pytest.mark.parametrize(
+    "legacy", [{"name": "old", "files": {"a.py": ""}}, [1, 2], "text"]
+)
+def test_legacy_project_data_is_imported(store, legacy):
+    os.makedirs(store.path)
+    with open(
+        os.path.join(store.path, project_store.LEGACY_FILE), "w", encoding="utf-8"
+    ) as f:
+        json.dump(legacy, f)
+
+    assert store.load() == legacy
+    assert (
+        b"".join(store.iter_json(store.read_manifest()))
+        == json.dumps(legacy, separators=(",", ":")).encode()
+    )
+
+
+def test_non_object_projects_are_kept_whole(store):
+    store.save(["a", "b"])
+    assert store.load() == ["a", "b"]
+    with pytest.raises(project_store.NotAnObject):
+        store.patch({"name": "x"})
+    store.save({"name": "x"})
+    assert store.load() == {"name": "x"}
+
+
+@pytest.mark.parametrize("flock", [True, False])
+def test_concurrent_patches_are_serialized(store, monkeypatch, flock):
+    if not flock:
+        # As on hosts without fcntl.
+        monkeypatch.setattr(project_store, "fcntl", None)
+    store.save({})
+
+    def patch(i):
+        store.patch({f"key{i}": i})
+
+    threads = [threading.Thread(target=patch, args=(i,)) for i in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert store.load() == {f"key{i}": i for i in range(16)}
+    assert store.read_manifest()["version"] == 17
+
+
+@pytest.fixture
+def client(flask_app):
+    return flask_app.app.test_client()
+
+
+def test_save_routes_check_if_match(client):
+    project_id = client.post("/api/projects/create").get_json()["project_id"]
+    saved = client.post(f"/api/projects/{project_id}/save", json=[1, 2, 3])
+    assert saved.status_code == 200
+    etag = saved.headers["ETag"]
+
+    loaded = client.get(f"/api/projects/{project_id}/load")
+    assert loaded.get_json() == [1, 2, 3]
+    assert (
+        client.get(
+            f"/api/projects/{project_id}/load", headers={"If-None-Match": etag}
+        ).status_code
+        == 304
+    )
+    assert (
+        client.patch(f"/api/projects/{project_id}/save", json={"a": 1}).status_code
+        == 409
+    )
+    assert (
+        client.post(
+            f"/api/projects/{project_id}/save",
+            json={"a": 1},
+            headers={"If-Match": '"stale"'},
+        ).status_code
+        == 412
+    )
+    assert (
+        client.post(
+            f"/api/projects/{project_id}/save",
+            json={"a": 1},
+            headers={"If-Match": etag},
+        ).status_code
+        == 200
+    )
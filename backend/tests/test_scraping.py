@@ -0,0 +1,99 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from backend.app.core import scraping
+from backend.benchmarks.stub_servers import StaticSiteStubHandler, start_stub_server
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+PAGE = (
+    b"<html><head><title>T</title><style>p {}</style><script>var x;</script></head>"
+    b"<body><p>Hello <b>caf\xc3\xa9</b></p>\n<p>world</p></body></html>"
+)
+
+
+@pytest.fixture
+def site():
+    server, base_url = start_stub_server(StaticSiteStubHandler, paragraphs=2)
+    yield server, base_url
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+async def page_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        scraping, "SCRAPE_CACHE_DB", str(tmp_path / "cache" / "pages.db")
+    )
+    monkeypatch.setattr(scraping, "page_cache", None)
+    monkeypatch.setattr(scraping, "stats", dict.fromkeys(scraping.stats, 0))
+    yield
+    await scraping.close_async_client()
+
+
+def test_import_creates_no_files(tmp_path):
+    subprocess.run(
+        [sys.executable, "-c", "import backend.app.core.scraping"],
+        cwd=tmp_path,
+        env={**os.environ, "PYTHONPATH": REPO_ROOT},
+        check=True,
+    )
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.parametrize(
+    "parser, module",
+    [("html.parser", "bs4"), ("lxml", "lxml"), ("selectolax", "selectolax")],
+)
+def test_parsers_extract_the_same_text(parser, module):
+    pytest.importorskip(module)
+    assert scraping.extract_text(PAGE, parser, "utf-8") == "T Hello café world"
+
+
+@pytest.mark.parametrize(
+    "parser, module",
+    [("html.parser", "bs4"), ("lxml", "lxml"), ("selectolax", "selectolax")],
+)
+def test_unknown_charsets_are_ignored(parser, module):
+    pytest.importorskip(module)
+    assert scraping.extract_text(PAGE, parser, "bogus") == "T Hello café world"
+
+
+async def test_scrapes_pages_declaring_an_unknown_charset(page_cache):
+    server, base_url = start_stub_server(
+        StaticSiteStubHandler, paragraphs=2, charset="bogus"
+    )
+    try:
+        text = await scraping.scrape_url_async(f"{base_url}/page/3")
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert text.startswith("Page 3 page 1")
+
+
+async def test_revalidates_cached_pages(site, page_cache):
+    server, base_url = site
+    url = f"{base_url}/page/3"
+    text = await scraping.scrape_url_async(url)
+    assert text.startswith("Page 3 page 1")
+    assert os.path.exists(scraping.SCRAPE_CACHE_DB)
+
+    assert await scraping.scrape_url_async(url) == text
+    assert scraping.stats["fetched"] == 1
+    assert scraping.stats["not_modified"] == 1
+
+    server.RequestHandlerClass.version = 2
+    assert await scraping.scrape_url_async(url) == text
+    assert scraping.stats["fetched"] == 2
+
+
+async def test_truncates_large_pages_and_reports_errors(site, page_cache, monkeypatch):
+    _, base_url = site
+    monkeypatch.setattr(scraping, "SCRAPE_MAX_BYTES", 100)
+    assert await scraping.scrape_url_async(f"{base_url}/page/1") == "Page 1"
+    assert scraping.stats["bytes"] == 100
+
+    assert await scraping.scrape_url_async(f"{base_url}/missing") is None
+    assert scraping.stats["errors"] == 1
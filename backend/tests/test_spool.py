@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+from backend import spool
+
+
+def records(n, start=0):
+    return [{"i": i, "key": "a"} for i in range(start, start + n)]
+
+
+def test_segments_rotate_by_size(tmp_path):
+    writer = spool.SpoolWriter(str(tmp_path), "keys", max_bytes=40)
+    for i in range(5):
+        writer.write_many(records(2, start=2 * i))
+    segments = writer.close()
+
+    assert len(segments) == 3
+    assert segments == spool.list_segments(str(tmp_path))
+    assert list(spool.iter_records(str(tmp_path))) == records(10)
+
+
+def test_new_writer_does_not_overwrite_segments(tmp_path):
+    first = spool.SpoolWriter(str(tmp_path), "keys")
+    first.write_many(records(1))
+    first.close()
+    second = spool.SpoolWriter(str(tmp_path), "keys")
+    second.write_many(records(1, start=1))
+    second.close()
+
+    assert list(spool.iter_records(str(tmp_path))) == records(2)
+
+
+def test_torn_segment_is_recovered_on_start_up(tmp_path):
+    open_path = tmp_path / "crashed-00000.jsonl.open"
+    open_path.write_bytes(b'{"i":0}\n{"i":1}\n{"i":')
+    (tmp_path / "empty-00000.jsonl.open").write_bytes(b'{"i":')
+
+    writer = spool.SpoolWriter(str(tmp_path), "keys")
+
+    assert writer.recovered == [str(tmp_path / "crashed-00000.jsonl")]
+    assert os.listdir(tmp_path) == ["crashed-00000.jsonl"]
+    assert list(spool.iter_records(str(tmp_path))) == [{"i": 0}, {"i": 1}]
+
+
+@pytest.mark.parametrize("compression", ["gzip", "zstd"])
+def test_compressed_segment_of_dead_writer_is_recovered(tmp_path, compression):
+    if compression == "zstd":
+        pytest.importorskip("zstandard")
+    crashed = spool.SpoolWriter(str(tmp_path), "crashed", compression, fsync="batch")
+    crashed.write_many(records(3))
+    # Dying without closing leaves a stream with no trailer, and the lock
+    # goes away with the process.
+    crashed._raw.close()
+
+    writer = spool.SpoolWriter(str(tmp_path), "keys", compression)
+
+    assert len(writer.recovered) == 1
+    assert list(spool.iter_records(writer.recovered)) == records(3)
+
+
+def test_live_writer_segment_is_left_open(tmp_path):
+    live = spool.SpoolWriter(str(tmp_path), "live", fsync="batch")
+    live.write_many(records(2))
+
+    assert spool.SpoolWriter(str(tmp_path), "keys").recovered == []
+    live.write_many(records(1, start=2))
+    assert list(spool.iter_records(live.close())) == records(3)
@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+from backend.app.core import llm_cache, summarizer
+from backend.app.core.summarizer import count_tokens, split_text, summarize_text
+
+
+def _document(sentences, edit=None):
+    text = [f"Sentence number {i} is about topic {i % 13}." for i in range(sentences)]
+    if edit is not None:
+        text[edit] = "This sentence was rewritten completely."
+    return " ".join(text)
+
+
+def test_chunks_are_bounded_and_keep_every_sentence():
+    text = _document(300)
+    chunks = split_text(text, max_tokens=200, min_tokens=100)
+    assert len(chunks) > 5
+    assert all(count_tokens(chunk) <= 200 for chunk in chunks)
+    assert " ".join(chunks) == text
+
+
+def test_long_sentences_are_broken_between_words():
+    text = " ".join(["word"] * 500) + "."
+    chunks = split_text(text, max_tokens=50, min_tokens=25)
+    assert all(count_tokens(chunk) <= 50 for chunk in chunks)
+    assert " ".join(chunks) == text
+
+
+def test_an_edit_only_moves_nearby_chunk_boundaries():
+    before = split_text(_document(600), max_tokens=200, min_tokens=100)
+    after = split_text(_document(600, edit=300), max_tokens=200, min_tokens=100)
+    changed = set(after) - set(before)
+    assert 1 <= len(changed) <= 2
+    assert len(set(after) & set(before)) >= len(after) - 2
+
+
+class FakeLLM:
+    """Stands in for generate_text_async, recording prompts and concurrency."""
+
+    def __init__(self):
+        self.prompts = []
+        self.running = self.peak = 0
+
+    async def __call__(self, prompt, model, temperature, max_tokens, cache=None):
+        self.prompts.append(prompt)
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await asyncio.sleep(0.001)
+        self.running -= 1
+        if "FAIL" in prompt:
+            return None
+        return f"summary {len(self.prompts)}"
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    fake = FakeLLM()
+    monkeypatch.setattr(summarizer, "generate_text_async", fake)
+    monkeypatch.setattr(summarizer, "summary_cache", llm_cache.ResponseCache())
+    return fake
+
+
+async def test_short_documents_take_one_call(fake_llm):
+    assert await summarize_text("A short document.") == "summary 1"
+    assert fake_llm.prompts == [
+        summarizer.DOCUMENT_PROMPT.format(text="A short document.")
+    ]
+    assert await summarize_text("   ") is None
+
+
+async def test_long_documents_are_summarized_by_chunk_and_combined(fake_llm):
+    text = _document(2000)
+    chunks = split_text(text)
+    assert len(chunks) > 2
+
+    summary = await summarize_text(text, concurrency=2)
+    assert summary == f"summary {len(chunks) + 1}"
+    assert sum(
+        prompt.startswith("Summarize the following part") for prompt in fake_llm.prompts
+    ) == len(chunks)
+    assert fake_llm.prompts[-1].startswith("The following are summaries")
+    assert fake_llm.peak <= 2
+
+    # A second run is answered from the chunk summary cache.
+    fake_llm.prompts.clear()
+    assert await summarize_text(text) == summary
+    assert fake_llm.prompts == []
+
+
+async def test_a_failed_chunk_fails_the_summary(fake_llm):
+    text = _document(2000) + " FAIL."
+    assert await summarize_text(text) is None
+    assert not any(
+        prompt.startswith("The following are summaries") for prompt in fake_llm.prompts
+    )
@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+
+from backend.knowledge_graph import KnowledgeGraph
+from backend.vector_index import VectorStore
+
+
+def clustered(rng, clusters=20, per_cluster=50, dim=16):
+    centers = rng.normal(size=(clusters, dim))
+    return np.concatenate(
+        [center + 0.05 * rng.normal(size=(per_cluster, dim)) for center in centers]
+    ).astype(np.float32)
+
+
+@pytest.fixture
+def store():
+    vectors = clustered(np.random.default_rng(0))
+    store = VectorStore(vectors.shape[1])
+    store.add(np.arange(len(vectors)) * 3, vectors)
+    store.build_ivf()
+    return store
+
+
+def test_ivf_search_matches_exact_search(store):
+    rng = np.random.default_rng(1)
+    recalled = 0
+    for row in rng.choice(store.count, 20, replace=False):
+        query = store.matrix[row] + 0.01 * rng.normal(size=store.dim)
+        exact, _ = store.search(query, k=10, exact=True)
+        approximate, scores = store.search(query, k=10)
+        assert list(scores) == sorted(scores, reverse=True)
+        recalled += len(set(exact) & set(approximate))
+    assert recalled / 200 >= 0.9
+
+
+def test_filtered_search_only_returns_allowed_rows(store):
+    rows = store.rows_for(np.arange(0, 300, 3))
+    keys, _ = store.search(store.matrix[0], k=5, rows=rows)
+    assert set(keys.tolist()) <= set(range(0, 300, 3))
+
+
+def test_removed_vectors_are_not_found(store):
+    query = store.get(30)
+    store.remove([30, 33, 999999])
+
+    assert store.get(30) is None
+    assert store.count == 998
+    for exact in (True, False):
+        keys, _ = store.search(query, k=5, exact=exact)
+        assert 30 not in keys and 33 not in keys
+    # Surviving vectors keep their keys after the rows shift.
+    assert np.allclose(store.search(store.get(36), k=1)[0], [36])
+
+
+def test_ivf_is_retrained_only_after_enough_growth(store, tmp_path):
+    assert not store.ivf_is_stale()
+    store.add([10000 + i for i in range(400)], np.ones((400, store.dim)))
+    assert not store.ivf_is_stale()
+
+    store.save(str(tmp_path))
+    loaded = VectorStore.load(str(tmp_path))
+    assert loaded.ivf_trained_rows == 1000
+    loaded.add([20000 + i for i in range(200)], np.ones((200, store.dim)))
+    assert loaded.ivf_is_stale()
+
+
+def test_graph_index_is_kept_until_it_drifts():
+    graph = KnowledgeGraph()
+    vectors = clustered(np.random.default_rng(2), clusters=4, per_cluster=25)
+    graph.set_embeddings(range(100), vectors)
+    graph.build_vector_index()
+    ivf = graph.embeddings.ivf
+
+    graph.set_embeddings(range(100, 120), vectors[:20])
+    graph.build_vector_index()
+    assert graph.embeddings.ivf is ivf
+    graph.build_vector_index(force=True)
+    assert graph.embeddings.ivf is not ivf
+
+
+def test_remove_nodes_drops_data_edges_and_embeddings():
+    graph = KnowledgeGraph()
+    graph.create_index("type")
+    for node in ("page", "page:0", "page:1"):
+        graph.add_node(node, {"type": "page" if node == "page" else "chunk"})
+    graph.add_edge("page", "page:0", {"relation": "chunk"})
+    graph.add_edge("page", "page:1", {"relation": "chunk"})
+    graph.set_embeddings(["page:0", "page:1"], np.eye(2))
+
+    graph.remove_nodes(["page:1"])
+
+    assert graph.neighbors("page") == ["page:0"]
+    assert graph.get_edge("page", "page:1") is None
+    assert graph.find_nodes(type="chunk") == ["page:0"]
+    assert graph.get_embedding("page:1") is None
+    assert [node for node, _ in graph.similar_nodes([0, 1], k=5)] == ["page:0"]
+
+
+def test_reindexed_page_loses_its_stale_chunks():
+    confluence = pytest.importorskip("backend.app.services.confluence")
+    graph = KnowledgeGraph()
+    for i in range(4):
+        graph.add_node(f"confluence:7:{i}", {"type": "confluence_chunk"})
+
+    assert confluence.remove_stale_chunks(graph, "confluence:7", 2) == 2
+    assert sorted(graph.nodes) == ["confluence:7:0", "confluence:7:1"]
@@ -0,0 +1,299 @@
+# backend/vector_index.py
+import os
+
+import numpy as np
+
+VECTOR_DTYPE = np.float32
+DEFAULT_NPROBE = 8
+KMEANS_ITERATIONS = 10
+# Training uses at most this many sampled vectors per inverted list.
+KMEANS_SAMPLE_PER_LIST = 64
+ASSIGN_BATCH_ROWS = 16384
+# Filters matching fewer rows than this are searched exactly over just the
+# matching rows, which is both faster and more accurate than probing lists.
+EXACT_FILTER_ROWS = 20000
+# The IVF index is retrained once the row count has grown (or shrunk) by this
+# factor since training; until then new rows go to their nearest list.
+IVF_RETRAIN_GROWTH = 1.5
+
+
+def normalize(vectors):
+    """Scales vectors to unit length so dot products are cosine similarities."""
+    vectors = np.asarray(vectors, dtype=VECTOR_DTYPE)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+def top_k(scores, k):
+    """Returns (positions, scores) of the k highest scores, best first."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=VECTOR_DTYPE)
+    if k < len(scores):
+        positions = np.argpartition(-scores, k - 1)[:k]
+    else:
+        positions = np.arange(len(scores))
+    positions = positions[np.argsort(-scores[positions], kind="stable")]
+    return positions, scores[positions]
+
+
+class IVFIndex:
+    """Inverted-file index: vectors are bucketed by their nearest centroid
+    and a query only scores the buckets of its nprobe closest centroids.
+    """
+
+    def __init__(self, centroids):
+        self.centroids = centroids
+        self.lists = [np.empty(0, dtype=np.int64) for _ in range(len(centroids))]
+        self._pending = {}
+
+    @property
+    def nlist(self):
+        return len(self.centroids)
+
+    @classmethod
+    def train(cls, vectors, nlist, iterations=KMEANS_ITERATIONS, seed=0):
+        """Spherical k-means over a sample of (unit-length) vectors."""
+        rng = np.random.default_rng(seed)
+        sample_size = min(len(vectors), nlist * KMEANS_SAMPLE_PER_LIST)
+        sample = np.asarray(
+            vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))]
+        )
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignments = cls(centroids).assign(sample)
+            order = np.argsort(assignments, kind="stable")
+            counts = np.bincount(assignments, minlength=nlist)
+            starts = np.cumsum(counts) - counts
+            empty = counts == 0
+            sums = np.zeros_like(centroids)
+            sums[~empty] = np.add.reduceat(sample[order], starts[~empty], axis=0)
+            # Re-seed empty lists from random sample vectors.
+            sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]
+            centroids = normalize(sums)
+        return cls(centroids)
+
+    def assign(self, vectors):
+        """Returns the nearest centroid of each vector."""
+        assignments = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), ASSIGN_BATCH_ROWS):
+            batch = np.asarray(vectors[start : start + ASSIGN_BATCH_ROWS])
+            assignments[start : start + len(batch)] = np.argmax(
+                batch @ self.centroids.T, axis=1
+            )
+        return assignments
+
+    def add(self, rows, assignments):
+        for row, list_id in zip(np.asarray(rows).tolist(), assignments.tolist()):
+            self._pending.setdefault(list_id, []).append(row)
+
+    def set_lists(self, assignments):
+        """Rebuilds every list from a row -> list assignment array."""
+        order = np.argsort(assignments, kind="stable")
+        bounds = np.searchsorted(assignments[order], np.arange(self.nlist + 1))
+        self.lists = [order[bounds[i] : bounds[i + 1]] for i in range(self.nlist)]
+        self._pending = {}
+
+    def _flush_pending(self):
+        for list_id, rows in self._pending.items():
+            self.lists[list_id] = np.union1d(self.lists[list_id], rows)
+        self._pending = {}
+
+    def probe(self, query, nprobe):
+        """Returns the rows in the nprobe lists closest to query."""
+        if self._pending:
+            self._flush_pending()
+        nprobe = min(nprobe, self.nlist)
+        nearest = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return np.concatenate([self.lists[list_id] for list_id in nearest.tolist()])
+
+    def assignments(self, num_rows):
+        if self._pending:
+            self._flush_pending()
+        assignments = np.empty(num_rows, dtype=np.int64)
+        for list_id, rows in enumerate(self.lists):
+            assignments[rows] = list_id
+        return assignments
+
+
+class VectorStore:
+    """Fixed-dimension float32 embeddings keyed by non-negative integers.
+
+    Vectors are stored normalized in one contiguous matrix, so similarity is
+    cosine and exact search is a single matrix-vector product. An optional
+    IVFIndex trades a little recall for searching only a fraction of rows.
+    """
+
+    def __init__(self, dim):
+        self.dim = dim
+        self.matrix = np.empty((0, dim), dtype=VECTOR_DTYPE)
+        self.keys = np.empty(0, dtype=np.int64)
+        self.count = 0
+        self.ivf = None
+        # Row count the IVF index was trained on.
+        self.ivf_trained_rows = 0
+        self._row_of_key = np.empty(0, dtype=np.int64)
+
+    def __len__(self):
+        return self.count
+
+    def _check_dim(self, vectors):
+        if vectors.shape[-1] != self.dim:
+            raise ValueError(
+                f"Expected {self.dim}-dimensional vectors, got {vectors.shape[-1]}"
+            )
+
+    def _reserve(self, rows, max_key):
+        if not self.matrix.flags.writeable or self.count + rows > len(self.matrix):
+            # Grow by doubling; a memory-mapped snapshot is copied on first write.
+            capacity = max(self.count + rows, 2 * len(self.matrix), 1024)
+            matrix = np.empty((capacity, self.dim), dtype=VECTOR_DTYPE)
+            matrix[: self.count] = self.matrix[: self.count]
+            keys = np.empty(capacity, dtype=np.int64)
+            keys[: self.count] = self.keys[: self.count]
+            self.matrix, self.keys = matrix, keys
+        if max_key >= len(self._row_of_key):
+            row_of_key = np.full(max(max_key + 1, 2 * len(self._row_of_key)), -1)
+            row_of_key[: len(self._row_of_key)] = self._row_of_key
+            self._row_of_key = row_of_key
+
+    def add(self, keys, vectors):
+        """Stores vectors under keys, replacing any earlier vector for a key."""
+        keys = np.atleast_1d(np.asarray(keys, dtype=np.int64))
+        vectors = normalize(np.atleast_2d(vectors))
+        self._check_dim(vectors)
+        if len(keys) != len(vectors):
+            raise ValueError("keys and vectors must have the same length")
+        # Last write wins for keys repeated within the batch.
+        _, last = np.unique(keys[::-1], return_index=True)
+        last = len(keys) - 1 - last
+        keys, vectors = keys[last], vectors[last]
+        self._reserve(len(keys), int(keys.max()))
+        rows = self._row_of_key[keys]
+        fresh = rows < 0
+        rows[fresh] = self.count + np.arange(int(fresh.sum()))
+        self.count += int(fresh.sum())
+        self.matrix[rows] = vectors
+        self.keys[rows] = keys
+        self._row_of_key[keys] = rows
+        if self.ivf is not None:
+            # Replaced vectors keep their old list; only new rows are bucketed.
+            self.ivf.add(rows[fresh], self.ivf.assign(vectors[fresh]))
+
+    def rows_for(self, keys):
+        """Returns the rows holding vectors for keys, skipping keys without one."""
+        keys = np.asarray(keys, dtype=np.int64)
+        keys = keys[keys < len(self._row_of_key)]
+        rows = self._row_of_key[keys]
+        return rows[rows >= 0]
+
+    def remove(self, keys):
+        """Drops the vectors stored under keys; unknown keys are ignored."""
+        rows = self.rows_for(np.atleast_1d(keys))
+        if not len(rows):
+            return
+        keep = np.ones(self.count, dtype=bool)
+        keep[rows] = False
+        assignments = self.ivf.assignments(self.count)[keep] if self.ivf else None
+        self._row_of_key[self.keys[rows]] = -1
+        # Copying also detaches a memory-mapped snapshot.
+        self.matrix = self.matrix[: self.count][keep]
+        self.keys = self.keys[: self.count][keep]
+        self.count = len(self.keys)
+        self._row_of_key[self.keys] = np.arange(self.count)
+        if self.ivf is not None:
+            self.ivf.set_lists(assignments)
+
+    def get(self, key):
+        row = self._row_of_key[key] if key < len(self._row_of_key) else -1
+        return None if row < 0 else np.array(self.matrix[row])
+
+    def build_ivf(self, nlist=None, seed=0):
+        """Trains an IVF index over the stored vectors (sqrt(n) lists by default)."""
+        if nlist is None:
+            nlist = max(1, int(np.sqrt(self.count)))
+        nlist = min(nlist, self.count)
+        vectors = self.matrix[: self.count]
+        self.ivf = IVFIndex.train(vectors, nlist, seed=seed)
+        self.ivf.set_lists(self.ivf.assign(vectors))
+        self.ivf_trained_rows = self.count
+
+    def ivf_is_stale(self, growth=IVF_RETRAIN_GROWTH):
+        """True if there is no IVF index or its training set has drifted."""
+        if self.ivf is None:
+            return True
+        trained = max(1, self.ivf_trained_rows)
+        return not trained / growth <= self.count <= trained * growth
+
+    def search(self, query, k=10, rows=None, exact=False, nprobe=DEFAULT_NPROBE):
+        """Returns (keys, scores) of the k most similar vectors, best first.
+
+        rows restricts the search to a subset (e.g. an attribute filter).
+        Uses the IVF index when one is built, unless exact is set or the
+        subset is small enough to scan directly.
+        """
+        query = normalize(query)
+        self._check_dim(query)
+        if rows is not None and (exact or len(rows) <= EXACT_FILTER_ROWS):
+            candidates = np.sort(rows)
+        elif exact or self.ivf is None:
+            candidates = None
+        else:
+            allowed = None
+            if rows is not None:
+                allowed = np.zeros(self.count, dtype=bool)
+                allowed[rows] = True
+            # Widen the probe until the filter leaves at least k candidates.
+            while True:
+                candidates = self.ivf.probe(query, nprobe)
+                if allowed is not None:
+                    candidates = candidates[allowed[candidates]]
+                if len(candidates) >= k or nprobe >= self.ivf.nlist:
+                    break
+                nprobe *= 2
+            candidates = np.sort(candidates)
+        if candidates is None:
+            scores = self.matrix[: self.count] @ query
+            positions, scores = top_k(scores, k)
+            return self.keys[positions], scores
+        scores = self.matrix[candidates] @ query
+        positions, scores = top_k(scores, k)
+        return self.keys[candidates[positions]], scores
+
+    def save(self, path, prefix="embeddings"):
+        np.save(os.path.join(path, f"{prefix}.npy"), self.matrix[: self.count])
+        np.save(os.path.join(path, f"{prefix}_keys.npy"), self.keys[: self.count])
+        if self.ivf is not None:
+            np.save(os.path.join(path, f"{prefix}_centroids.npy"), self.ivf.centroids)
+            np.save(
+                os.path.join(path, f"{prefix}_lists.npy"),
+                self.ivf.assignments(self.count),
+            )
+            np.save(
+                os.path.join(path, f"{prefix}_trained_rows.npy"),
+                np.asarray(self.ivf_trained_rows),
+            )
+
+    @classmethod
+    def load(cls, path, prefix="embeddings"):
+        """Restores a saved store with the matrix memory-mapped read-only."""
+        matrix = np.load(os.path.join(path, f"{prefix}.npy"), mmap_mode="r")
+        store = cls(matrix.shape[1])
+        store.matrix = matrix
+        store.keys = np.load(os.path.join(path, f"{prefix}_keys.npy"))
+        store.count = len(matrix)
+        if store.count:
+            store._row_of_key = np.full(int(store.keys.max()) + 1, -1)
+            store._row_of_key[store.keys] = np.arange(store.count)
+        centroids_path = os.path.join(path, f"{prefix}_centroids.npy")
+        if os.path.exists(centroids_path):
+            store.ivf = IVFIndex(np.load(centroids_path))
+            store.ivf.set_lists(np.load(os.path.join(path, f"{prefix}_lists.npy")))
+            trained_path = os.path.join(path, f"{prefix}_trained_rows.npy")
+            store.ivf_trained_rows = (
+                int(np.load(trained_path))
+                if os.path.exists(trained_path)
+                else store.count
+            )
+        return store